@@ -1,20 +1,84 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, abort, g, request, jsonify, stream_with_context, url_for
 from flask_migrate import Migrate
 from config import Config
-from models import db, User, UserSale, Pump, Sale, Station, Staff
+from database import configure_engine
+from models import db, User, UserSale, Pump, Sale, SaleRollup, Station, Staff, Tank
+from filters import sale_filters, apply_sale_filters, parse_datetime
+from pagination import parse_limit, keyset_page
+from auth_cache import auth_cache
+from cache import response_cache
+from revocation import revocation_list
+from query_budget import check_query_budgets
+from query_plans import check_query_plans
+from generate import generate_data_command
+from dashboard import headline_totals, station_summaries, fuel_type_distribution
+from timeseries import INTERVALS, GROUPINGS, DEFAULT_SPANS, parse_timezone, parse_local_datetime, sales_timeseries
+from export import FORMATS as EXPORT_FORMATS, stream_sales
+from ingest import parse_batch_body, validate_batch, split_replays, insert_sales
+from writebehind import write_behind
+from deletion import station_counts, delete_station_rows, delete_station_in_background
+from archive import sales_source, forget_archived_sales, archive_sales_command
+from inventory import (
+    draw_down, put_back, take_out, move_pump_sales, put_back_pump_sales, receive_delivery, low_stock_alerts,
+    reconcile_tanks_command,
+)
+from rollups import record_sales, bucket_keys, refresh_buckets, move_pump, forget_pumps, rebuild_rollups_command
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
 from flask_cors import CORS
-from werkzeug.security import generate_password_hash, check_password_hash
+from passwords import password_hasher, HashingBusy
+from profiling import request_profiler
+from replicas import replica_router
+from serializers import (
+    FastJSONProvider, SALE_FIELDS, PUMP_FIELDS, STAFF_FIELDS, STATION_FIELDS, parse_fieldset,
+    sale_shape, pump_shape, staff_shape, sales_query, pumps_query, staff_query, station_rows,
+)
+from events import sales_hub, StreamFull
 import jwt
+import uuid
 from datetime import datetime, timedelta
 from functools import wraps
 
 app = Flask(__name__)
 app.config.from_object(Config)
+app.json = FastJSONProvider(app)
 
 db.init_app(app)
+configure_engine(app, db)
 migrate = Migrate(app, db)
-
-CORS(app)
+response_cache.init_app(app)
+auth_cache.init_app(app)
+revocation_list.init_app(app)
+password_hasher.init_app(app)
+request_profiler.init_app(app)
+replica_router.init_app(app)
+sales_hub.init_app(app)
+write_behind.init_app(app)
+
+# Let browsers read the pagination cursor off list responses
+CORS(app, expose_headers=['X-Next-Cursor', 'Link'])
+
+# Loader options so serializing rows never falls back to per-row lazy loads.
+# Sale.to_dict() reads pump.station; Pump.to_dict() reads station. Listings
+# skip the ORM and render rows with the shapes in serializers.py instead.
+sale_with_pump = joinedload(Sale.pump).joinedload(Pump.station)
+pump_with_station = joinedload(Pump.station)
+
+app.cli.add_command(check_query_budgets)
+app.cli.add_command(check_query_plans)
+app.cli.add_command(rebuild_rollups_command)
+app.cli.add_command(generate_data_command)
+app.cli.add_command(archive_sales_command)
+app.cli.add_command(reconcile_tanks_command)
+
+def issue_token(user):
+    # Every token gets a jti so that /auth/logout can revoke it
+    return jwt.encode({
+        'user_id': user.id,
+        'jti': uuid.uuid4().hex,
+        'exp': datetime.utcnow() + timedelta(hours=24)
+    }, app.config['SECRET_KEY'], algorithm='HS256')
 
 # JWT Authentication Decorator
 def token_required(f):
@@ -27,15 +91,26 @@ def token_required(f):
         try:
             if token.startswith('Bearer '):
                 token = token[7:]  # Remove 'Bearer ' prefix
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user = User.query.get(data['user_id'])
-            if not current_user or not current_user.is_active:
-                return jsonify({'message': 'Token is invalid'}), 401
+            # Repeat requests with the same token skip the decode and the user lookup
+            data = auth_cache.claims(token)
+            if data is None:
+                data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
+                auth_cache.remember_claims(token, data)
+            if 'jti' in data and revocation_list.is_revoked(data['jti']):
+                return jsonify({'message': 'Token has been revoked'}), 401
+            current_user = auth_cache.user(data['user_id'])
+            if current_user is None:
+                current_user = User.query.get(data['user_id'])
+                if not current_user or not current_user.is_active:
+                    return jsonify({'message': 'Token is invalid'}), 401
+                auth_cache.remember_user(current_user)
         except jwt.ExpiredSignatureError:
             return jsonify({'message': 'Token has expired'}), 401
         except jwt.InvalidTokenError:
             return jsonify({'message': 'Token is invalid'}), 401
         
+        g.token = token
+        g.token_claims = data
         return f(current_user, *args, **kwargs)
     return decorated
 
@@ -43,6 +118,16 @@ def token_required(f):
 def home():
     return jsonify({"message": "Petrol Station Tracker API is running"})
 
+# Prometheus scrape endpoint; only served when PROFILING_ENABLED is set
+@app.route("/metrics")
+def metrics():
+    if not request_profiler.enabled:
+        return jsonify({'message': 'Metrics are disabled'}), 404
+    return Response(
+        request_profiler.metrics_text(password_hasher.stats),
+        mimetype='text/plain; version=0.0.4'
+    )
+
 # AUTHENTICATION ENDPOINTS
 @app.route("/auth/register", methods=["POST"])
 def register():
@@ -58,7 +143,7 @@ def register():
             return jsonify({'message': 'Email already registered'}), 400
         
         # Create new user
-        hashed_password = generate_password_hash(data['password'])
+        hashed_password = password_hasher.hash(data['password'])
         new_user = User(
             name=data['name'],
             email=data['email'],
@@ -70,10 +155,7 @@ def register():
         db.session.commit()
         
         # Generate token
-        token = jwt.encode({
-            'user_id': new_user.id,
-            'exp': datetime.utcnow() + timedelta(hours=24)
-        }, app.config['SECRET_KEY'], algorithm='HS256')
+        token = issue_token(new_user)
         
         return jsonify({
             'message': 'User registered successfully',
@@ -81,6 +163,8 @@ def register():
             'user': new_user.to_dict()
         }), 201
         
+    except HashingBusy as e:
+        return jsonify({'message': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'message': f'Registration failed: {str(e)}'}), 500
 
@@ -94,17 +178,19 @@ def login():
         
         user = User.query.filter_by(email=data['email']).first()
         
-        if not user or not check_password_hash(user.password_hash, data['password']):
+        if not user or not password_hasher.check(user.password_hash, data['password']):
             return jsonify({'message': 'Invalid email or password'}), 401
         
         if not user.is_active:
             return jsonify({'message': 'Account is deactivated'}), 401
         
+        # Re-hash with the current cost parameters while we have the password
+        if password_hasher.needs_rehash(user.password_hash):
+            user.password_hash = password_hasher.hash(data['password'])
+            db.session.commit()
+        
         # Generate token
-        token = jwt.encode({
-            'user_id': user.id,
-            'exp': datetime.utcnow() + timedelta(hours=24)
-        }, app.config['SECRET_KEY'], algorithm='HS256')
+        token = issue_token(user)
         
         return jsonify({
             'message': 'Login successful',
@@ -112,6 +198,8 @@ def login():
             'user': user.to_dict()
         }), 200
         
+    except HashingBusy as e:
+        return jsonify({'message': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'message': f'Login failed: {str(e)}'}), 500
 
@@ -123,42 +211,145 @@ def get_current_user(current_user):
 @app.route("/auth/logout", methods=["POST"])
 @token_required
 def logout(current_user):
-    # In a real app, you might want to blacklist the token
+    claims = g.token_claims
+    # Tokens issued before revocation existed carry no jti and simply expire
+    if 'jti' in claims:
+        revocation_list.revoke(claims['jti'], datetime.utcfromtimestamp(claims['exp']))
+        auth_cache.forget_token(g.token)
     return jsonify({'message': 'Logged out successfully'}), 200
 
-# ✅ Get all sales
+# ✅ Get sales, newest first, one keyset page at a time
 @app.route("/sales", methods=["GET"])
 def get_sales():
-    sales = Sale.query.all()
-    return jsonify([sale.to_dict() for sale in sales]), 200
+    try:
+        filters = sale_filters(request.args)
+        limit = parse_limit(request.args.get('limit'))
+        # Ranges reaching past the archive horizon also read archived months
+        sale = sales_source(filters['start'], filters['end'])
+        fieldset = parse_fieldset('sale', request.args.get('fields'), request.args.get('expand'), SALE_FIELDS)
+        # The keyset cursor needs each row's timestamp even when it is not rendered
+        shape = sale_shape(sale, fieldset, hidden=('sale_timestamp',))
+        query = apply_sale_filters(sales_query(shape), filters, sale)
+        rows, next_cursor = keyset_page(
+            query, sale.sale_timestamp, sale.id,
+            cursor=request.args.get('cursor'), limit=limit
+        )
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    response = jsonify(shape.build_all(rows))
+    if next_cursor:
+        # Body stays a plain list for existing clients; the cursor rides in headers
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{url_for("get_sales", **{**request.args.to_dict(), "cursor": next_cursor})}>; rel="next"'
+    return response, 200
 
 
 # ✅ Get a single sale by ID
 @app.route("/sales/<int:id>", methods=["GET"])
 def get_sale(id):
-    sale = Sale.query.get_or_404(id)
+    sale = Sale.query.options(sale_with_pump).get(id)
+    if sale is None:
+        # Archived sales stay readable (but not editable) by id
+        archived = sales_source(include_archive=True)
+        if archived is Sale:
+            abort(404)
+        sale = db.session.query(archived).options(joinedload(archived.pump).joinedload(Pump.station))\
+            .filter(archived.id == id).first_or_404()
     return jsonify(sale.to_dict()), 200  
 
 # Adding a new sale
 @app.route("/sales", methods=["POST"])
+@response_cache.invalidates('sales')
 def create_sale():
-    data = request.json
-    sale = Sale(
-        fuel_type=data["fuelType"],
-        litres=data["litres"],
-        price_per_litre=data["pricePerLitre"],
-        total_amount=data["litres"] * data["pricePerLitre"],
-        pump_id=data["pumpId"]
-    )
+    # Same validation and transaction id normalisation as /sales/batch, so a
+    # retry is recognised whichever route it arrives on
+    valid, errors = validate_batch([(0, request.json)])
+    if errors:
+        return jsonify({'message': errors[0]['error']}), 400
+    row = valid[0][1]
+    if write_behind.enabled:
+        return queue_sale(row)
+    transaction_id = row["transaction_id"]
+
+    # A replayed submission returns the sale recorded the first time
+    if transaction_id is not None:
+        existing = Sale.query.filter_by(pump_id=row["pump_id"], transaction_id=transaction_id).first()
+        if existing:
+            return jsonify(existing.to_dict()), 200
+
+    sale = Sale(**row)
     db.session.add(sale)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        # Lost a race with a concurrent retry of the same transaction
+        db.session.rollback()
+        existing = Sale.query.filter_by(pump_id=row["pump_id"], transaction_id=transaction_id).first()
+        if existing is None:
+            raise
+        return jsonify(existing.to_dict()), 200
+    record_sales([sale])
+    draw_down([sale])
     db.session.commit()
-    return jsonify(sale.to_dict()), 201 
+    body = sale.to_dict()
+    sales_hub.publish('sale.created', body, sale.pump.station_id if sale.pump else None)
+    return jsonify(body), 201 
+
+def queue_sale(row):
+    """Write-behind mode: durably queue a validated sale and answer before it is committed."""
+    row = write_behind.append(row)
+    return jsonify({
+        'status': 'queued',
+        'fuel_type': row['fuel_type'],
+        'litres': row['litres'],
+        'price_per_litre': row['price_per_litre'],
+        'total_amount': row['total_amount'],
+        'sale_timestamp': row['sale_timestamp'].isoformat(),
+        'transaction_id': row['transaction_id'],
+        'pump_id': row['pump_id']
+    }), 202
+
+# Upload many sales at once (JSON array or NDJSON), e.g. after a pump
+# controller reconnects. Valid rows are inserted even if others fail.
+@app.route("/sales/batch", methods=["POST"])
+@response_cache.invalidates('sales')
+def create_sales_batch():
+    try:
+        rows, errors = parse_batch_body(request)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    if len(rows) + len(errors) > app.config['SALES_BATCH_MAX_ROWS']:
+        return jsonify({'message': f"Batch exceeds {app.config['SALES_BATCH_MAX_ROWS']} sales"}), 413
+
+    valid, invalid = validate_batch(rows)
+    valid, duplicates = split_replays(valid)
+    landed = []
+    inserted, failed, raced = insert_sales(valid, app.config['SALES_BATCH_CHUNK_SIZE'], on_commit=landed.extend)
+    sales_hub.publish_batch(landed)
+    errors = sorted(errors + invalid + failed, key=lambda error: error['index'])
+    duplicates = sorted(duplicates + raced, key=lambda duplicate: duplicate['index'])
+
+    if errors:
+        status = 207 if inserted or duplicates else 400
+    else:
+        status = 201 if inserted else 200
+    return jsonify({
+        'inserted': inserted,
+        'duplicates': duplicates,
+        'failed': len(errors),
+        'errors': errors
+    }), status
 
 # Update a sale
 @app.route("/sales/<int:id>", methods=["PATCH"])
+@response_cache.invalidates('sales')
 def update_sale(id):
     sale = Sale.query.get_or_404(id)
     data = request.json
+    stale_buckets = bucket_keys(sale.pump_id, sale.fuel_type, sale.sale_timestamp)
+    put_back(sale)
 
     sale.fuel_type = data.get("fuelType", sale.fuel_type)
     sale.litres = data.get("litres", sale.litres)
@@ -166,31 +357,118 @@ def update_sale(id):
     sale.total_amount = sale.litres * sale.price_per_litre
     sale.pump_id = data.get("pumpId", sale.pump_id)
 
+    refresh_buckets(stale_buckets | bucket_keys(sale.pump_id, sale.fuel_type, sale.sale_timestamp))
+    take_out(sale)
     db.session.commit()
-    return jsonify(sale.to_dict())
+    body = sale.to_dict()
+    sales_hub.publish('sale.updated', body, sale.pump.station_id if sale.pump else None)
+    return jsonify(body)
 
 @app.route("/sales/<int:id>", methods=["DELETE"])
+@response_cache.invalidates('sales')
 def delete_sale(id):
-    sale = Sale.query.get_or_404(id)
+    sale = Sale.query.options(sale_with_pump).get_or_404(id)
+    stale_buckets = bucket_keys(sale.pump_id, sale.fuel_type, sale.sale_timestamp)
+    deleted = {"id": sale.id, "pump_id": sale.pump_id, "station_id": sale.pump.station_id if sale.pump else None}
+    put_back(sale)
     db.session.delete(sale)
+    refresh_buckets(stale_buckets)
     db.session.commit()
+    sales_hub.publish('sale.deleted', deleted, deleted["station_id"])
     return jsonify({"message": "Sale deleted successfully"}), 204
 
+# Live feed of sale writes as Server-Sent Events, optionally for some
+# stations only (?station_id=1,2). Slow clients lose their oldest events
+# and are told how many with a `dropped` event.
+@app.route("/sales/stream", methods=["GET"])
+def stream_sales_events():
+    try:
+        station_ids = {
+            int(value)
+            for param in request.args.getlist('station_id')
+            for value in param.split(',') if value.strip()
+        } or None
+    except ValueError:
+        return jsonify({'message': 'station_id must be a comma-separated list of integers'}), 400
+    # A sync gunicorn worker would be tied up by one stream and killed at its timeout
+    if request.environ.get('SERVER_SOFTWARE', '').startswith('gunicorn') and not request.environ.get('wsgi.multithread'):
+        return jsonify({'message': 'Live sales streams need threaded gunicorn workers (see gunicorn.conf.py)'}), 503
+    try:
+        subscriber = sales_hub.subscribe(station_ids)
+    except StreamFull as e:
+        return jsonify({'message': str(e)}), 503
+
+    response = Response(sales_hub.stream(subscriber), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Keep nginx and similar proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# Stream every matching sale as CSV or NDJSON (month-end exports)
+@app.route("/sales/export", methods=["GET"])
+@replica_router.replica_reads
+def export_sales():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'message': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    try:
+        filters = sale_filters(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    compress = 'gzip' in request.headers.get('Accept-Encoding', '')
+    response = Response(
+        stream_with_context(stream_sales(fmt, filters, compress=compress)),
+        mimetype=EXPORT_FORMATS[fmt]
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename=sales.{fmt}'
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+# Sales totals over time in server-side buckets, for charts
+@app.route("/sales/timeseries", methods=["GET"])
+@replica_router.replica_reads
+def get_sales_timeseries():
+    try:
+        interval = request.args.get('interval', 'hour')
+        if interval not in INTERVALS:
+            raise ValueError(f"interval must be one of: {', '.join(INTERVALS)}")
+        group_by = request.args.get('group_by') or None
+        if group_by and group_by not in GROUPINGS:
+            raise ValueError(f"group_by must be one of: {', '.join(GROUPINGS)}")
+
+        tz = parse_timezone(request.args.get('tz'))
+        end = parse_local_datetime(request.args.get('end'), tz, 'end') or datetime.now(tz)
+        start = parse_local_datetime(request.args.get('start'), tz, 'start') or end - DEFAULT_SPANS[interval]
+        if start >= end:
+            raise ValueError("start must be before end")
+
+        filters = sale_filters(request.args)
+        result = sales_timeseries(interval, start, end, tz, group_by=group_by, filters=filters)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    return jsonify(result), 200
+
 # Get sales statistics by station
 @app.route("/sales/by-station", methods=["GET"])
+@response_cache.cached('stations', 'sales')
+@replica_router.replica_reads
 def get_sales_by_station():
     from sqlalchemy import func
     
-    # Query to get sales grouped by station
+    # Sum the daily rollups per station instead of rescanning every sale
     results = db.session.query(
         Station.id,
         Station.name,
         Station.location,
-        func.count(Sale.id).label('sales_count'),
-        func.sum(Sale.total_amount).label('total_revenue'),
-        func.sum(Sale.litres).label('total_litres')
-    ).join(Pump, Station.id == Pump.station_id)\
-     .join(Sale, Pump.id == Sale.pump_id)\
+        func.sum(SaleRollup.sale_count).label('sales_count'),
+        func.sum(SaleRollup.total_revenue).label('total_revenue'),
+        func.sum(SaleRollup.total_litres).label('total_litres')
+    ).join(SaleRollup, Station.id == SaleRollup.station_id)\
+     .filter(SaleRollup.period == 'day')\
      .group_by(Station.id, Station.name, Station.location)\
      .all()
     
@@ -210,17 +488,22 @@ def get_sales_by_station():
 # Get all pumps
 @app.route("/pumps", methods=["GET"])
 def get_pumps():
-    pumps = Pump.query.all()
-    return jsonify([pump.to_dict() for pump in pumps])
+    try:
+        fieldset = parse_fieldset('pump', request.args.get('fields'), request.args.get('expand'), PUMP_FIELDS)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    shape = pump_shape(fieldset)
+    return jsonify(shape.build_all(pumps_query(shape).order_by(Pump.id)))
 
 # Get single pump
 @app.route("/pumps/<int:id>", methods=["GET"])
 def get_pump(id):
-    pump = Pump.query.get_or_404(id)
+    pump = Pump.query.options(pump_with_station).get_or_404(id)
     return jsonify(pump.to_dict()), 200
 
 # Add pump
 @app.route("/pumps", methods=["POST"])
+@response_cache.invalidates('pumps')
 def create_pump():
     data = request.json
     pump = Pump(
@@ -234,6 +517,7 @@ def create_pump():
 
 # Update pump
 @app.route("/pumps/<int:id>", methods=["PATCH"])
+@response_cache.invalidates('pumps', 'sales')
 def update_pump(id):
     pump = Pump.query.get_or_404(id)
     data = request.json
@@ -242,16 +526,22 @@ def update_pump(id):
         pump.pump_number = data["pump_number"]
     if "fuel_type" in data:
         pump.fuel_type = data["fuel_type"]
-    if "station_id" in data:
+    if "station_id" in data and data["station_id"] != pump.station_id:
+        move_pump_sales(pump.id, pump.station_id, data["station_id"])
         pump.station_id = data["station_id"]
+        move_pump(pump.id, pump.station_id)
     
     db.session.commit()
     return jsonify(pump.to_dict())
 
 # Delete pump
 @app.route("/pumps/<int:id>", methods=["DELETE"])
+@response_cache.invalidates('pumps', 'sales')
 def delete_pump(id):
     pump = Pump.query.get_or_404(id)
+    forget_pumps([pump.id])
+    put_back_pump_sales(pump.id, pump.station_id)
+    forget_archived_sales([pump.id])
     db.session.delete(pump)
     db.session.commit()
     return "", 204
@@ -275,16 +565,28 @@ def add_user_to_sale(sale_id):
 
 # STATIONS API ENDPOINTS
 @app.route("/stations", methods=["GET"])
+@response_cache.cached('stations', 'pumps', 'staff')
 def get_stations():
-    stations = Station.query.all()
-    return jsonify([station.to_dict() for station in stations])
+    try:
+        fieldset = parse_fieldset('station', request.args.get('fields'), request.args.get('expand'), STATION_FIELDS)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    return jsonify(station_rows(select(Station).order_by(Station.id), fieldset))
 
 @app.route("/stations/<int:id>", methods=["GET"])
+@response_cache.cached('stations', 'pumps', 'staff')
 def get_station(id):
-    station = Station.query.get_or_404(id)
-    return jsonify(station.to_dict())
+    try:
+        fieldset = parse_fieldset('station', request.args.get('fields'), request.args.get('expand'), STATION_FIELDS)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    stations = station_rows(select(Station).where(Station.id == id), fieldset)
+    if not stations:
+        abort(404)
+    return jsonify(stations[0])
 
 @app.route("/stations", methods=["POST"])
+@response_cache.invalidates('stations')
 def create_station():
     data = request.get_json()
     new_station = Station(name=data["name"], location=data["location"])
@@ -293,6 +595,7 @@ def create_station():
     return jsonify(new_station.to_dict()), 201
 
 @app.route("/stations/<int:id>", methods=["PATCH"])
+@response_cache.invalidates('stations')
 def update_station(id):
     station = Station.query.get_or_404(id)
     data = request.get_json()
@@ -304,45 +607,59 @@ def update_station(id):
     return jsonify(station.to_dict())
 
 @app.route("/stations/<int:id>", methods=["DELETE"])
+@response_cache.invalidates('stations', 'pumps', 'staff', 'sales')
 def delete_station(id):
+    station = Station.query.get_or_404(id)
     try:
-        station = Station.query.get_or_404(id)
-        
-        # Log what will be deleted
-        pumps_count = len(station.pumps)
-        staff_count = len(station.staff)
+        # Count what will be deleted with aggregates rather than loading every sale
+        counts = station_counts(station.id)
         
-        # Count sales that will be deleted
-        sales_count = 0
-        for pump in station.pumps:
-            sales_count += len(pump.sales)
+        app.logger.info(
+            "Deleting station '%s' with %s pumps, %s staff, and %s sales",
+            station.name, counts['pumps'], counts['staff'], counts['sales']
+        )
         
-        print(f"Deleting station '{station.name}' with {pumps_count} pumps, {staff_count} staff, and {sales_count} sales")
+        # Very large stations are deleted in chunks off the request thread
+        background = request.args.get('background', '').lower() in ('1', 'true', 'yes') \
+            or counts['sales'] > app.config['STATION_DELETE_BACKGROUND_THRESHOLD']
+        if background:
+            name = station.name
+            delete_station_in_background(
+                station.id,
+                on_done=lambda: response_cache.invalidate('stations', 'pumps', 'staff', 'sales')
+            )
+            response = jsonify({
+                "message": f"Station '{name}' is being deleted",
+                "deleted": counts
+            })
+            response.headers['Location'] = url_for('get_station', id=id)
+            return response, 202
         
-        # Delete the station (cascade will handle pumps, staff, and sales)
-        db.session.delete(station)
+        # One DELETE per table (sales, pumps, staff, rollups) in a single transaction
+        name = station.name
+        delete_station_rows(station.id)
         db.session.commit()
         
         return jsonify({
-            "message": f"Station '{station.name}' deleted successfully",
-            "deleted": {
-                "pumps": pumps_count,
-                "staff": staff_count, 
-                "sales": sales_count
-            }
+            "message": f"Station '{name}' deleted successfully",
+            "deleted": counts
         }), 200
         
     except Exception as e:
         db.session.rollback()
-        print(f"Error deleting station: {str(e)}")
+        app.logger.exception("Error deleting station %s", id)
         return jsonify({"error": f"Failed to delete station: {str(e)}"}), 500
 
 
 # STAFF API ENDPOINTS
 @app.route("/staff", methods=["GET"])
 def get_staff():
-    staff = Staff.query.all()
-    return jsonify([s.to_dict() for s in staff])
+    try:
+        fieldset = parse_fieldset('staff', request.args.get('fields'), request.args.get('expand'), STAFF_FIELDS)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    shape = staff_shape(fieldset)
+    return jsonify(shape.build_all(staff_query(shape).order_by(Staff.id)))
 
 @app.route("/staff/<int:id>", methods=["GET"])
 def get_staff_member(id):
@@ -350,6 +667,7 @@ def get_staff_member(id):
     return jsonify(staff.to_dict())
 
 @app.route("/staff", methods=["POST"])
+@response_cache.invalidates('staff')
 def create_staff():
     data = request.get_json()
     staff = Staff(
@@ -362,6 +680,7 @@ def create_staff():
     return jsonify(staff.to_dict()), 201
 
 @app.route("/staff/<int:id>", methods=["PATCH"])
+@response_cache.invalidates('staff')
 def update_staff(id):
     staff = Staff.query.get_or_404(id)
     data = request.get_json()
@@ -375,6 +694,7 @@ def update_staff(id):
     return jsonify(staff.to_dict())
 
 @app.route("/staff/<int:id>", methods=["DELETE"])
+@response_cache.invalidates('staff')
 def delete_staff(id):
     staff = Staff.query.get_or_404(id)
     db.session.delete(staff)
@@ -382,60 +702,124 @@ def delete_staff(id):
     return "", 204
 
 
+# TANK API ENDPOINTS
+# Levels move with every sale and delivery; see inventory.py
+@app.route("/tanks", methods=["GET"])
+def get_tanks():
+    query = Tank.query.order_by(Tank.station_id, Tank.fuel_type)
+    if request.args.get('station_id'):
+        query = query.filter(Tank.station_id == request.args.get('station_id', type=int))
+    return jsonify([tank.to_dict() for tank in query])
+
+@app.route("/tanks/<int:id>", methods=["GET"])
+def get_tank(id):
+    tank = Tank.query.get_or_404(id)
+    return jsonify(tank.to_dict())
+
+@app.route("/tanks", methods=["POST"])
+@response_cache.invalidates('tanks')
+def create_tank():
+    data = request.get_json()
+    try:
+        level = float(data.get("level_litres", 0))
+        tank = Tank(
+            station_id=data["station_id"],
+            fuel_type=data["fuel_type"],
+            capacity_litres=float(data["capacity_litres"]),
+            low_level_litres=float(data.get("low_level_litres", 0)),
+            level_litres=level,
+            opening_litres=level,
+            # Sales already recorded predate the tank and never drew from it
+            opening_sale_id=db.session.scalar(select(db.func.max(Sale.id))) or 0
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'message': f"Invalid tank: {e}"}), 400
+    tank.is_low = tank.level_litres <= tank.low_level_litres
+    tank.low_since = datetime.utcnow() if tank.is_low else None
+    db.session.add(tank)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'message': 'This station already has a tank for that fuel type'}), 400
+    return jsonify(tank.to_dict()), 201
+
+@app.route("/tanks/<int:id>", methods=["PATCH"])
+@response_cache.invalidates('tanks')
+def update_tank(id):
+    tank = Tank.query.get_or_404(id)
+    data = request.get_json()
+    try:
+        if "capacity_litres" in data:
+            tank.capacity_litres = float(data["capacity_litres"])
+        if "low_level_litres" in data:
+            tank.low_level_litres = float(data["low_level_litres"])
+    except (TypeError, ValueError) as e:
+        return jsonify({'message': f"Invalid tank: {e}"}), 400
+    is_low = tank.level_litres <= tank.low_level_litres
+    if is_low != tank.is_low:
+        tank.is_low = is_low
+        tank.low_since = datetime.utcnow() if is_low else None
+    tank.updated_at = datetime.utcnow()
+    db.session.commit()
+    return jsonify(tank.to_dict())
+
+@app.route("/tanks/<int:id>", methods=["DELETE"])
+@response_cache.invalidates('tanks')
+def delete_tank(id):
+    tank = Tank.query.get_or_404(id)
+    db.session.delete(tank)
+    db.session.commit()
+    return "", 204
+
+@app.route("/tanks/<int:id>/deliveries", methods=["GET"])
+def get_tank_deliveries(id):
+    tank = Tank.query.get_or_404(id)
+    deliveries = sorted(tank.deliveries, key=lambda delivery: delivery.delivered_at, reverse=True)
+    return jsonify([delivery.to_dict() for delivery in deliveries])
+
+@app.route("/tanks/<int:id>/deliveries", methods=["POST"])
+@response_cache.invalidates('tanks')
+def create_delivery(id):
+    tank = Tank.query.get_or_404(id)
+    data = request.get_json()
+    try:
+        litres = float(data["litres"])
+        if litres <= 0:
+            raise ValueError("litres must be greater than zero")
+        delivered_at = parse_datetime(data.get("delivered_at"), "delivered_at")
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'message': f"Invalid delivery: {e}"}), 400
+    delivery = receive_delivery(tank, litres, delivered_at, data.get("reference"))
+    db.session.commit()
+    db.session.refresh(tank)
+    return jsonify({'delivery': delivery.to_dict(), 'tank': tank.to_dict()}), 201
+
+
 # DASHBOARD API ENDPOINT
 @app.route("/dashboard", methods=["GET"])
+@response_cache.cached('stations', 'pumps', 'staff', 'sales', 'tanks')
+@replica_router.replica_reads
 def get_dashboard_data():
     try:
-        # Get basic counts
-        total_stations = Station.query.filter_by(is_active=True).count()
-        total_staff = Staff.query.filter_by(is_active=True).count()
-        total_pumps = Pump.query.count()
-        total_sales = Sale.query.count()
-        
-        # Get recent sales (last 10)
-        recent_sales = Sale.query.order_by(Sale.sale_timestamp.desc()).limit(10).all()
-        
-        # Calculate total revenue and litres
-        total_revenue = db.session.query(db.func.sum(Sale.total_amount)).scalar() or 0
-        total_litres = db.session.query(db.func.sum(Sale.litres)).scalar() or 0
-        
-        # Calculate average price per litre
-        avg_price_per_litre = db.session.query(db.func.avg(Sale.price_per_litre)).scalar() or 0
-        
-        # Get stations with their pump and staff counts
-        stations_data = []
-        stations = Station.query.filter_by(is_active=True).all()
-        for station in stations:
-            stations_data.append({
-                'name': station.name,
-                'pumps': len(station.pumps),
-                'staff': len(station.staff),
-                'sales': len([sale for pump in station.pumps for sale in pump.sales])
-            })
-        
-        # Fuel type distribution (mock for now since we don't have inventory)
-        fuel_types = ['Regular', 'Premium', 'Diesel']
-        fuel_type_data = []
-        for fuel_type in fuel_types:
-            pump_count = Pump.query.filter_by(fuel_type=fuel_type).count()
-            fuel_type_data.append({
-                'name': fuel_type,
-                'value': pump_count,
-                'color': '#3B82F6' if fuel_type == 'Regular' else '#10B981' if fuel_type == 'Premium' else '#F59E0B'
-            })
-        
+        # One grouped query per dimension; no sale rows are loaded except the
+        # ten shown in the recent activity feed
+        totals = headline_totals()
+        recent_sales = sale_shape()
+        recent_rows = sales_query(recent_sales).order_by(Sale.sale_timestamp.desc()).limit(10)
+
         dashboard_data = {
-            'totalRevenue': float(total_revenue),
-            'totalLitres': float(total_litres) if total_litres else 0,
-            'totalStations': total_stations,
-            'totalStaff': total_staff,
-            'totalPumps': total_pumps,
-            'todaySales': total_sales,
-            'avgPricePerLitre': float(avg_price_per_litre) if avg_price_per_litre else 0,
-            'recentSales': [sale.to_dict() for sale in recent_sales],
-            'fuelTypeData': fuel_type_data,
-            'topStations': stations_data[:5],  # Top 5 stations
-            'lowStockAlerts': []  # Empty for now, can be populated later
+            'totalRevenue': totals['revenue'],
+            'totalLitres': totals['litres'],
+            'totalStations': totals['stations'],
+            'totalStaff': totals['staff'],
+            'totalPumps': totals['pumps'],
+            'todaySales': totals['sales'],
+            'avgPricePerLitre': totals['avg_price'],
+            'recentSales': recent_sales.build_all(recent_rows),
+            'fuelTypeData': fuel_type_distribution(),
+            'topStations': station_summaries(limit=5),  # Top 5 stations
+            'lowStockAlerts': low_stock_alerts()
         }
         
         return jsonify(dashboard_data)
@@ -0,0 +1,223 @@
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import Column, Index, MetaData, Table, and_, delete, exists, func, insert, select, text, union_all
+from sqlalchemy.orm import aliased
+
+from models import db, Sale, SalesArchiveMonth, UserSale
+
+# Sales older than the retention horizon move here a calendar month at a
+# time. On Postgres `sales_archive` is natively partitioned by month, so a
+# time-range query only touches the partitions it overlaps; on SQLite each
+# month gets its own sales_archive_YYYY_MM table. The hot `sales` table
+# keeps only recent history, and the rollups keep covering every month.
+ARCHIVE_TABLE = 'sales_archive'
+
+_metadata = MetaData()
+_SALE_COLUMNS = [column.name for column in Sale.__table__.columns]
+
+
+def month_start(moment):
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(moment):
+    start = month_start(moment)
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+def archive_horizon(now=None):
+    """Start of the oldest month kept in `sales`; anything before it may be archived."""
+    now = now or datetime.utcnow()
+    return month_start(now - timedelta(days=current_app.config.get('SALES_ARCHIVE_AFTER_DAYS', 365)))
+
+
+def _archive_table(name):
+    """Table with the columns of `sales`, no constraints; the Postgres parent is partitioned."""
+    table = _metadata.tables.get(name)
+    if table is None:
+        options = {'postgresql_partition_by': 'RANGE (sale_timestamp)'} if name == ARCHIVE_TABLE else {}
+        columns = [
+            Column(column.name, column.type, nullable=column.nullable)
+            for column in Sale.__table__.columns
+        ]
+        table = Table(
+            name, _metadata, *columns,
+            Index(f'ix_{name}_timestamp_id', 'sale_timestamp', 'id'),
+            Index(f'ix_{name}_pump_timestamp', 'pump_id', 'sale_timestamp'),
+            Index(f'ix_{name}_id', 'id'),
+            **options
+        )
+    return table
+
+
+def _storage_for(month):
+    """Create the archive storage for `month` if needed; returns (insert target, storage name)."""
+    connection = db.session.connection()
+    name = f'{ARCHIVE_TABLE}_{month:%Y_%m}'
+    if connection.dialect.name == 'postgresql':
+        parent = _archive_table(ARCHIVE_TABLE)
+        parent.create(connection, checkfirst=True)
+        connection.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {ARCHIVE_TABLE} "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month(month):%Y-%m-%d}')"
+        ))
+        return parent, name
+    table = _archive_table(name)
+    table.create(connection, checkfirst=True)
+    return table, name
+
+
+def archived_months(start=None, end=None):
+    """(month, storage name) for archived months overlapping [start, end), oldest first."""
+    query = select(SalesArchiveMonth.month, SalesArchiveMonth.table_name).order_by(SalesArchiveMonth.month)
+    if end is not None:
+        query = query.where(SalesArchiveMonth.month < end)
+    months = db.session.execute(query).all()
+    if start is not None:
+        months = [(month, name) for month, name in months if next_month(month) > start]
+    return months
+
+
+def _archive_selects(months, start, end):
+    """SELECTs with the columns of `sales` over the archive storage for `months`."""
+    def bounded(table, low, high):
+        stmt = select(*[table.c[name] for name in _SALE_COLUMNS])
+        if low is not None:
+            stmt = stmt.where(table.c.sale_timestamp >= low)
+        if high is not None:
+            stmt = stmt.where(table.c.sale_timestamp < high)
+        return stmt
+
+    if db.engine.dialect.name == 'postgresql':
+        # One SELECT on the parent; its range bounds let the planner prune partitions
+        low = months[0][0] if start is None else max(start, months[0][0])
+        high = next_month(months[-1][0]) if end is None else min(end, next_month(months[-1][0]))
+        return [bounded(_archive_table(ARCHIVE_TABLE), low, high)]
+    return [bounded(_archive_table(name), start, end) for _, name in months]
+
+
+def sales_source(start=None, end=None, include_archive=None):
+    """
+    `Sale` itself, or an alias of it over `sales` plus the archived months
+    overlapping [start, end) when the range reaches past the archive horizon.
+    Ranges that start after the horizon never touch the archive (nor the
+    registry table), so recent-data queries scan only the hot table. Pass
+    include_archive=True to span all of history when there is no start.
+    """
+    if include_archive is None:
+        include_archive = start is not None and start < archive_horizon()
+    if not include_archive:
+        return Sale
+    months = archived_months(start, end)
+    if not months:
+        return Sale
+
+    hot = Sale.__table__
+    hot_select = select(*[hot.c[name] for name in _SALE_COLUMNS])
+    if start is not None:
+        hot_select = hot_select.where(hot.c.sale_timestamp >= start)
+    if end is not None:
+        hot_select = hot_select.where(hot.c.sale_timestamp < end)
+    spanned = union_all(hot_select, *_archive_selects(months, start, end)).subquery('sales_span')
+    return aliased(Sale, spanned)
+
+
+def export_segments(start=None, end=None):
+    """
+    Consecutive (start, end, source) ranges covering [start, end) in time
+    order: one per archived month, then the hot table from the last one on.
+    Exports walk them in turn so each ORDER BY sorts a month at most instead
+    of the union of all history.
+    """
+    include_archive = start is None or start < archive_horizon()
+    months = archived_months(start, end) if include_archive else []
+    segments = []
+    cursor = start
+    for month, _ in months:
+        month_end = next_month(month)
+        low = month if cursor is None else max(cursor, month)
+        high = month_end if end is None else min(end, month_end)
+        if cursor is None or cursor < month:
+            # Late sales older than the first archived month still sit in `sales`
+            segments.append((cursor, low, Sale))
+        segments.append((low, high, sales_source(low, high, include_archive=True)))
+        cursor = high
+    segments.append((cursor, end, Sale))
+    return segments
+
+
+def forget_archived_sales(pump_ids):
+    """Delete the archived sales of pumps that are being deleted."""
+    pump_ids = list(pump_ids)
+    if not pump_ids:
+        return
+    months = archived_months()
+    if not months:
+        return
+    if db.engine.dialect.name == 'postgresql':
+        tables = [_archive_table(ARCHIVE_TABLE)]
+    else:
+        tables = [_archive_table(name) for _, name in months]
+    for table in tables:
+        db.session.execute(delete(table).where(table.c.pump_id.in_(pump_ids)))
+
+
+def archive_sales(now=None, dry_run=False):
+    """
+    Move every whole month of sales older than the archive horizon out of
+    `sales`, one transaction per month. Rollups are left alone, so totals
+    and charts still cover archived months. Sales linked to users stay in
+    `sales` (user_sales references them). Returns a summary per month.
+    """
+    horizon = archive_horizon(now)
+    oldest = db.session.scalar(select(func.min(Sale.sale_timestamp)).where(Sale.sale_timestamp < horizon))
+    if oldest is None:
+        return []
+
+    # Sales inserted while the job runs are left for the next run
+    last_id = db.session.scalar(select(func.max(Sale.id)))
+    linked = exists().where(UserSale.sale_id == Sale.id)
+    summary = []
+    month = month_start(oldest)
+    while month < horizon:
+        moving = and_(
+            Sale.sale_timestamp >= month,
+            Sale.sale_timestamp < next_month(month),
+            Sale.id <= last_id,
+            ~linked,
+        )
+        count = db.session.scalar(select(func.count()).select_from(Sale).where(moving))
+        if count and not dry_run:
+            target, name = _storage_for(month)
+            db.session.execute(insert(target).from_select(
+                _SALE_COLUMNS, select(*[Sale.__table__.c[column] for column in _SALE_COLUMNS]).where(moving)
+            ))
+            db.session.execute(delete(Sale).where(moving).execution_options(synchronize_session=False))
+            record = SalesArchiveMonth.query.filter_by(month=month).first()
+            if record is None:
+                db.session.add(SalesArchiveMonth(month=month, table_name=name, sale_count=count))
+            else:
+                record.sale_count += count
+                record.archived_at = datetime.utcnow()
+            db.session.commit()
+        if count:
+            summary.append({'month': f'{month:%Y-%m}', 'sales': count})
+        month = next_month(month)
+    return summary
+
+
+@click.command('archive-sales')
+@click.option('--dry-run', is_flag=True, help='Report what would move without moving it.')
+@with_appcontext
+def archive_sales_command(dry_run):
+    """Move sales older than SALES_ARCHIVE_AFTER_DAYS into monthly archive storage."""
+    summary = archive_sales(dry_run=dry_run)
+    for item in summary:
+        click.echo(f"{'would archive' if dry_run else 'archived'} {item['sales']} sales from {item['month']}")
+    if not summary:
+        click.echo(f"Nothing older than {archive_horizon():%Y-%m} to archive")
@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from models import db, User
+
+# Columns copied into the cache; enough to rebuild a User for the views
+_USER_COLUMNS = [column.key for column in User.__table__.columns]
+
+
+class _TTLMap:
+    """Small thread-safe LRU map whose entries expire after `ttl` seconds."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class AuthCache:
+    """
+    Remembers decoded token claims and the state of active users so that
+    token_required can skip the HS256 decode and the user SELECT on repeat
+    requests. Deactivations, role changes and deletions evict the user as
+    soon as they are flushed in this process; AUTH_CACHE_TTL bounds how long
+    other workers may keep serving the old state.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self._claims = self._users = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        ttl = app.config.get("AUTH_CACHE_TTL", 60)
+        max_entries = app.config.get("AUTH_CACHE_MAX_ENTRIES", 10000)
+        self.enabled = ttl > 0
+        self._claims = _TTLMap(max_entries, ttl)
+        self._users = _TTLMap(max_entries, ttl)
+        app.extensions["auth_cache"] = self
+
+    def claims(self, token):
+        """Cached claims for `token`, or None. Raises once the token has expired."""
+        if not self.enabled:
+            return None
+        claims = self._claims.get(token)
+        if claims is not None and claims.get("exp", float("inf")) <= time.time():
+            self._claims.pop(token)
+            raise jwt.ExpiredSignatureError("Signature has expired")
+        return claims
+
+    def remember_claims(self, token, claims):
+        if self.enabled:
+            self._claims.put(token, claims)
+
+    def forget_token(self, token):
+        if self._claims is not None:
+            self._claims.pop(token)
+
+    def user(self, user_id):
+        """
+        A persistent User attached to the current session without a query,
+        or None when the user is not cached.
+        """
+        if not self.enabled:
+            return None
+        values = self._users.get(user_id)
+        if values is None:
+            return None
+        user = User(**values)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    def remember_user(self, user):
+        if self.enabled and user.is_active:
+            self._users.put(user.id, {key: getattr(user, key) for key in _USER_COLUMNS})
+
+    def forget_user(self, user_id):
+        if self._users is not None:
+            self._users.pop(user_id)
+
+    def clear(self):
+        if self._claims is not None:
+            self._claims.clear()
+            self._users.clear()
+
+
+auth_cache = AuthCache()
+
+
+@event.listens_for(User, "after_update")
+def _evict_changed_user(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[key].history.has_changes() for key in ("is_active", "role", "email", "name")):
+        auth_cache.forget_user(target.id)
+
+
+@event.listens_for(User, "after_delete")
+def _evict_deleted_user(mapper, connection, target):
+    auth_cache.forget_user(target.id)
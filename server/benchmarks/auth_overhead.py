@@ -0,0 +1,69 @@
+"""
+Authenticated-request overhead with and without the token_required cache.
+
+    cd server && python -m benchmarks.auth_overhead --requests 2000
+
+Runs against a throwaway SQLite database, so it is safe to point at a
+development checkout.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+
+def measure(client, headers, requests):
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = client.get("/auth/me", headers=headers)
+        timings.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.get_data(as_text=True)
+    timings.sort()
+    return {
+        "mean_us": statistics.fmean(timings) * 1e6,
+        "p50_us": timings[len(timings) // 2] * 1e6,
+        "p99_us": timings[int(len(timings) * 0.99) - 1] * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    database = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+    database.close()
+    os.environ["DATABASE_URL"] = f"sqlite:///{database.name}"
+    os.environ["RESPONSE_CACHE_BACKEND"] = "none"
+
+    from app import app, db
+    from auth_cache import auth_cache
+    from query_budget import count_queries
+
+    try:
+        with app.app_context():
+            db.create_all()
+            engine = db.engine
+        client = app.test_client()
+        token = client.post("/auth/register", json={
+            "name": "Bench User", "email": "bench@example.com", "password": "bench-password"
+        }).get_json()["token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        for label, enabled in (("uncached", False), ("cached", True)):
+            auth_cache.enabled = enabled
+            auth_cache.clear()
+            measure(client, headers, 50)  # warm up
+            with count_queries(engine) as statements:
+                client.get("/auth/me", headers=headers)
+            stats = measure(client, headers, args.requests)
+            print(f"{label:<9} mean {stats['mean_us']:8.1f}us  p50 {stats['p50_us']:8.1f}us  "
+                  f"p99 {stats['p99_us']:8.1f}us  {len(statements)} SQL per request")
+    finally:
+        os.unlink(database.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Concurrent read/write throughput under several gunicorn workers.
+
+    cd server
+    python -m benchmarks.concurrency --workers 4 --readers 16 --writers 4 --duration 15
+
+Starts gunicorn once per SQLite configuration (by default the old
+rollback-journal setup, DELETE/FULL, against WAL/NORMAL) on a fresh copy of
+the benchmark dataset, then runs reader threads (sale pages and the
+dashboard) alongside writer threads posting sales for --duration seconds and
+reports throughput, latency percentiles and errors (busy/locked responses)
+for each side.
+"""
+import argparse
+import json
+import os
+import signal
+import sqlite3
+import subprocess
+import threading
+import time
+import urllib.request
+
+from benchmarks.endpoints import (
+    DATASET_END, SERVER_DIR, Request, _free_port, percentile, prepare_database, send_http,
+)
+
+READS = [Request('GET', '/sales?limit=100'), Request('GET', '/dashboard'), Request('GET', '/stations')]
+
+
+def run_mode(args, journal_mode, synchronous):
+    database_path = prepare_database(args)
+    # Convert the copy up front; switching from WAL needs the only connection
+    with sqlite3.connect(database_path) as connection:
+        connection.execute(f'PRAGMA journal_mode = {journal_mode}')
+        pump_ids = [row[0] for row in connection.execute('SELECT id FROM pumps')]
+
+    port = _free_port()
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{database_path}', RESPONSE_CACHE_BACKEND='none',
+               SQLITE_JOURNAL_MODE=journal_mode, SQLITE_SYNCHRONOUS=synchronous)
+    server = subprocess.Popen(
+        ['gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}', '--workers', str(args.workers),
+         '--threads', str(args.threads), '--log-level', 'warning'],
+        cwd=SERVER_DIR, env=env
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(base_url + '/', timeout=1).read()
+                break
+            except OSError:
+                time.sleep(0.1)
+        else:
+            raise RuntimeError('gunicorn did not start')
+
+        timings = {'read': [], 'write': []}
+        errors = {'read': 0, 'write': 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + args.duration
+
+        def worker(kind, index):
+            count = 0
+            while time.perf_counter() < deadline:
+                if kind == 'read':
+                    request = READS[(index + count) % len(READS)]
+                else:
+                    request = Request('POST', '/sales', json_body={
+                        'fuelType': 'Diesel', 'litres': 20, 'pricePerLitre': 171.5,
+                        'pumpId': pump_ids[(index + count) % len(pump_ids)],
+                        'saleTimestamp': (DATASET_END).isoformat(),
+                    })
+                began = time.perf_counter()
+                status = send_http(base_url, request)
+                duration = time.perf_counter() - began
+                count += 1
+                with lock:
+                    timings[kind].append(duration)
+                    errors[kind] += status >= 400
+
+        threads = [threading.Thread(target=worker, args=('read', i)) for i in range(args.readers)]
+        threads += [threading.Thread(target=worker, args=('write', i)) for i in range(args.writers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(database_path + suffix):
+                os.unlink(database_path + suffix)
+
+    result = {}
+    for kind in ('read', 'write'):
+        values = sorted(timings[kind])
+        result[kind] = {
+            'requests': len(values),
+            'errors': errors[kind],
+            'throughput_rps': round(len(values) / elapsed, 1),
+            'p50_ms': round(percentile(values, 0.50) * 1000, 2) if values else None,
+            'p95_ms': round(percentile(values, 0.95) * 1000, 2) if values else None,
+            'p99_ms': round(percentile(values, 0.99) * 1000, 2) if values else None,
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent read/write throughput per SQLite configuration.')
+    parser.add_argument('--stations', type=int, default=10)
+    parser.add_argument('--pumps-per-station', type=int, default=4)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--rate', type=float, default=2.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--regenerate', action='store_true', help='Rebuild the cached dataset.')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers.')
+    parser.add_argument('--threads', type=int, default=4, help='gunicorn threads per worker.')
+    parser.add_argument('--readers', type=int, default=16, help='Concurrent reading clients.')
+    parser.add_argument('--writers', type=int, default=4, help='Concurrent writing clients.')
+    parser.add_argument('--duration', type=float, default=15, help='Seconds per configuration.')
+    parser.add_argument('--modes', default='DELETE:FULL,WAL:NORMAL',
+                        help='Comma-separated journal_mode:synchronous pairs to compare.')
+    parser.add_argument('--output', default=None, help='Where to write the JSON results.')
+    args = parser.parse_args()
+
+    results = {}
+    for mode in args.modes.split(','):
+        journal_mode, synchronous = mode.split(':')
+        results[mode] = run_mode(args, journal_mode, synchronous)
+        for kind in ('read', 'write'):
+            stats = results[mode][kind]
+            print(f"{mode:<14} {kind:<6} {stats['throughput_rps']:>8.1f} req/s  p50 {stats['p50_ms']:>8.2f}ms  "
+                  f"p95 {stats['p95_ms']:>8.2f}ms  p99 {stats['p99_ms']:>8.2f}ms  {stats['errors']} errors")
+
+    output = args.output or os.path.join(SERVER_DIR, 'instance', 'bench-concurrency-latest.json')
+    with open(output, 'w') as handle:
+        json.dump({'workers': args.workers, 'threads': args.threads, 'readers': args.readers,
+                   'writers': args.writers, 'duration': args.duration, 'modes': results}, handle, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,532 @@
+"""
+Endpoint benchmark suite.
+
+    cd server
+    python -m benchmarks.endpoints                        # Flask test client
+    python -m benchmarks.endpoints --mode gunicorn        # real HTTP through gunicorn
+    python -m benchmarks.endpoints --output base.json     # on the base commit, then
+    python -m benchmarks.endpoints --compare base.json    # on the change, same machine
+
+Loads a generated dataset (cached under instance/ per size and schema,
+and copied for each run, so writes never leak between runs), drives every
+route in app.py and records p50/p95/p99 latency, throughput, SQL statements per request and
+peak memory per endpoint. Results are written as JSON. The run fails when
+any scenario answers with an error status, since its timings would measure
+the error path; with --compare it also fails when an endpoint's p50 and p95
+both grow past --threshold (default 25%) or it issues more SQL statements
+than the baseline. Latencies only compare on the same machine, so the pull
+request workflow benchmarks the base commit and the change in one job.
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import resource
+import shutil
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET_END = datetime(2025, 1, 1)
+
+
+class Request:
+    def __init__(self, method, path, json_body=None, data=None, content_type=None, headers=None):
+        self.method = method
+        self.path = path
+        self.json_body = json_body
+        self.data = data
+        self.content_type = content_type
+        self.headers = headers or {}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+# SCENARIOS
+# Each scenario prepares `count` requests up front (creating any rows they
+# need) so that setup is never part of the timed section.
+
+def build_scenarios(ctx):
+    from app import db, issue_token
+    from models import Pump, Sale, Staff, Station, User
+    from sqlalchemy import func, insert, select
+
+    def first_id(model):
+        return db.session.query(func.min(model.id)).scalar()
+
+    def new_sales(count):
+        pump_id = first_id(Pump)
+        rows = [{
+            'fuel_type': 'Diesel', 'litres': 20.0, 'price_per_litre': 170.0, 'total_amount': 3400.0,
+            'pump_id': pump_id, 'sale_timestamp': DATASET_END - timedelta(minutes=i),
+        } for i in range(count)]
+        db.session.execute(insert(Sale), rows)
+        db.session.commit()
+        return db.session.scalars(select(Sale.id).order_by(Sale.id.desc()).limit(count)).all()
+
+    def new_rows(model, count, **values):
+        stamp = time.time_ns()
+        rows = []
+        for i in range(count):
+            row = {key: (value.format(i=i, stamp=stamp) if isinstance(value, str) else value)
+                   for key, value in values.items()}
+            rows.append(row)
+        db.session.execute(insert(model), rows)
+        db.session.commit()
+        return db.session.scalars(select(model.id).order_by(model.id.desc()).limit(count)).all()
+
+    station_id, pump_id, staff_id = first_id(Station), first_id(Pump), first_id(Staff)
+    sale_id = first_id(Sale)
+    user = User.query.filter_by(email='bench@petroltracker.com').first()
+    token = issue_token(user)
+    auth = {'Authorization': f'Bearer {token}'}
+    week = (DATASET_END - timedelta(days=7)).isoformat()
+    day = (DATASET_END - timedelta(days=1)).isoformat()
+    end = DATASET_END.isoformat()
+    sale_payload = {'fuelType': 'Diesel', 'litres': 25, 'pricePerLitre': 171.5, 'pumpId': pump_id}
+
+    def repeat(request):
+        return lambda count: [request] * count
+
+    scenarios = {
+        'GET /': repeat(Request('GET', '/')),
+        'GET /auth/me': repeat(Request('GET', '/auth/me', headers=auth)),
+        'POST /auth/login': repeat(Request('POST', '/auth/login', json_body={
+            'email': 'bench@petroltracker.com', 'password': 'bench-password'})),
+        'POST /auth/register': lambda count: [Request('POST', '/auth/register', json_body={
+            'name': 'Bench', 'email': f'bench-{time.time_ns()}-{i}@example.com', 'password': 'pw'})
+            for i in range(count)],
+        'POST /auth/logout': lambda count: [Request('POST', '/auth/logout', headers={
+            'Authorization': f'Bearer {issue_token(user)}'}) for _ in range(count)],
+        'GET /sales': repeat(Request('GET', '/sales')),
+        'GET /sales?limit=1000': repeat(Request('GET', '/sales?limit=1000')),
+        'GET /sales?station_id': repeat(Request('GET', f'/sales?station_id={station_id}&start={week}')),
+        'GET /sales/<id>': repeat(Request('GET', f'/sales/{sale_id}')),
+        'POST /sales': repeat(Request('POST', '/sales', json_body=sale_payload)),
+        'POST /sales/batch': repeat(Request('POST', '/sales/batch', json_body=[
+            {**sale_payload, 'saleTimestamp': (DATASET_END - timedelta(seconds=i)).isoformat()}
+            for i in range(500)])),
+        'PATCH /sales/<id>': lambda count: [Request('PATCH', f'/sales/{i}', json_body={'litres': 30})
+                                            for i in new_sales(count)],
+        'DELETE /sales/<id>': lambda count: [Request('DELETE', f'/sales/{i}') for i in new_sales(count)],
+        'POST /sales/<id>/add_user': lambda count: [Request('POST', f'/sales/{i}/add_user',
+                                                            json_body={'user_id': user.id})
+                                                    for i in new_sales(count)],
+        'GET /sales/export': repeat(Request('GET', f'/sales/export?format=csv&start={day}&end={end}')),
+        'GET /sales/timeseries': repeat(Request(
+            'GET', f'/sales/timeseries?interval=hour&group_by=station&start={week}&end={end}')),
+        'GET /sales/by-station': repeat(Request('GET', '/sales/by-station')),
+        'GET /pumps': repeat(Request('GET', '/pumps')),
+        'GET /pumps/<id>': repeat(Request('GET', f'/pumps/{pump_id}')),
+        'POST /pumps': repeat(Request('POST', '/pumps', json_body={
+            'pump_number': 'Pump 99', 'fuel_type': 'Diesel', 'station_id': station_id})),
+        'PATCH /pumps/<id>': repeat(Request('PATCH', f'/pumps/{pump_id}', json_body={'fuel_type': 'Diesel'})),
+        'DELETE /pumps/<id>': lambda count: [Request('DELETE', f'/pumps/{i}') for i in new_rows(
+            Pump, count, pump_number='Pump 98', fuel_type='Diesel', station_id=station_id)],
+        'GET /stations': repeat(Request('GET', '/stations')),
+        'GET /stations/<id>': repeat(Request('GET', f'/stations/{station_id}')),
+        'POST /stations': lambda count: [Request('POST', '/stations', json_body={
+            'name': f'Bench Station {time.time_ns()}-{i}', 'location': 'Bench'}) for i in range(count)],
+        'PATCH /stations/<id>': repeat(Request('PATCH', f'/stations/{station_id}', json_body={'location': 'Bench'})),
+        'DELETE /stations/<id>': lambda count: [Request('DELETE', f'/stations/{i}') for i in new_rows(
+            Station, count, name='Doomed {stamp}-{i}', location='Bench', is_active=True)],
+        'GET /staff': repeat(Request('GET', '/staff')),
+        'GET /staff/<id>': repeat(Request('GET', f'/staff/{staff_id}')),
+        'POST /staff': repeat(Request('POST', '/staff', json_body={
+            'name': 'Bench Staff', 'role': 'Attendant', 'station_id': station_id})),
+        'PATCH /staff/<id>': repeat(Request('PATCH', f'/staff/{staff_id}', json_body={'role': 'Cashier'})),
+        'DELETE /staff/<id>': lambda count: [Request('DELETE', f'/staff/{i}') for i in new_rows(
+            Staff, count, name='Bench Staff', role='Attendant', station_id=station_id, is_active=True)],
+        'GET /dashboard': repeat(Request('GET', '/dashboard')),
+    }
+    return scenarios
+
+
+# The live stream is long-lived and measured by benchmarks/stream.py; /metrics
+# only exists with PROFILING_ENABLED, which would instrument every other route
+UNTIMED_ROUTES = {('GET', '/sales/stream'), ('GET', '/metrics')}
+
+
+def uncovered_routes(app, scenarios):
+    """Routes in the URL map that no scenario exercises."""
+    covered = set(UNTIMED_ROUTES)
+    for name in scenarios:
+        method, path = name.split(' ', 1)
+        covered.add((method, path.split('?')[0]))
+    missing = []
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint == 'static':
+            continue
+        path = rule.rule.replace('<int:id>', '<id>').replace('<int:sale_id>', '<id>')
+        for method in sorted(rule.methods - {'HEAD', 'OPTIONS'}):
+            if (method, path) not in covered:
+                missing.append(f'{method} {path}')
+    return missing
+
+
+# DATASET
+
+def schema_fingerprint():
+    """A short hash of the models' SQLite DDL, so a cached dataset is rebuilt after a schema change."""
+    from sqlalchemy.dialects import sqlite
+    from sqlalchemy.schema import CreateIndex, CreateTable
+    from models import db
+
+    dialect = sqlite.dialect()
+    ddl = []
+    for table in db.metadata.sorted_tables:
+        ddl.append(str(CreateTable(table).compile(dialect=dialect)))
+        ddl += sorted(str(CreateIndex(index).compile(dialect=dialect)) for index in table.indexes)
+    return hashlib.sha1('\n'.join(ddl).encode()).hexdigest()[:8]
+
+
+def prepare_database(args):
+    """Generate (or reuse) the dataset for these parameters and return a scratch copy."""
+    cache_dir = os.path.join(SERVER_DIR, 'instance')
+    os.makedirs(cache_dir, exist_ok=True)
+    name = (f'bench-{args.stations}s-{args.pumps_per_station}p-{args.days}d-{args.rate}r-{args.seed}'
+            f'-{schema_fingerprint()}.db')
+    cached = os.path.join(cache_dir, name)
+    if not os.path.exists(cached) or args.regenerate:
+        subprocess.run(
+            [sys.executable, '-m', 'benchmarks.endpoints', '--_generate', cached,
+             '--stations', str(args.stations), '--pumps-per-station', str(args.pumps_per_station),
+             '--days', str(args.days), '--rate', str(args.rate), '--seed', str(args.seed)],
+            cwd=SERVER_DIR, check=True
+        )
+    scratch = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    scratch.close()
+    shutil.copyfile(cached, scratch.name)
+    return scratch.name
+
+
+def generate_into(path, args):
+    if os.path.exists(path):
+        os.unlink(path)
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    from app import app, db
+    from generate import generate_dataset
+    from models import User
+    from werkzeug.security import generate_password_hash
+
+    with app.app_context():
+        db.create_all()
+        summary = generate_dataset(args.stations, args.pumps_per_station, args.days, args.rate, args.seed, DATASET_END)
+        db.session.add(User(name='Bench User', email='bench@petroltracker.com',
+                            password_hash=generate_password_hash('bench-password'), role='admin'))
+        db.session.commit()
+    print(f"Generated dataset: {summary}")
+
+
+# RUNNERS
+
+def summarize(timings, elapsed, errors, queries=None, peak_rss_kb=None, peak_alloc_kb=None):
+    timings = sorted(timings)
+    return {
+        'requests': len(timings),
+        'errors': errors,
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 3) if timings else None,
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 3) if timings else None,
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 3) if timings else None,
+        'mean_ms': round(statistics.fmean(timings) * 1000, 3) if timings else None,
+        'throughput_rps': round(len(timings) / elapsed, 1) if elapsed else None,
+        'queries_per_request': queries,
+        'peak_rss_kb': peak_rss_kb,
+        'peak_alloc_kb': peak_alloc_kb,
+    }
+
+
+def run_in_process(app, scenarios, args):
+    from app import db
+    from query_budget import count_queries
+
+    client = app.test_client()
+    with app.app_context():
+        engine = db.engine
+
+    results = {}
+    for name, prepare in scenarios.items():
+        if args.only and args.only not in name:
+            continue
+        with app.app_context():
+            requests = prepare(args.requests + args.warmup)
+        # Allocation tracing slows every call down, so it only runs over the warmup
+        tracemalloc.start()
+        for request in requests[:args.warmup]:
+            send_test_client(client, request)
+        _, peak_alloc = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        timings, errors, statements = [], 0, 0
+        started = time.perf_counter()
+        for request in requests[args.warmup:]:
+            with count_queries(engine) as executed:
+                began = time.perf_counter()
+                status = send_test_client(client, request)
+                timings.append(time.perf_counter() - began)
+            statements += len(executed)
+            errors += status >= 400
+        elapsed = time.perf_counter() - started
+
+        results[name] = summarize(
+            timings, elapsed, errors,
+            queries=round(statements / max(len(timings), 1), 2),
+            peak_rss_kb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            peak_alloc_kb=peak_alloc // 1024,
+        )
+        print_result(name, results[name])
+    return results
+
+
+def send_test_client(client, request):
+    response = client.open(request.path, method=request.method, json=request.json_body,
+                           data=request.data, content_type=request.content_type, headers=request.headers)
+    response.get_data()
+    return response.status_code
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _children(pid):
+    children = []
+    for entry in os.listdir('/proc') if os.path.isdir('/proc') else []:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as stat:
+                if int(stat.read().rsplit(')', 1)[1].split()[1]) == pid:
+                    children.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    return children
+
+
+def _peak_rss_kb(pids):
+    peaks = []
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/status') as status:
+                for line in status:
+                    if line.startswith('VmHWM:'):
+                        peaks.append(int(line.split()[1]))
+        except OSError:
+            continue
+    return max(peaks) if peaks else None
+
+
+def send_http(base_url, request):
+    body, headers = None, dict(request.headers)
+    if request.json_body is not None:
+        body = json.dumps(request.json_body).encode()
+        headers['Content-Type'] = 'application/json'
+    elif request.data is not None:
+        body = request.data.encode() if isinstance(request.data, str) else request.data
+        headers['Content-Type'] = request.content_type
+    http_request = urllib.request.Request(base_url + request.path, data=body, headers=headers, method=request.method)
+    try:
+        with urllib.request.urlopen(http_request, timeout=60) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code
+
+
+def run_gunicorn(app, scenarios, args, database_path):
+    port = _free_port()
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{database_path}')
+    server = subprocess.Popen(
+        ['gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}', '--workers', str(args.workers),
+         '--threads', str(args.threads), '--log-level', 'warning'],
+        cwd=SERVER_DIR, env=env
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(base_url + '/', timeout=1).read()
+                break
+            except OSError:
+                time.sleep(0.1)
+        else:
+            raise RuntimeError('gunicorn did not start')
+
+        results = {}
+        for name, prepare in scenarios.items():
+            if args.only and args.only not in name:
+                continue
+            with app.app_context():
+                requests = prepare(args.requests + args.warmup)
+            for request in requests[:args.warmup]:
+                send_http(base_url, request)
+
+            timings, errors = [], 0
+            lock = threading.Lock()
+
+            def timed(request):
+                nonlocal errors
+                began = time.perf_counter()
+                status = send_http(base_url, request)
+                duration = time.perf_counter() - began
+                with lock:
+                    timings.append(duration)
+                    errors += status >= 400
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(args.concurrency) as pool:
+                list(pool.map(timed, requests[args.warmup:]))
+            elapsed = time.perf_counter() - started
+
+            results[name] = summarize(timings, elapsed, errors,
+                                      peak_rss_kb=_peak_rss_kb(_children(server.pid)))
+            print_result(name, results[name])
+        return results
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+
+# REPORTING
+
+def print_result(name, result):
+    queries = result['queries_per_request']
+    print(f"{name:<28} p50 {result['p50_ms']:>9.2f}ms  p95 {result['p95_ms']:>9.2f}ms  "
+          f"p99 {result['p99_ms']:>9.2f}ms  {result['throughput_rps']:>8.1f} req/s  "
+          f"{'' if queries is None else f'{queries:>6.1f} SQL'}"
+          f"{'  ' + str(result['errors']) + ' errors' if result['errors'] else ''}")
+
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """Return human-readable regressions of `results` against `baseline`.
+
+    A slowdown counts only when both p50 and p95 grow by more than `threshold`
+    and by more than `min_delta_ms`: a lone tail outlier (a GC pause, a noisy
+    neighbour) moves p95 alone, while a genuinely slower endpoint moves both.
+    """
+    regressions = []
+    for name, result in results['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if not before:
+            continue
+        slower = []
+        for key in ('p50_ms', 'p95_ms'):
+            if before.get(key) and result.get(key) is not None:
+                ratio = result[key] / before[key]
+                if ratio > 1 + threshold and result[key] - before[key] > min_delta_ms:
+                    slower.append(f"{key[:3]} {before[key]:.2f}ms -> {result[key]:.2f}ms (+{(ratio - 1) * 100:.0f}%)")
+        if len(slower) == 2:
+            regressions.append(f"{name}: {', '.join(slower)}")
+        if before.get('queries_per_request') is not None and result.get('queries_per_request') is not None:
+            if result['queries_per_request'] > before['queries_per_request']:
+                regressions.append(f"{name}: SQL per request {before['queries_per_request']} -> "
+                                   f"{result['queries_per_request']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every API endpoint.')
+    parser.add_argument('--mode', choices=['client', 'gunicorn'], default='client')
+    parser.add_argument('--stations', type=int, default=10)
+    parser.add_argument('--pumps-per-station', type=int, default=4)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--rate', type=float, default=2.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--regenerate', action='store_true', help='Rebuild the cached dataset.')
+    parser.add_argument('--requests', type=int, default=50, help='Timed requests per endpoint.')
+    parser.add_argument('--warmup', type=int, default=3, help='Untimed requests per endpoint (also traced for allocations).')
+    parser.add_argument('--only', help='Run only endpoints whose name contains this text.')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers.')
+    parser.add_argument('--threads', type=int, default=4, help='gunicorn threads per worker.')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent HTTP clients (gunicorn mode).')
+    parser.add_argument('--with-cache', action='store_true', help='Keep the response cache enabled.')
+    parser.add_argument('--output', default=None, help='Where to write the JSON results.')
+    parser.add_argument('--compare', default=None, help='Baseline JSON to gate against.')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Allowed p50/p95 slowdown.')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help='Ignore p95 changes smaller than this.')
+    parser.add_argument('--_generate', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args._generate:
+        generate_into(args._generate, args)
+        return
+
+    database_path = prepare_database(args)
+    os.environ['DATABASE_URL'] = f'sqlite:///{database_path}'
+    if not args.with_cache:
+        os.environ['RESPONSE_CACHE_BACKEND'] = 'none'
+
+    from app import app
+
+    try:
+        with app.app_context():
+            scenarios = build_scenarios(app)
+        missing = uncovered_routes(app, scenarios)
+        if missing:
+            print(f"warning: no benchmark scenario for {', '.join(missing)}")
+
+        if args.mode == 'gunicorn':
+            endpoints = run_gunicorn(app, scenarios, args, database_path)
+        else:
+            endpoints = run_in_process(app, scenarios, args)
+    finally:
+        os.unlink(database_path)
+
+    results = {
+        'meta': {
+            'mode': args.mode,
+            'dataset': {'stations': args.stations, 'pumps_per_station': args.pumps_per_station,
+                        'days': args.days, 'rate': args.rate, 'seed': args.seed},
+            'requests': args.requests,
+            'response_cache': args.with_cache,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'recorded_at': datetime.utcnow().isoformat(timespec='seconds'),
+        },
+        'endpoints': endpoints,
+    }
+    output = args.output or os.path.join(SERVER_DIR, 'instance', f'bench-{args.mode}-latest.json')
+    with open(output, 'w') as handle:
+        json.dump(results, handle, indent=2, sort_keys=True)
+    print(f"Results written to {output}")
+
+    failed = {name: result['errors'] for name, result in endpoints.items() if result['errors']}
+    if failed:
+        print("Scenarios answering with errors:")
+        for name, errors in failed.items():
+            print(f"  {name}: {errors} of {args.requests} requests")
+        sys.exit(1)
+
+    if args.compare:
+        with open(args.compare) as handle:
+            regressions = compare(results, json.load(handle), args.threshold, args.min_delta_ms)
+        if regressions:
+            print("Regressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Sale ingestion throughput: synchronous commits against write-behind.
+
+    cd server
+    python -m benchmarks.ingest --workers 2 --writers 16 --duration 10
+
+Starts gunicorn once with SALES_WRITE_BEHIND off (every POST /sales waits
+for its own COMMIT) and once with it on (the sale is fsynced to the queue
+log, answered with 202 and committed in groups), runs --writers clients
+posting sales for --duration seconds, then stops the server gracefully and
+checks that every acknowledged sale reached the sales table. Reports
+throughput and latency percentiles for each mode.
+--synchronous sets SQLite's synchronous pragma for both runs (FULL makes
+every commit wait for fsync, as on most server databases).
+"""
+import argparse
+import json
+import os
+import shutil
+import signal
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.request
+
+from benchmarks.endpoints import SERVER_DIR, Request, _free_port, percentile, prepare_database, send_http
+
+
+def run_mode(args, write_behind):
+    database_path = prepare_database(args)
+    with sqlite3.connect(database_path) as connection:
+        pump_ids = [row[0] for row in connection.execute('SELECT id FROM pumps')]
+        existing = connection.execute('SELECT count(*) FROM sales').fetchone()[0]
+    log_dir = tempfile.mkdtemp(prefix='sales-log-')
+
+    port = _free_port()
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{database_path}', RESPONSE_CACHE_BACKEND='none',
+               SQLITE_SYNCHRONOUS=args.synchronous, SALES_WRITE_BEHIND=str(write_behind).lower(),
+               SALES_WRITE_BEHIND_DIR=log_dir)
+    server = subprocess.Popen(
+        ['gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}', '--workers', str(args.workers),
+         '--threads', str(args.threads), '--log-level', 'warning'],
+        cwd=SERVER_DIR, env=env
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(base_url + '/', timeout=1).read()
+                break
+            except OSError:
+                time.sleep(0.1)
+        else:
+            raise RuntimeError('gunicorn did not start')
+
+        timings, errors, acknowledged = [], 0, 0
+        lock = threading.Lock()
+        deadline = time.perf_counter() + args.duration
+
+        def writer(index):
+            nonlocal errors, acknowledged
+            count = 0
+            while time.perf_counter() < deadline:
+                request = Request('POST', '/sales', json_body={
+                    'fuelType': 'Diesel', 'litres': 20, 'pricePerLitre': 171.5,
+                    'pumpId': pump_ids[(index + count) % len(pump_ids)],
+                })
+                began = time.perf_counter()
+                status = send_http(base_url, request)
+                duration = time.perf_counter() - began
+                count += 1
+                with lock:
+                    timings.append(duration)
+                    errors += status >= 400
+                    acknowledged += status in (201, 202)
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        # A graceful stop lets each worker commit what it still has queued
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+    with sqlite3.connect(database_path) as connection:
+        stored = connection.execute('SELECT count(*) FROM sales').fetchone()[0] - existing
+    leftover = os.listdir(log_dir)
+    shutil.rmtree(log_dir)
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(database_path + suffix):
+            os.unlink(database_path + suffix)
+
+    values = sorted(timings)
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'acknowledged': acknowledged,
+        'stored': stored,
+        'leftover_log_segments': len(leftover),
+        'throughput_rps': round(len(values) / elapsed, 1),
+        'p50_ms': round(percentile(values, 0.50) * 1000, 2) if values else None,
+        'p95_ms': round(percentile(values, 0.95) * 1000, 2) if values else None,
+        'p99_ms': round(percentile(values, 0.99) * 1000, 2) if values else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sale ingestion with and without write-behind.')
+    parser.add_argument('--stations', type=int, default=10)
+    parser.add_argument('--pumps-per-station', type=int, default=4)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--rate', type=float, default=2.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--regenerate', action='store_true', help='Rebuild the cached dataset.')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers.')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker.')
+    parser.add_argument('--writers', type=int, default=16, help='Concurrent clients posting sales.')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per mode.')
+    parser.add_argument('--synchronous', default='FULL', help="SQLite synchronous pragma for both modes.")
+    parser.add_argument('--output', default=None, help='Where to write the JSON results.')
+    args = parser.parse_args()
+
+    results = {}
+    for mode, write_behind in (('synchronous', False), ('write-behind', True)):
+        stats = results[mode] = run_mode(args, write_behind)
+        print(f"{mode:<13} {stats['throughput_rps']:>8.1f} req/s  p50 {stats['p50_ms']:>8.2f}ms  "
+              f"p95 {stats['p95_ms']:>8.2f}ms  p99 {stats['p99_ms']:>8.2f}ms  {stats['errors']} errors  "
+              f"{stats['stored']}/{stats['acknowledged']} acknowledged sales stored")
+
+    output = args.output or os.path.join(SERVER_DIR, 'instance', 'bench-ingest-latest.json')
+    with open(output, 'w') as handle:
+        json.dump({'workers': args.workers, 'threads': args.threads, 'writers': args.writers,
+                   'duration': args.duration, 'synchronous': args.synchronous, 'modes': results}, handle, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+Fan-out of the live sales feed to many idle subscribers.
+
+    cd server
+    python -m benchmarks.stream --subscribers 500 --sales 50
+
+Starts one gunicorn worker with the threaded worker class (each open
+stream holds a thread), opens --subscribers connections to /sales/stream
+(a third of them filtered to one station), then posts --sales sales one at
+a time and measures how long each event takes to reach every subscriber
+that should get it. Reports the worker's memory per idle subscriber,
+delivery latency percentiles and any missed or unexpected events.
+"""
+import argparse
+import json
+import os
+import selectors
+import signal
+import socket
+import sqlite3
+import subprocess
+import threading
+import time
+import urllib.request
+
+from benchmarks.endpoints import (
+    DATASET_END, SERVER_DIR, Request, _children, _free_port, percentile, prepare_database, send_http,
+)
+
+EVENT = b'event: sale.created\n'
+
+
+def _rss_kb(pid):
+    with open(f'/proc/{pid}/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return None
+
+
+class Client:
+    def __init__(self, port, station_id=None):
+        query = f'?station_id={station_id}' if station_id is not None else ''
+        self.station_id = station_id
+        self.sock = socket.create_connection(('127.0.0.1', port))
+        self.sock.sendall(f'GET /sales/stream{query} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+        self.sock.setblocking(False)
+        self.buffer = b''
+        self.received = []  # arrival time of each sale.created event
+
+    def read(self, now):
+        try:
+            data = self.sock.recv(65536)
+        except BlockingIOError:
+            return
+        self.buffer += data
+        # Only complete lines are counted; keep the tail for the next read
+        complete, _, self.buffer = self.buffer.rpartition(b'\n')
+        self.received.extend([now] * (complete + b'\n').count(EVENT))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Live sales feed fan-out to many subscribers.')
+    parser.add_argument('--stations', type=int, default=3)
+    parser.add_argument('--pumps-per-station', type=int, default=2)
+    parser.add_argument('--days', type=int, default=3)
+    parser.add_argument('--rate', type=float, default=2.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--regenerate', action='store_true', help='Rebuild the cached dataset.')
+    parser.add_argument('--subscribers', type=int, default=500, help='Open streams on the worker.')
+    parser.add_argument('--sales', type=int, default=50, help='Sales posted while the streams are open.')
+    parser.add_argument('--output', default=None, help='Where to write the JSON results.')
+    args = parser.parse_args()
+
+    database_path = prepare_database(args)
+    with sqlite3.connect(database_path) as connection:
+        pumps = connection.execute('SELECT id, station_id FROM pumps ORDER BY id').fetchall()
+    filtered_station = pumps[0][1]
+
+    port = _free_port()
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{database_path}', RESPONSE_CACHE_BACKEND='none',
+               SALES_STREAM_MAX_SUBSCRIBERS=str(args.subscribers))
+    server = subprocess.Popen(
+        ['gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}', '--workers', '1',
+         '--worker-class', 'gthread', '--threads', str(args.subscribers + 8),
+         '--worker-connections', str(2 * args.subscribers + 16), '--log-level', 'warning'],
+        cwd=SERVER_DIR, env=env
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    clients = []
+    try:
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(base_url + '/', timeout=1).read()
+                break
+            except OSError:
+                time.sleep(0.1)
+        else:
+            raise RuntimeError('gunicorn did not start')
+        worker_pid = _children(server.pid)[0]
+        rss_before = _rss_kb(worker_pid)
+
+        selector = selectors.DefaultSelector()
+        for index in range(args.subscribers):
+            client = Client(port, filtered_station if index % 3 == 0 else None)
+            selector.register(client.sock, selectors.EVENT_READ, client)
+            clients.append(client)
+
+        stop = threading.Event()
+
+        def pump_events():
+            while not stop.is_set():
+                for key, _ in selector.select(timeout=0.1):
+                    key.data.read(time.perf_counter())
+
+        reader = threading.Thread(target=pump_events)
+        reader.start()
+        time.sleep(2)  # let every stream reach the hub before measuring
+        rss_idle = _rss_kb(worker_pid)
+
+        sent = []
+        for index in range(args.sales):
+            pump_id, station_id = pumps[index % len(pumps)]
+            began = time.perf_counter()
+            status = send_http(base_url, Request('POST', '/sales', json_body={
+                'fuelType': 'Diesel', 'litres': 20, 'pricePerLitre': 171.5, 'pumpId': pump_id,
+                'saleTimestamp': DATASET_END.isoformat(),
+            }))
+            if status != 201:
+                raise RuntimeError(f'POST /sales answered {status}')
+            sent.append((began, station_id))
+        time.sleep(2)
+        stop.set()
+        reader.join()
+    finally:
+        for client in clients:
+            client.sock.close()
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(database_path + suffix):
+                os.unlink(database_path + suffix)
+
+    latencies, missed, unexpected = [], 0, 0
+    for client in clients:
+        expected = [began for began, station_id in sent
+                    if client.station_id is None or station_id == client.station_id]
+        missed += max(len(expected) - len(client.received), 0)
+        unexpected += max(len(client.received) - len(expected), 0)
+        latencies.extend(arrived - began for began, arrived in zip(expected, client.received))
+    latencies.sort()
+
+    result = {
+        'subscribers': args.subscribers,
+        'sales': args.sales,
+        'deliveries': len(latencies),
+        'missed': missed,
+        'unexpected': unexpected,
+        'worker_rss_kb': {'before': rss_before, 'idle_subscribers': rss_idle},
+        'rss_per_subscriber_kb': round((rss_idle - rss_before) / args.subscribers, 1),
+        'delivery_p50_ms': round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        'delivery_p95_ms': round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+        'delivery_p99_ms': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+    }
+    print(f"{args.subscribers} subscribers on one worker: RSS {rss_before} -> {rss_idle} kB "
+          f"({result['rss_per_subscriber_kb']} kB each)")
+    print(f"{len(latencies)} deliveries for {args.sales} sales: p50 {result['delivery_p50_ms']}ms  "
+          f"p95 {result['delivery_p95_ms']}ms  p99 {result['delivery_p99_ms']}ms  "
+          f"{missed} missed, {unexpected} unexpected")
+
+    output = args.output or os.path.join(SERVER_DIR, 'instance', 'bench-stream-latest.json')
+    with open(output, 'w') as handle:
+        json.dump(result, handle, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
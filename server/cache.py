@@ -0,0 +1,189 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, g, make_response, request
+from werkzeug.http import http_date, parse_date
+
+
+class MemoryBackend:
+    """Per-process LRU with a TTL on every entry."""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def generations(self, tags):
+        with self._lock:
+            return [self._generations.get(tag, 0) for tag in tags]
+
+    def bump(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+
+
+class RedisBackend:
+    """
+    Shared cache for several workers, using any Redis-compatible server.
+    Generations live in plain counters so every worker sees invalidations.
+    """
+
+    def __init__(self, url, prefix="response-cache:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RESPONSE_CACHE_BACKEND=redis requires the 'redis' package")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=max(int(ttl), 1))
+
+    def generations(self, tags):
+        values = self.client.mget([f"{self.prefix}gen:{tag}" for tag in tags])
+        return [int(value or 0) for value in values]
+
+    def bump(self, tags):
+        pipe = self.client.pipeline()
+        for tag in tags:
+            pipe.incr(f"{self.prefix}gen:{tag}")
+        pipe.execute()
+
+    def clear(self):
+        for key in self.client.scan_iter(f"{self.prefix}*"):
+            self.client.delete(key)
+
+
+class ResponseCache:
+    """
+    Caches GET responses under keys that embed a generation number for each
+    resource tag they depend on. Write endpoints bump the generations of the
+    tags they touch, which makes every dependent entry unreachable at once;
+    the TTL only bounds how long unreachable entries linger.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get("RESPONSE_CACHE_BACKEND", "memory")
+        if backend == "redis":
+            self.backend = RedisBackend(app.config["RESPONSE_CACHE_URL"])
+        elif backend == "memory":
+            self.backend = MemoryBackend(app.config.get("RESPONSE_CACHE_MAX_ENTRIES", 512))
+        else:
+            self.backend = None
+        app.extensions["response_cache"] = self
+
+    def _key(self, tags):
+        generations = self.backend.generations(tags)
+        stamp = ",".join(f"{tag}={generation}" for tag, generation in zip(tags, generations))
+        return f"{request.full_path}|{stamp}"
+
+    def cached(self, *tags):
+        """Serve a GET view from cache, with ETag and Last-Modified validators."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if self.backend is None:
+                    return view(*args, **kwargs)
+
+                key = self._key(tags)
+                entry = self.backend.get(key)
+                if entry is None:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or response.is_streamed:
+                        return response
+                    body = response.get_data()
+                    entry = {
+                        "body": body,
+                        "mimetype": response.mimetype,
+                        "etag": hashlib.blake2b(body, digest_size=16).hexdigest(),
+                        "last_modified": int(time.time()),
+                    }
+                    ttl = current_app.config.get("RESPONSE_CACHE_TTL", 60)
+                    if g.get("db_replica"):
+                        # A replica may not have the write that bumped the tags yet
+                        ttl = min(ttl, current_app.config.get("DATABASE_REPLICA_LAG", 5))
+                    self.backend.set(key, entry, ttl)
+                    cache_status = "MISS"
+                else:
+                    cache_status = "HIT"
+                return self._respond(entry, cache_status)
+            return wrapper
+        return decorator
+
+    def _respond(self, entry, cache_status):
+        not_modified = False
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains(entry["etag"])
+        elif request.if_modified_since:
+            since = parse_date(request.headers.get("If-Modified-Since"))
+            not_modified = since is not None and int(since.timestamp()) >= entry["last_modified"]
+
+        response = current_app.response_class(
+            b"" if not_modified else entry["body"],
+            status=304 if not_modified else 200,
+            mimetype=entry["mimetype"],
+        )
+        response.set_etag(entry["etag"])
+        response.headers["Last-Modified"] = http_date(entry["last_modified"])
+        # Clients may keep a copy but must revalidate before each use
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["X-Cache"] = cache_status
+        return response
+
+    def invalidates(self, *tags):
+        """Bump `tags` after the wrapped write view responds successfully."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                response = make_response(view(*args, **kwargs))
+                if self.backend is not None and response.status_code < 400:
+                    self.backend.bump(tags)
+                return response
+            return wrapper
+        return decorator
+
+    def invalidate(self, *tags):
+        if self.backend is not None:
+            self.backend.bump(tags)
+
+
+response_cache = ResponseCache()
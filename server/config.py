@@ -6,7 +6,108 @@ INSTANCE_DIR = os.path.join(BASE_DIR, "instance")
 # Make sure the instance directory exists
 os.makedirs(INSTANCE_DIR, exist_ok=True)
 
+DATABASE_URI = os.environ.get("DATABASE_URL") or f"sqlite:///{os.path.join(INSTANCE_DIR, 'app.db')}"
+
+
+def engine_options(uri):
+    """Connection pool settings from the environment; in-memory SQLite keeps its single static connection."""
+    if uri.startswith("sqlite") and (uri.rstrip("/") in ("sqlite:", "sqlite+pysqlite:") or ":memory:" in uri):
+        return {}
+    return {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": float(os.environ.get("DB_POOL_TIMEOUT", 30)),
+        # Recycle before typical server/proxy idle timeouts drop the connection
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+    }
+
+
 class Config:
-    SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL") or f"sqlite:///{os.path.join(INSTANCE_DIR, 'app.db')}"
+    SQLALCHEMY_DATABASE_URI = DATABASE_URI
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(DATABASE_URI)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Read replicas (comma-separated URLs) for the analytics views. Clients
+    # read from the primary for DATABASE_REPLICA_LAG seconds after a write.
+    SQLALCHEMY_BINDS = {
+        f"replica_{index}": url
+        for index, url in enumerate(url for url in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if url)
+    }
+    DATABASE_REPLICA_LAG = float(os.environ.get("DATABASE_REPLICA_LAG", 5))
+
+    # SQLite connection pragmas (see database.py). WAL lets readers carry on
+    # while a sale burst writes; synchronous=NORMAL is durable in WAL mode
+    # except for the last transactions before a power loss.
+    SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
     SECRET_KEY = os.environ.get("SECRET_KEY", "dev_secret_key")
+
+    # Bulk sale uploads (POST /sales/batch)
+    SALES_BATCH_MAX_ROWS = int(os.environ.get("SALES_BATCH_MAX_ROWS", 50000))
+    SALES_BATCH_CHUNK_SIZE = int(os.environ.get("SALES_BATCH_CHUNK_SIZE", 1000))
+
+    # Write-behind ingestion for POST /sales: sales are fsynced to a log in
+    # SALES_WRITE_BEHIND_DIR and answered with 202, then committed in groups
+    # of up to MAX_BATCH sales or every MAX_DELAY_MS by a background thread.
+    # Sales become visible to reads only once their group commits.
+    SALES_WRITE_BEHIND = os.environ.get("SALES_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+    SALES_WRITE_BEHIND_DIR = os.environ.get("SALES_WRITE_BEHIND_DIR", os.path.join(INSTANCE_DIR, "sales-log"))
+    SALES_WRITE_BEHIND_MAX_BATCH = int(os.environ.get("SALES_WRITE_BEHIND_MAX_BATCH", 500))
+    SALES_WRITE_BEHIND_MAX_DELAY_MS = int(os.environ.get("SALES_WRITE_BEHIND_MAX_DELAY_MS", 50))
+    SALES_WRITE_BEHIND_FSYNC = os.environ.get("SALES_WRITE_BEHIND_FSYNC", "true").lower() in ("1", "true", "yes")
+    # Retries of a failed group commit before its segment is left for the next worker start to replay
+    SALES_WRITE_BEHIND_RETRIES = int(os.environ.get("SALES_WRITE_BEHIND_RETRIES", 5))
+
+    # Sales older than this many days (whole months) are moved out of the
+    # sales table by `flask archive-sales`. Raising it later does not bring
+    # archived months back, so time ranges inside them stop spanning the archive.
+    SALES_ARCHIVE_AFTER_DAYS = int(os.environ.get("SALES_ARCHIVE_AFTER_DAYS", 365))
+
+    # Stations with more sales than this are deleted in chunks in the
+    # background (DELETE /stations/<id> answers 202); ?background=true forces it
+    STATION_DELETE_BACKGROUND_THRESHOLD = int(os.environ.get("STATION_DELETE_BACKGROUND_THRESHOLD", 200000))
+
+    # Live sales feed (GET /sales/stream): events buffered per slow client
+    # before the oldest are dropped, heartbeat interval (seconds) and open
+    # streams per worker. Set SALES_STREAM_REDIS_URL to fan events out across
+    # workers; without it a stream only sees writes handled by its own worker.
+    SALES_STREAM_BUFFER = int(os.environ.get("SALES_STREAM_BUFFER", 256))
+    SALES_STREAM_HEARTBEAT = float(os.environ.get("SALES_STREAM_HEARTBEAT", 15))
+    SALES_STREAM_MAX_SUBSCRIBERS = int(os.environ.get("SALES_STREAM_MAX_SUBSCRIBERS", 1000))
+    SALES_STREAM_REDIS_URL = os.environ.get("SALES_STREAM_REDIS_URL")
+
+    # GET response cache for the polled read endpoints: "memory", "redis" or "none"
+    RESPONSE_CACHE_BACKEND = os.environ.get("RESPONSE_CACHE_BACKEND", "memory")
+    RESPONSE_CACHE_URL = os.environ.get("RESPONSE_CACHE_URL", "redis://localhost:6379/0")
+    RESPONSE_CACHE_TTL = int(os.environ.get("RESPONSE_CACHE_TTL", 300))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", 512))
+
+    # Decoded-token and active-user cache used by token_required; 0 disables it.
+    # Other workers see deactivations and role changes within this many seconds.
+    AUTH_CACHE_TTL = int(os.environ.get("AUTH_CACHE_TTL", 30))
+    AUTH_CACHE_MAX_ENTRIES = int(os.environ.get("AUTH_CACHE_MAX_ENTRIES", 10000))
+
+    # Revoked-token list: how often workers pull new revocations and purge
+    # expired ones (seconds), and the Bloom filter's sizing
+    REVOCATION_SYNC_INTERVAL = int(os.environ.get("REVOCATION_SYNC_INTERVAL", 5))
+    REVOCATION_PURGE_INTERVAL = int(os.environ.get("REVOCATION_PURGE_INTERVAL", 600))
+    REVOCATION_BLOOM_CAPACITY = int(os.environ.get("REVOCATION_BLOOM_CAPACITY", 100000))
+
+    # Password hashing pool. Changing the method re-hashes passwords on next login.
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))  # 0 hashes inline
+    # Jobs in flight per web worker; beyond the pool size they would only queue unseen
+    PASSWORD_HASH_MAX_CONCURRENCY = int(os.environ.get("PASSWORD_HASH_MAX_CONCURRENCY", PASSWORD_HASH_WORKERS or 1))
+    PASSWORD_HASH_QUEUE_TIMEOUT = float(os.environ.get("PASSWORD_HASH_QUEUE_TIMEOUT", 10))
+
+    # Per-request profiling: Server-Timing, a JSON log line per request and
+    # /metrics. Sampled routes (endpoint names or URL rules, comma-separated)
+    # are also run under cProfile, with the stats written to PROFILING_DIR.
+    PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+    PROFILING_SLOW_STATEMENTS = int(os.environ.get("PROFILING_SLOW_STATEMENTS", 3))
+    PROFILING_SAMPLE_ROUTES = [route for route in os.environ.get("PROFILING_SAMPLE_ROUTES", "").split(",") if route]
+    PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", 1.0))
+    PROFILING_DIR = os.environ.get("PROFILING_DIR", os.path.join(INSTANCE_DIR, "profiles"))
@@ -0,0 +1,89 @@
+from sqlalchemy import func, select
+
+from models import db, Pump, SaleRollup, Station, Staff
+
+# Chart colours for the fuel types shown on the dashboard
+FUEL_TYPE_COLORS = {
+    'Regular': '#3B82F6',
+    'Premium': '#10B981',
+    'Diesel': '#F59E0B',
+}
+
+
+def headline_totals():
+    """
+    Entity counts and sale aggregates in a single round trip. The counts are
+    scalar subqueries and the sale figures come from the daily rollups, so
+    the cost tracks the number of buckets rather than the number of sales.
+    """
+    daily = select(
+        func.sum(SaleRollup.sale_count).label('sales'),
+        func.sum(SaleRollup.total_revenue).label('revenue'),
+        func.sum(SaleRollup.total_litres).label('litres'),
+        func.sum(SaleRollup.price_sum).label('price_sum'),
+    ).where(SaleRollup.period == 'day').subquery()
+
+    row = db.session.execute(select(
+        select(func.count(Station.id)).where(Station.is_active == True).scalar_subquery().label('stations'),
+        select(func.count(Staff.id)).where(Staff.is_active == True).scalar_subquery().label('staff'),
+        select(func.count(Pump.id)).scalar_subquery().label('pumps'),
+        daily.c.sales,
+        daily.c.revenue,
+        daily.c.litres,
+        daily.c.price_sum,
+    )).one()
+
+    return {
+        'stations': row.stations,
+        'staff': row.staff,
+        'pumps': row.pumps,
+        'sales': int(row.sales or 0),
+        'revenue': float(row.revenue or 0),
+        'litres': float(row.litres or 0),
+        'avg_price': float(row.price_sum / row.sales) if row.sales else 0,
+    }
+
+
+def station_summaries(limit=5):
+    """Pump, staff and sale counts per active station, grouped in SQL."""
+    pump_counts = select(Pump.station_id, func.count(Pump.id).label('count'))\
+        .group_by(Pump.station_id).subquery()
+    staff_counts = select(Staff.station_id, func.count(Staff.id).label('count'))\
+        .group_by(Staff.station_id).subquery()
+    sale_counts = select(SaleRollup.station_id, func.sum(SaleRollup.sale_count).label('count'))\
+        .where(SaleRollup.period == 'day')\
+        .group_by(SaleRollup.station_id).subquery()
+
+    rows = db.session.execute(
+        select(
+            Station.name,
+            func.coalesce(pump_counts.c.count, 0).label('pumps'),
+            func.coalesce(staff_counts.c.count, 0).label('staff'),
+            func.coalesce(sale_counts.c.count, 0).label('sales'),
+        )
+        .outerjoin(pump_counts, pump_counts.c.station_id == Station.id)
+        .outerjoin(staff_counts, staff_counts.c.station_id == Station.id)
+        .outerjoin(sale_counts, sale_counts.c.station_id == Station.id)
+        .where(Station.is_active == True)
+        .order_by(Station.id)
+        .limit(limit)
+    ).all()
+
+    return [
+        {'name': row.name, 'pumps': row.pumps, 'staff': row.staff, 'sales': row.sales}
+        for row in rows
+    ]
+
+
+def fuel_type_distribution():
+    """Pump counts per dashboard fuel type from one GROUP BY."""
+    counts = dict(db.session.execute(
+        select(Pump.fuel_type, func.count(Pump.id))
+        .where(Pump.fuel_type.in_(FUEL_TYPE_COLORS))
+        .group_by(Pump.fuel_type)
+    ).all())
+
+    return [
+        {'name': fuel_type, 'value': counts.get(fuel_type, 0), 'color': color}
+        for fuel_type, color in FUEL_TYPE_COLORS.items()
+    ]
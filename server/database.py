@@ -0,0 +1,67 @@
+import sqlite3
+
+from flask import g, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql.dml import UpdateBase
+
+_JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"}
+_SYNCHRONOUS = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+
+def sqlite_pragmas(config):
+    """The PRAGMA statements run on every new SQLite connection, from the SQLITE_* settings."""
+    journal_mode = config.get("SQLITE_JOURNAL_MODE", "WAL").upper()
+    synchronous = config.get("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+    if journal_mode not in _JOURNAL_MODES:
+        raise ValueError(f"SQLITE_JOURNAL_MODE must be one of {', '.join(sorted(_JOURNAL_MODES))}")
+    if synchronous not in _SYNCHRONOUS:
+        raise ValueError(f"SQLITE_SYNCHRONOUS must be one of {', '.join(sorted(_SYNCHRONOUS))}")
+    return [
+        # busy_timeout first: switching to WAL needs a brief exclusive lock
+        f"PRAGMA busy_timeout = {int(config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))}",
+        f"PRAGMA journal_mode = {journal_mode}",
+        f"PRAGMA synchronous = {synchronous}",
+        f"PRAGMA mmap_size = {int(config.get('SQLITE_MMAP_SIZE', 0))}",
+    ]
+
+
+def configure_engine(app, db):
+    """
+    Apply the SQLite pragmas to each connection the app's engines (primary
+    and replica binds) open; other databases, and engines created elsewhere
+    in the process, are untouched. Call after db.init_app(app).
+    """
+    if "sqlite_pragmas" in app.extensions:
+        return
+    pragmas = app.extensions["sqlite_pragmas"] = sqlite_pragmas(app.config)
+
+    def on_connect(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, "connect", on_connect)
+
+
+class RoutingSession(Session):
+    """
+    Sends statements to the replica bind chosen for the current request (see
+    replicas.py), if any. Flushes and INSERT/UPDATE/DELETE statements always
+    use the primary, so a view routed to a replica by mistake still writes
+    in the right place.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            replica = g.get("db_replica")
+            if replica and not self._flushing and not isinstance(clause, UpdateBase):
+                return self._db.engines[replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
@@ -0,0 +1,96 @@
+import threading
+
+from flask import current_app
+from sqlalchemy import delete, func, select, update
+
+from models import db, Delivery, Pump, Sale, Staff, Station, Tank, UserSale
+from archive import forget_archived_sales
+from rollups import forget_pumps
+
+# Sales removed per transaction when a station is deleted in the background
+BACKGROUND_CHUNK_SIZE = 5000
+
+
+def station_counts(station_id):
+    """Pumps, staff and sales belonging to a station, counted in one query without loading rows."""
+    station_pumps = select(Pump.id).where(Pump.station_id == station_id)
+    row = db.session.execute(select(
+        select(func.count()).select_from(Pump).where(Pump.station_id == station_id).scalar_subquery(),
+        select(func.count()).select_from(Staff).where(Staff.station_id == station_id).scalar_subquery(),
+        select(func.count()).select_from(Sale).where(Sale.pump_id.in_(station_pumps)).scalar_subquery(),
+    )).one()
+    return {"pumps": row[0], "staff": row[1], "sales": row[2]}
+
+
+def _delete_sales(sale_ids):
+    """Delete the sales selected by `sale_ids` (a subquery or list) and their user links."""
+    db.session.execute(
+        delete(UserSale).where(UserSale.sale_id.in_(sale_ids)).execution_options(synchronize_session=False)
+    )
+    db.session.execute(
+        delete(Sale).where(Sale.id.in_(sale_ids)).execution_options(synchronize_session=False)
+    )
+
+
+def delete_station_rows(station_id):
+    """
+    Delete a station with its pumps, staff, tanks, sales (archived ones
+    included) and rollups using one DELETE per table, in the caller's
+    transaction. Nothing is loaded into the session, so memory stays flat
+    however much history the station has.
+    """
+    station_pumps = select(Pump.id).where(Pump.station_id == station_id)
+    _delete_sales(select(Sale.id).where(Sale.pump_id.in_(station_pumps)))
+    pump_ids = db.session.scalars(station_pumps).all()
+    forget_pumps(pump_ids)
+    forget_archived_sales(pump_ids)
+    station_tanks = select(Tank.id).where(Tank.station_id == station_id)
+    for statement in (
+        delete(Delivery).where(Delivery.tank_id.in_(station_tanks)),
+        delete(Tank).where(Tank.station_id == station_id),
+        delete(Staff).where(Staff.station_id == station_id),
+        delete(Pump).where(Pump.station_id == station_id),
+        delete(Station).where(Station.id == station_id),
+    ):
+        db.session.execute(statement.execution_options(synchronize_session=False))
+
+
+def delete_station_in_background(station_id, on_done=None, chunk_size=BACKGROUND_CHUNK_SIZE):
+    """
+    Delete a very large station without one long-running transaction: the
+    station is deactivated straight away, its sales are deleted in chunks
+    of `chunk_size` (one short transaction each) on a background thread,
+    and the remaining rows go in a final transaction via
+    delete_station_rows(). If the worker dies midway the station stays
+    inactive with part of its history gone; deleting it again finishes the
+    job. `on_done` runs in the app context after the final commit.
+    """
+    db.session.execute(update(Station).where(Station.id == station_id).values(is_active=False))
+    db.session.commit()
+
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            try:
+                station_pumps = select(Pump.id).where(Pump.station_id == station_id)
+                while True:
+                    sale_ids = db.session.scalars(
+                        select(Sale.id).where(Sale.pump_id.in_(station_pumps)).limit(chunk_size)
+                    ).all()
+                    if not sale_ids:
+                        break
+                    _delete_sales(sale_ids)
+                    db.session.commit()
+                delete_station_rows(station_id)
+                db.session.commit()
+                app.logger.info("Deleted station %s in the background", station_id)
+                if on_done is not None:
+                    on_done()
+            except Exception:
+                db.session.rollback()
+                app.logger.exception("Background deletion of station %s failed", station_id)
+
+    thread = threading.Thread(target=run, name=f"delete-station-{station_id}")
+    thread.start()
+    return thread
@@ -0,0 +1,192 @@
+import itertools
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+from sqlalchemy import select
+
+from models import db, Pump
+
+CHANNEL = "sales-events"
+
+
+class StreamFull(Exception):
+    """Raised when a worker already serves SALES_STREAM_MAX_SUBSCRIBERS streams."""
+
+
+class Subscriber:
+    """One open stream: a bounded buffer that drops its oldest events when the client falls behind."""
+
+    def __init__(self, station_ids, buffer_size):
+        self.station_ids = station_ids
+        self.events = deque(maxlen=buffer_size)
+        self.dropped = 0
+        self._ready = threading.Condition(threading.Lock())
+
+    def wants(self, station_id):
+        return self.station_ids is None or station_id in self.station_ids
+
+    def push(self, event):
+        with self._ready:
+            if len(self.events) == self.events.maxlen:
+                self.dropped += 1
+            self.events.append(event)
+            self._ready.notify()
+
+    def wait(self, timeout):
+        """Block up to `timeout` seconds for events; returns (events, dropped since last call)."""
+        with self._ready:
+            if not self.events:
+                self._ready.wait(timeout)
+            events = list(self.events)
+            self.events.clear()
+            dropped, self.dropped = self.dropped, 0
+        return events, dropped
+
+
+class SalesHub:
+    """
+    In-process publish/subscribe hub behind GET /sales/stream. Write views
+    publish after committing; each open stream holds a Subscriber, so one
+    slow browser only ever loses its own oldest events. Subscribers see the
+    writes handled by their own worker unless SALES_STREAM_REDIS_URL is set,
+    in which case events go through a Redis channel that every worker
+    relays to its local subscribers.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._redis = None
+        self._redis_listener = None
+        self._listener_pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.buffer_size = app.config.get("SALES_STREAM_BUFFER", 256)
+        self.heartbeat = app.config.get("SALES_STREAM_HEARTBEAT", 15)
+        self.max_subscribers = app.config.get("SALES_STREAM_MAX_SUBSCRIBERS", 1000)
+        url = app.config.get("SALES_STREAM_REDIS_URL")
+        if url:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("SALES_STREAM_REDIS_URL requires the 'redis' package")
+            # Publishing happens after a write has committed, so it must fail fast;
+            # the relay's connection idles between events, so it only keeps alive
+            self._redis = redis.Redis.from_url(url, socket_connect_timeout=2, socket_timeout=2)
+            self._redis_listener = redis.Redis.from_url(url, socket_keepalive=True, health_check_interval=30)
+        app.extensions["sales_hub"] = self
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def subscribe(self, station_ids=None):
+        self._ensure_listener()
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise StreamFull("Too many open sales streams, try again shortly")
+            subscriber = Subscriber(station_ids, self.buffer_size)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event_type, data, station_id=None):
+        event = {"type": event_type, "station_id": station_id, "data": data}
+        if self._redis is not None:
+            try:
+                self._redis.publish(CHANNEL, json.dumps(event, default=str))
+                return
+            except Exception:
+                # The write is already committed; other workers miss this event,
+                # but the request still succeeds and local streams still get it
+                self.app.logger.exception("Publishing %s to Redis failed", event_type)
+        self._fan_out(event)
+
+    def _fan_out(self, event):
+        event["id"] = next(self._ids)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            if subscriber.wants(event["station_id"]):
+                subscriber.push(event)
+
+    def _ensure_listener(self):
+        # One relay thread per process; a forked gunicorn worker starts its own
+        if self._redis is None or self._listener_pid == os.getpid():
+            return
+        self._listener_pid = os.getpid()
+        threading.Thread(target=self._listen, name="sales-events-relay", daemon=True).start()
+
+    def _listen(self):
+        delay = 1
+        while True:
+            try:
+                pubsub = self._redis_listener.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                delay = 1
+                for message in pubsub.listen():
+                    self._fan_out(json.loads(message["data"]))
+            except Exception as e:
+                # Events published while disconnected are lost; streams carry on once it is back
+                self.app.logger.warning("Sales event relay lost Redis, reconnecting in %ss: %s", delay, e)
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+
+    def stream(self, subscriber):
+        """Server-Sent Events body for `subscriber`, with a comment line as heartbeat."""
+        try:
+            # Ask browsers to wait a few seconds before reconnecting
+            yield "retry: 5000\n\n"
+            while True:
+                events, dropped = subscriber.wait(self.heartbeat)
+                if dropped:
+                    yield f"event: dropped\ndata: {json.dumps({'count': dropped})}\n\n"
+                if not events:
+                    yield ": keepalive\n\n"
+                    continue
+                yield "".join(
+                    f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+                    for event in events
+                )
+        finally:
+            self.unsubscribe(subscriber)
+
+    def publish_batch(self, rows):
+        """One `sales.batch` summary per station for rows inserted by the bulk path."""
+        if not rows or (self._redis is None and not self._subscribers):
+            return
+        stations = dict(db.session.execute(
+            select(Pump.id, Pump.station_id).where(Pump.id.in_({row["pump_id"] for row in rows}))
+        ).all())
+        summaries = defaultdict(lambda: {"count": 0, "litres": 0.0, "revenue": 0.0, "first": None, "last": None})
+        for row in rows:
+            summary = summaries[stations.get(row["pump_id"])]
+            summary["count"] += 1
+            summary["litres"] += row["litres"]
+            summary["revenue"] += row["total_amount"]
+            timestamp = row["sale_timestamp"]
+            summary["first"] = timestamp if summary["first"] is None else min(summary["first"], timestamp)
+            summary["last"] = timestamp if summary["last"] is None else max(summary["last"], timestamp)
+        for station_id, summary in summaries.items():
+            self.publish("sales.batch", {
+                "station_id": station_id,
+                "count": summary["count"],
+                "litres": summary["litres"],
+                "revenue": summary["revenue"],
+                "first_timestamp": summary["first"].isoformat(),
+                "last_timestamp": summary["last"].isoformat(),
+            }, station_id)
+
+
+sales_hub = SalesHub()
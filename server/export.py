@@ -0,0 +1,95 @@
+import csv
+import io
+import json
+import zlib
+
+from sqlalchemy import select
+
+from archive import export_segments
+from filters import apply_sale_filters
+from models import db, Pump, Sale, Station
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+EXPORT_COLUMNS = [
+    'id', 'sale_timestamp', 'station_id', 'station_name', 'pump_id', 'pump_number',
+    'fuel_type', 'litres', 'price_per_litre', 'total_amount', 'transaction_id',
+]
+
+# Rows fetched per round trip from the server-side cursor
+YIELD_PER = 2000
+# Bytes buffered before a chunk is handed to the WSGI server
+FLUSH_BYTES = 64 * 1024
+
+
+def export_statement(filters, sale=Sale):
+    """Plain column select in chronological order; no ORM objects are built."""
+    stmt = select(
+        sale.id, sale.sale_timestamp, Pump.station_id, Station.name.label('station_name'),
+        sale.pump_id, Pump.pump_number, sale.fuel_type, sale.litres,
+        sale.price_per_litre, sale.total_amount, sale.transaction_id,
+    ).join(Pump, Pump.id == sale.pump_id).outerjoin(Station, Station.id == Pump.station_id)
+    stmt = apply_sale_filters(stmt, filters, sale)
+    return stmt.order_by(sale.sale_timestamp, sale.id).execution_options(yield_per=YIELD_PER)
+
+
+def export_rows(filters):
+    """Every matching row in time order, archived months first, one month-sized query at a time."""
+    for start, end, sale in export_segments(filters.get('start'), filters.get('end')):
+        segment = dict(filters, start=start, end=end)
+        yield from db.session.execute(export_statement(segment, sale))
+
+
+def _csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow([
+            value.isoformat() if index == 1 and value is not None else value
+            for index, value in enumerate(row)
+        ])
+        if buffer.tell() >= FLUSH_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _ndjson_lines(rows):
+    parts, size = [], 0
+    for row in rows:
+        record = dict(zip(EXPORT_COLUMNS, row))
+        if record['sale_timestamp'] is not None:
+            record['sale_timestamp'] = record['sale_timestamp'].isoformat()
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        parts.append(line)
+        size += len(line)
+        if size >= FLUSH_BYTES:
+            yield ''.join(parts)
+            parts, size = [], 0
+    yield ''.join(parts)
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_sales(fmt, filters, compress=False):
+    """
+    Generate the export body chunk by chunk. Rows come off a server-side
+    cursor YIELD_PER at a time, so memory stays flat for any row count.
+    """
+    rows = export_rows(filters)
+    chunks = _csv_lines(rows) if fmt == 'csv' else _ndjson_lines(rows)
+    if compress:
+        return _gzip(chunks)
+    return (chunk.encode() for chunk in chunks if chunk)
@@ -0,0 +1,58 @@
+from datetime import datetime
+
+from sqlalchemy import select
+
+from models import Pump, Sale
+
+
+def parse_datetime(value, name):
+    """Parse an ISO-8601 query parameter, naive UTC like the stored timestamps."""
+    if value in (None, ""):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO-8601 datetime")
+    if parsed.tzinfo is not None:
+        parsed = (parsed - parsed.utcoffset()).replace(tzinfo=None)
+    return parsed
+
+
+def parse_int(value, name):
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer")
+
+
+def sale_filters(args):
+    """Collect the supported sale filters from request args into a dict."""
+    return {
+        "station_id": parse_int(args.get("station_id"), "station_id"),
+        "pump_id": parse_int(args.get("pump_id"), "pump_id"),
+        "fuel_type": args.get("fuel_type") or None,
+        "start": parse_datetime(args.get("start"), "start"),
+        "end": parse_datetime(args.get("end"), "end"),
+    }
+
+
+def apply_sale_filters(query, filters, sale=Sale):
+    """Narrow a Sale query or select(); `start` is inclusive and `end` exclusive.
+
+    `sale` may be an alias of Sale, e.g. one spanning archived months.
+    """
+    if filters.get("station_id") is not None:
+        # A subquery rather than a join, so callers can join pumps themselves
+        station_pumps = select(Pump.id).where(Pump.station_id == filters["station_id"])
+        query = query.filter(sale.pump_id.in_(station_pumps))
+    if filters.get("pump_id") is not None:
+        query = query.filter(sale.pump_id == filters["pump_id"])
+    if filters.get("fuel_type"):
+        query = query.filter(sale.fuel_type == filters["fuel_type"])
+    if filters.get("start") is not None:
+        query = query.filter(sale.sale_timestamp >= filters["start"])
+    if filters.get("end") is not None:
+        query = query.filter(sale.sale_timestamp < filters["end"])
+    return query
@@ -0,0 +1,234 @@
+"""
+Synthetic data for load and performance testing.
+
+    flask --app app generate-data --stations 50 --pumps-per-station 6 \\
+        --days 365 --rate 6 --seed 42 --end 2025-01-01
+
+Sales follow a diurnal curve (quiet nights, morning and evening peaks), a
+weekly cycle (busier Fridays and Saturdays) and a per-station popularity
+factor, with fuel prices drifting as a daily random walk. The same seed and
+--end always produce the same rows. Rows are written with executemany in
+large chunks, or COPY on Postgres.
+"""
+import csv
+import io
+import math
+import random
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import insert, select
+
+from models import db, Pump, Sale, Staff, Station
+from rollups import rebuild_rollups
+
+FUEL_TYPES = ['Regular', 'Premium', 'Diesel']
+BASE_PRICES = {'Regular': 180.0, 'Premium': 195.0, 'Diesel': 170.0}  # KES per litre
+
+# Relative demand per hour of day (0-23) and per weekday (Monday first)
+HOURLY_DEMAND = [
+    0.15, 0.10, 0.08, 0.08, 0.12, 0.35, 0.80, 1.50, 1.70, 1.30, 1.05, 1.00,
+    1.10, 1.05, 1.00, 1.05, 1.30, 1.70, 1.80, 1.40, 0.95, 0.65, 0.40, 0.25,
+]
+WEEKDAY_DEMAND = [0.95, 0.95, 1.00, 1.00, 1.20, 1.15, 0.75]
+
+TOWNS = ['Nairobi', 'Mombasa', 'Kisumu', 'Nakuru', 'Eldoret', 'Thika', 'Nyeri', 'Machakos', 'Meru', 'Kitale']
+FIRST_NAMES = ['Amina', 'Brian', 'Cynthia', 'David', 'Esther', 'Felix', 'Grace', 'Hassan', 'Irene', 'James', 'Kevin', 'Lucy']
+LAST_NAMES = ['Otieno', 'Wanjiku', 'Mwangi', 'Achieng', 'Kiprop', 'Njoroge', 'Mutua', 'Chebet', 'Omondi', 'Kamau']
+STAFF_ROLES = ['Manager', 'Senior Attendant', 'Attendant', 'Cashier', 'Security Guard']
+
+CHUNK_SIZE = 20000
+
+
+def poisson(rng, mean):
+    """Knuth's method; fine for the single-digit means used per pump-hour."""
+    if mean <= 0:
+        return 0
+    if mean > 30:
+        return max(0, round(rng.gauss(mean, math.sqrt(mean))))
+    limit, count, product = math.exp(-mean), 0, rng.random()
+    while product > limit:
+        count += 1
+        product *= rng.random()
+    return count
+
+
+def price_walk(rng, days):
+    """Daily price per fuel type: a bounded random walk around the base price."""
+    prices = {}
+    for fuel_type, base in BASE_PRICES.items():
+        price, series = base, []
+        for _ in range(days):
+            price *= 1 + rng.gauss(0, 0.004)
+            price = min(max(price, base * 0.8), base * 1.25)
+            series.append(price)
+        prices[fuel_type] = series
+    return prices
+
+
+def iter_sales(rng, pumps, start, days, rate):
+    """
+    Yield sale rows hour by hour. `pumps` is a list of (pump_id, fuel_type,
+    demand_factor, price_markup) and `rate` the mean sales per pump-hour at
+    normal demand.
+    """
+    prices = price_walk(rng, days)
+    for day in range(days):
+        day_start = start + timedelta(days=day)
+        weekday = WEEKDAY_DEMAND[day_start.weekday()]
+        for hour in range(24):
+            hour_start = day_start + timedelta(hours=hour)
+            demand = rate * HOURLY_DEMAND[hour] * weekday
+            for pump_id, fuel_type, factor, markup in pumps:
+                count = poisson(rng, demand * factor)
+                if not count:
+                    continue
+                price = round(prices[fuel_type][day] * markup, 2)
+                for offset in sorted(rng.randrange(3600) for _ in range(count)):
+                    litres = round(min(max(rng.lognormvariate(3.1, 0.5), 3.0), 120.0), 2)
+                    yield {
+                        'fuel_type': fuel_type,
+                        'litres': litres,
+                        'price_per_litre': price,
+                        'total_amount': round(litres * price, 2),
+                        'sale_timestamp': hour_start + timedelta(seconds=offset),
+                        'pump_id': pump_id,
+                    }
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+_SALE_COLUMNS = ['fuel_type', 'litres', 'price_per_litre', 'total_amount', 'sale_timestamp', 'pump_id']
+
+
+def _copy_sales(rows):
+    """Stream rows into Postgres with COPY, one chunk at a time."""
+    count = 0
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        for chunk in _chunks(rows, CHUNK_SIZE):
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in chunk:
+                writer.writerow([row[column] for column in _SALE_COLUMNS])
+            buffer.seek(0)
+            cursor.copy_expert(f"COPY sales ({', '.join(_SALE_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+            count += len(chunk)
+        connection.commit()
+    finally:
+        connection.close()
+    return count
+
+
+def write_sales(rows):
+    """Bulk-load sale rows and return how many were written."""
+    if db.engine.dialect.name == 'postgresql':
+        return _copy_sales(rows)
+    count = 0
+    for chunk in _chunks(rows, CHUNK_SIZE):
+        db.session.execute(insert(Sale), chunk)
+        db.session.commit()
+        count += len(chunk)
+    return count
+
+
+def pump_profiles(rng, pumps):
+    """Attach a station-level demand factor and price markup to (pump_id, fuel_type, station_id)."""
+    station_factor, station_markup = {}, {}
+    profiles = []
+    for pump_id, fuel_type, station_id in pumps:
+        if station_id not in station_factor:
+            station_factor[station_id] = rng.uniform(0.5, 1.6)
+            station_markup[station_id] = rng.uniform(0.98, 1.03)
+        profiles.append((pump_id, fuel_type, station_factor[station_id], station_markup[station_id]))
+    return profiles
+
+
+def generate_dataset(stations, pumps_per_station, days, rate, seed, end):
+    rng = random.Random(seed)
+
+    station_rows = []
+    for index in range(stations):
+        town = TOWNS[index % len(TOWNS)]
+        station_rows.append({
+            'name': f"{town} Station {index + 1:04d}",
+            'location': f"{rng.randint(1, 999)} {rng.choice(['Moi', 'Kenyatta', 'Uhuru', 'Haile Selassie'])} Ave, {town}",
+            'is_active': True,
+            'created_at': end - timedelta(days=days),
+        })
+    # Core inserts skip the per-object name validator, which queries each time
+    db.session.execute(insert(Station), station_rows)
+    db.session.commit()
+    station_ids = db.session.scalars(
+        select(Station.id).where(Station.name.in_([row['name'] for row in station_rows])).order_by(Station.id)
+    ).all()
+
+    pump_rows, staff_rows = [], []
+    for station_id in station_ids:
+        for number in range(pumps_per_station):
+            pump_rows.append({
+                'pump_number': f"Pump {number + 1}",
+                'fuel_type': FUEL_TYPES[number % len(FUEL_TYPES)],
+                'station_id': station_id,
+            })
+        for number in range(rng.randint(2, 5)):
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            staff_rows.append({
+                'name': name,
+                'role': STAFF_ROLES[number % len(STAFF_ROLES)],
+                'station_id': station_id,
+                'email': f"{name.lower().replace(' ', '.')}.{station_id}.{number}@petroltracker.com",
+                'hire_date': end - timedelta(days=rng.randint(days, days + 2000)),
+                'is_active': True,
+            })
+    db.session.execute(insert(Pump), pump_rows)
+    if staff_rows:
+        db.session.execute(insert(Staff), staff_rows)
+    db.session.commit()
+
+    pumps = db.session.execute(
+        select(Pump.id, Pump.fuel_type, Pump.station_id).where(Pump.station_id.in_(station_ids)).order_by(Pump.id)
+    ).all()
+    start = end - timedelta(days=days)
+    sales = write_sales(iter_sales(rng, pump_profiles(rng, pumps), start, days, rate))
+    rebuild_rollups()
+
+    return {'stations': len(station_ids), 'pumps': len(pumps), 'staff': len(staff_rows), 'sales': sales}
+
+
+@click.command("generate-data")
+@click.option("--stations", default=20, show_default=True, help="Stations to create.")
+@click.option("--pumps-per-station", default=6, show_default=True, help="Pumps per station.")
+@click.option("--days", default=90, show_default=True, help="Days of sales history.")
+@click.option("--rate", default=4.0, show_default=True, help="Mean sales per pump per hour at normal demand.")
+@click.option("--seed", default=42, show_default=True, help="Random seed; same seed and --end give the same data.")
+@click.option("--end", "end", default=None, help="Last day of history (YYYY-MM-DD, default today UTC).")
+@click.option("--reset", is_flag=True, help="Drop and recreate all tables first.")
+@with_appcontext
+def generate_data_command(stations, pumps_per_station, days, rate, seed, end, reset):
+    """Generate a large, realistic dataset of stations, pumps, staff and sales."""
+    if reset:
+        db.drop_all()
+        db.create_all()
+    end = datetime.fromisoformat(end) if end else datetime.utcnow()
+    end = end.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    started = time.perf_counter()
+    summary = generate_dataset(stations, pumps_per_station, days, rate, seed, end)
+    elapsed = time.perf_counter() - started
+    click.echo(
+        f"Created {summary['stations']} stations, {summary['pumps']} pumps, {summary['staff']} staff "
+        f"and {summary['sales']} sales in {elapsed:.1f}s ({summary['sales'] / max(elapsed, 1e-9):,.0f} sales/s)"
+    )
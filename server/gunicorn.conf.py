@@ -0,0 +1,19 @@
+"""
+gunicorn settings, picked up automatically when gunicorn starts in server/.
+
+Every open GET /sales/stream holds a worker thread for as long as the
+browser stays connected, so the sync worker (one request at a time, killed
+after `timeout` seconds) cannot serve it. Each worker runs gthread with a
+thread for every stream it accepts (SALES_STREAM_MAX_SUBSCRIBERS) plus
+GUNICORN_REQUEST_THREADS for ordinary requests; threads are only started
+as connections arrive. The worker count still comes from WEB_CONCURRENCY
+or --workers.
+"""
+import os
+
+from config import Config
+
+worker_class = "gthread"
+threads = Config.SALES_STREAM_MAX_SUBSCRIBERS + int(os.environ.get("GUNICORN_REQUEST_THREADS", 8))
+# Leave room for idle keep-alive connections beyond the busy threads
+worker_connections = threads * 2
@@ -0,0 +1,201 @@
+import json
+from datetime import datetime
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from filters import parse_datetime
+from models import db, Pump, Sale
+from rollups import record_sales
+from inventory import draw_down
+
+
+def parse_batch_body(request):
+    """
+    Read a batch upload as either a JSON array or NDJSON (one object per
+    line). Returns a list of (index, payload) pairs plus a list of
+    per-row parse errors, so one malformed line does not sink the batch.
+    """
+    content_type = (request.mimetype or "").lower()
+    if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonlines"):
+        rows, errors = [], []
+        for index, line in enumerate(l for l in request.get_data(as_text=True).splitlines() if l.strip()):
+            try:
+                rows.append((index, json.loads(line)))
+            except json.JSONDecodeError as e:
+                errors.append({"index": index, "error": f"Invalid JSON: {e.msg}"})
+        return rows, errors
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON array of sales or an NDJSON body")
+    return list(enumerate(data)), []
+
+
+def _number(payload, key):
+    value = payload.get(key)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"{key} must be a number")
+    if value <= 0:
+        raise ValueError(f"{key} must be greater than zero")
+    return float(value)
+
+
+def validate_sale_payload(payload, known_pumps, now):
+    """Turn one API sale payload into a row for the sales table, or raise ValueError."""
+    if not isinstance(payload, dict):
+        raise ValueError("Each sale must be a JSON object")
+
+    fuel_type = payload.get("fuelType")
+    if not isinstance(fuel_type, str) or not fuel_type.strip():
+        raise ValueError("fuelType is required")
+    litres = _number(payload, "litres")
+    price_per_litre = _number(payload, "pricePerLitre")
+
+    pump_id = payload.get("pumpId")
+    if isinstance(pump_id, bool) or not isinstance(pump_id, int):
+        raise ValueError("pumpId must be an integer")
+    if pump_id not in known_pumps:
+        raise ValueError(f"Pump {pump_id} does not exist")
+
+    transaction_id = payload.get("transactionId")
+    if transaction_id is not None:
+        if isinstance(transaction_id, bool) or not isinstance(transaction_id, (str, int)):
+            raise ValueError("transactionId must be a string or integer")
+        transaction_id = str(transaction_id).strip()
+        if not transaction_id or len(transaction_id) > 64:
+            raise ValueError("transactionId must be 1-64 characters")
+
+    timestamp = payload.get("saleTimestamp")
+    if timestamp is not None and not isinstance(timestamp, str):
+        raise ValueError("saleTimestamp must be an ISO-8601 string")
+    sale_timestamp = parse_datetime(timestamp, "saleTimestamp") or now
+
+    return {
+        "fuel_type": fuel_type.strip(),
+        "litres": litres,
+        "price_per_litre": price_per_litre,
+        "total_amount": litres * price_per_litre,
+        "pump_id": pump_id,
+        "sale_timestamp": sale_timestamp,
+        "transaction_id": transaction_id,
+    }
+
+
+def validate_batch(rows):
+    """
+    Validate every (index, payload) pair in one pass. Pump existence is
+    checked with a single IN query over the distinct pump ids in the batch.
+    """
+    pump_ids = {
+        payload.get("pumpId") for _, payload in rows
+        if isinstance(payload, dict) and isinstance(payload.get("pumpId"), int)
+    }
+    known_pumps = set(db.session.scalars(select(Pump.id).where(Pump.id.in_(pump_ids)))) if pump_ids else set()
+
+    now = datetime.utcnow()
+    valid, errors = [], []
+    for index, payload in rows:
+        try:
+            valid.append((index, validate_sale_payload(payload, known_pumps, now)))
+        except ValueError as e:
+            errors.append({"index": index, "error": str(e)})
+    return valid, errors
+
+
+# Keeps each IN list well under SQLite's bound parameter limit
+LOOKUP_CHUNK_SIZE = 1000
+
+
+def existing_transactions(pairs):
+    """
+    Map (pump_id, transaction_id) pairs that are already recorded to their
+    sale ids. Served by the unique (pump_id, transaction_id) index with one
+    query per thousand ids rather than one per row.
+    """
+    found = {}
+    transaction_ids = sorted({transaction_id for _, transaction_id in pairs})
+    for offset in range(0, len(transaction_ids), LOOKUP_CHUNK_SIZE):
+        chunk = transaction_ids[offset:offset + LOOKUP_CHUNK_SIZE]
+        wanted = set(chunk)
+        pump_ids = {pump_id for pump_id, transaction_id in pairs if transaction_id in wanted}
+        for sale_id, pump_id, transaction_id in db.session.execute(
+            select(Sale.id, Sale.pump_id, Sale.transaction_id)
+            .where(Sale.transaction_id.in_(chunk), Sale.pump_id.in_(pump_ids))
+        ):
+            if (pump_id, transaction_id) in pairs:
+                found[(pump_id, transaction_id)] = sale_id
+    return found
+
+
+def split_replays(valid):
+    """
+    Separate rows whose transaction id was already recorded, or repeats an
+    earlier row of the same batch, from the rows that still need inserting.
+    """
+    pairs = {(row["pump_id"], row["transaction_id"]) for _, row in valid if row["transaction_id"] is not None}
+    recorded = existing_transactions(pairs) if pairs else {}
+
+    fresh, duplicates, first_seen = [], [], {}
+    for index, row in valid:
+        key = (row["pump_id"], row["transaction_id"])
+        if row["transaction_id"] is None:
+            fresh.append((index, row))
+        elif key in recorded:
+            duplicates.append({"index": index, "id": recorded[key]})
+        elif key in first_seen:
+            duplicates.append({"index": index, "duplicate_of_index": first_seen[key]})
+        else:
+            first_seen[key] = index
+            fresh.append((index, row))
+    return fresh, duplicates
+
+
+def insert_sales(valid, chunk_size, on_commit=None):
+    """
+    Insert validated rows with one executemany per chunk, committing each
+    chunk together with its rollup updates. If a chunk is rejected by the
+    database it is retried row by row under savepoints, so only the
+    offending rows are reported and the rest still land. Rows that lose a
+    race with a concurrent upload of the same transaction are returned as
+    duplicates rather than errors. `on_commit` is called with the rows of
+    each chunk once they are committed.
+    """
+    inserted, errors, duplicates = 0, [], []
+    for offset in range(0, len(valid), chunk_size):
+        chunk = valid[offset:offset + chunk_size]
+        rows = [row for _, row in chunk]
+        try:
+            db.session.execute(insert(Sale), rows)
+            record_sales(rows)
+            draw_down(rows)
+            db.session.commit()
+            inserted += len(rows)
+            if on_commit is not None:
+                on_commit(rows)
+            continue
+        except SQLAlchemyError:
+            db.session.rollback()
+
+        landed = []
+        for index, row in chunk:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(insert(Sale), [row])
+                landed.append(row)
+            except IntegrityError as e:
+                key = (row["pump_id"], row["transaction_id"])
+                recorded = existing_transactions({key}) if row["transaction_id"] is not None else {}
+                if key in recorded:
+                    duplicates.append({"index": index, "id": recorded[key]})
+                else:
+                    errors.append({"index": index, "error": f"Database rejected sale: {e.__class__.__name__}"})
+            except SQLAlchemyError as e:
+                errors.append({"index": index, "error": f"Database rejected sale: {e.__class__.__name__}"})
+        record_sales(landed)
+        draw_down(landed)
+        db.session.commit()
+        inserted += len(landed)
+        if on_commit is not None and landed:
+            on_commit(landed)
+    return inserted, errors, duplicates
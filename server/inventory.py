@@ -0,0 +1,207 @@
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import and_, bindparam, case, func, select, update
+
+from models import db, Delivery, Pump, Station, Tank
+from archive import sales_source
+
+_tanks = Tank.__table__
+
+
+def _level_change(delta):
+    """
+    Values for an UPDATE moving a tank's level by `delta` litres. The low
+    flag is re-derived from the new level in the same statement, so alerts
+    stay current without any separate scan.
+    """
+    level = _tanks.c.level_litres + delta
+    is_low = level <= _tanks.c.low_level_litres
+    return {
+        "level_litres": level,
+        "is_low": is_low,
+        "low_since": case((is_low, func.coalesce(_tanks.c.low_since, bindparam("now"))), else_=None),
+        "updated_at": bindparam("now"),
+    }
+
+
+# One executemany statement for a batch: each parameter set moves the tank
+# matching a pump's station and a fuel type
+_draw_down = update(_tanks).where(
+    _tanks.c.fuel_type == bindparam("sale_fuel_type"),
+    _tanks.c.station_id == select(Pump.station_id).where(Pump.id == bindparam("sale_pump_id")).scalar_subquery(),
+).values(**_level_change(-bindparam("litres")))
+
+# The same for one sale already on record: a tank opened after the sale
+# never drew it down, and reconcile_tanks() leaves it out too
+_draw_down_recorded = _draw_down.where(_tanks.c.opening_sale_id < bindparam("sale_id"))
+
+
+def draw_down(sales):
+    """
+    Take newly recorded sales out of their tanks, in the caller's
+    transaction. `sales` are objects or dicts with pump_id, fuel_type and
+    litres, as for rollups.record_sales(); litres are summed per pump and
+    fuel type first, so a batch is one executemany over the tanks it
+    touches. Sales with no matching tank are ignored.
+    """
+    totals = {}
+    for sale in sales:
+        get = sale.get if isinstance(sale, dict) else lambda key: getattr(sale, key)
+        key = (get("pump_id"), get("fuel_type"))
+        totals[key] = totals.get(key, 0.0) + get("litres")
+    if not totals:
+        return
+    now = datetime.utcnow()
+    db.session.execute(_draw_down, [
+        {"sale_pump_id": pump_id, "sale_fuel_type": fuel_type, "litres": litres, "now": now}
+        for (pump_id, fuel_type), litres in totals.items()
+    ])
+
+
+def _move_recorded(sale, litres):
+    db.session.execute(_draw_down_recorded, {
+        "sale_id": sale.id, "sale_pump_id": sale.pump_id, "sale_fuel_type": sale.fuel_type,
+        "litres": litres, "now": datetime.utcnow(),
+    })
+
+
+def put_back(sale):
+    """Return a recorded sale's litres to its tank before the sale is deleted or changed."""
+    _move_recorded(sale, -sale.litres)
+
+
+def take_out(sale):
+    """Draw a changed sale down again from the tank it now belongs to."""
+    _move_recorded(sale, sale.litres)
+
+
+def _pump_sales_change(pump_id, station_id, sign):
+    # Per tank row: the litres of the pump's sales of that fuel since the tank opened
+    sale = sales_source(include_archive=True)
+    litres = select(func.coalesce(func.sum(sale.litres), 0.0)).where(
+        sale.pump_id == pump_id,
+        sale.fuel_type == _tanks.c.fuel_type,
+        sale.id > _tanks.c.opening_sale_id,
+    ).scalar_subquery()
+    db.session.execute(
+        update(_tanks).where(_tanks.c.station_id == station_id).values(**_level_change(sign * litres)),
+        {"now": datetime.utcnow()}
+    )
+
+
+def move_pump_sales(pump_id, old_station_id, new_station_id):
+    """
+    Move a pump's sales between the tanks of its old and new station when
+    the pump changes station, as editing each sale's pump would.
+    """
+    _pump_sales_change(pump_id, old_station_id, 1)
+    _pump_sales_change(pump_id, new_station_id, -1)
+
+
+def put_back_pump_sales(pump_id, station_id):
+    """Return the litres of a pump's sales to its station's tanks before the pump and its sales are deleted."""
+    _pump_sales_change(pump_id, station_id, 1)
+
+
+def receive_delivery(tank, litres, delivered_at=None, reference=None):
+    """Record a delivery and add it to the tank's level in the caller's transaction."""
+    delivery = Delivery(tank_id=tank.id, litres=litres, delivered_at=delivered_at or datetime.utcnow(),
+                        reference=reference)
+    db.session.add(delivery)
+    db.session.execute(
+        update(_tanks).where(_tanks.c.id == tank.id).values(**_level_change(litres)),
+        {"now": datetime.utcnow()}
+    )
+    return delivery
+
+
+def low_stock_alerts():
+    """
+    Tanks at or below their low level, emptiest first, from the is_low
+    index: the cost follows the number of low tanks, not sales. Levels and
+    thresholds are percentages of capacity, as the dashboard shows them.
+    """
+    rows = db.session.execute(
+        select(Tank, Station.name)
+        .join(Station, Station.id == Tank.station_id)
+        .where(Tank.is_low == True)
+        .order_by(Tank.level_litres / Tank.capacity_litres, Tank.id)
+    ).all()
+    return [
+        {
+            'tankId': tank.id,
+            'stationId': tank.station_id,
+            'station': station_name,
+            'fuelType': tank.fuel_type,
+            'level': round(tank.level_litres / tank.capacity_litres * 100, 1),
+            'threshold': round(tank.low_level_litres / tank.capacity_litres * 100, 1),
+            'levelLitres': tank.level_litres,
+            'lowSince': tank.low_since.isoformat() if tank.low_since else None,
+        }
+        for tank, station_name in rows
+    ]
+
+
+def reconcile_tanks(fix=False, tolerance=0.01):
+    """
+    Recompute every tank's level from scratch (opening level plus
+    deliveries minus the sales recorded since it opened, archived months
+    included) and compare it with the running balance. Returns the tanks
+    whose balance drifted by more than `tolerance` litres; with `fix` their
+    level and low flag are reset to the recomputed values.
+    """
+    sale = sales_source(include_archive=True)
+    sold = dict(db.session.execute(
+        select(Tank.id, func.sum(sale.litres))
+        .join(Pump, Pump.station_id == Tank.station_id)
+        .join(sale, and_(sale.pump_id == Pump.id, sale.fuel_type == Tank.fuel_type, sale.id > Tank.opening_sale_id))
+        .group_by(Tank.id)
+    ).all())
+    delivered = dict(db.session.execute(
+        select(Delivery.tank_id, func.sum(Delivery.litres)).group_by(Delivery.tank_id)
+    ).all())
+
+    drifted = []
+    now = datetime.utcnow()
+    for tank in Tank.query.order_by(Tank.id):
+        expected = tank.opening_litres + (delivered.get(tank.id) or 0) - (sold.get(tank.id) or 0)
+        drift = tank.level_litres - expected
+        if abs(drift) <= tolerance:
+            continue
+        drifted.append({
+            'tank_id': tank.id,
+            'station_id': tank.station_id,
+            'fuel_type': tank.fuel_type,
+            'recorded_litres': tank.level_litres,
+            'expected_litres': expected,
+            'drift_litres': drift,
+        })
+        if fix:
+            tank.level_litres = expected
+            tank.is_low = expected <= tank.low_level_litres
+            tank.low_since = (tank.low_since or now) if tank.is_low else None
+            tank.updated_at = now
+    if fix:
+        db.session.commit()
+    return drifted
+
+
+@click.command('reconcile-tanks')
+@click.option('--fix', is_flag=True, help='Reset drifted tanks to the recomputed level.')
+@click.option('--tolerance', default=0.01, show_default=True, help='Litres of drift to ignore.')
+@with_appcontext
+def reconcile_tanks_command(fix, tolerance):
+    """Recompute tank levels from deliveries minus sales and report drift."""
+    drifted = reconcile_tanks(fix=fix, tolerance=tolerance)
+    for item in drifted:
+        click.echo(
+            f"tank {item['tank_id']} (station {item['station_id']}, {item['fuel_type']}): "
+            f"recorded {item['recorded_litres']:.2f} L, expected {item['expected_litres']:.2f} L, "
+            f"drift {item['drift_litres']:+.2f} L{' - fixed' if fix else ''}"
+        )
+    if not drifted:
+        click.echo("All tank levels match deliveries minus sales")
+    elif not fix:
+        raise SystemExit(1)
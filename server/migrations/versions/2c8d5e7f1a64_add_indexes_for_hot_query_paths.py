@@ -0,0 +1,48 @@
+"""add indexes for hot query paths
+
+Revision ID: 2c8d5e7f1a64
+Revises: 9f2a6c3e8b51
+Create Date: 2025-10-04 11:02:55.918342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c8d5e7f1a64'
+down_revision = '9f2a6c3e8b51'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('sales', schema=None) as batch_op:
+        batch_op.create_index('ix_sales_timestamp_id', ['sale_timestamp', 'id'], unique=False)
+        batch_op.create_index('ix_sales_pump_timestamp', ['pump_id', 'sale_timestamp'], unique=False)
+        batch_op.create_index('ix_sales_fuel_type_timestamp', ['fuel_type', 'sale_timestamp'], unique=False)
+
+    with op.batch_alter_table('pumps', schema=None) as batch_op:
+        batch_op.create_index('ix_pumps_station_id', ['station_id'], unique=False)
+
+    with op.batch_alter_table('staff', schema=None) as batch_op:
+        batch_op.create_index('ix_staff_station_id', ['station_id'], unique=False)
+
+    with op.batch_alter_table('user_sales', schema=None) as batch_op:
+        batch_op.create_index('ix_user_sales_sale_id', ['sale_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user_sales', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_sales_sale_id')
+
+    with op.batch_alter_table('staff', schema=None) as batch_op:
+        batch_op.drop_index('ix_staff_station_id')
+
+    with op.batch_alter_table('pumps', schema=None) as batch_op:
+        batch_op.drop_index('ix_pumps_station_id')
+
+    with op.batch_alter_table('sales', schema=None) as batch_op:
+        batch_op.drop_index('ix_sales_fuel_type_timestamp')
+        batch_op.drop_index('ix_sales_pump_timestamp')
+        batch_op.drop_index('ix_sales_timestamp_id')
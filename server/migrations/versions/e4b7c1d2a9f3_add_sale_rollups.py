@@ -0,0 +1,64 @@
+"""add hourly and daily sale rollups
+
+Revision ID: e4b7c1d2a9f3
+Revises: 6ce1d72bdcef
+Create Date: 2025-10-02 10:14:37.512904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b7c1d2a9f3'
+down_revision = '6ce1d72bdcef'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sale_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.String(length=10), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('pump_id', sa.Integer(), nullable=False),
+    sa.Column('station_id', sa.Integer(), nullable=True),
+    sa.Column('fuel_type', sa.String(length=50), nullable=False),
+    sa.Column('sale_count', sa.Integer(), nullable=False),
+    sa.Column('total_litres', sa.Float(), nullable=False),
+    sa.Column('total_revenue', sa.Float(), nullable=False),
+    sa.Column('price_sum', sa.Float(), nullable=False),
+    sa.Column('min_price', sa.Float(), nullable=True),
+    sa.Column('max_price', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('period', 'bucket_start', 'pump_id', 'fuel_type', name='uq_sale_rollups_bucket')
+    )
+    with op.batch_alter_table('sale_rollups', schema=None) as batch_op:
+        batch_op.create_index('ix_sale_rollups_period_station', ['period', 'station_id', 'bucket_start'], unique=False)
+        batch_op.create_index('ix_sale_rollups_period_fuel_type', ['period', 'fuel_type', 'bucket_start'], unique=False)
+
+    # Backfill from existing sales so the analytics endpoints stay correct
+    if op.get_bind().dialect.name == 'postgresql':
+        buckets = {'hour': "date_trunc('hour', s.sale_timestamp)", 'day': "date_trunc('day', s.sale_timestamp)"}
+    else:
+        buckets = {'hour': "strftime('%Y-%m-%d %H:00:00.000000', s.sale_timestamp)",
+                   'day': "strftime('%Y-%m-%d 00:00:00.000000', s.sale_timestamp)"}
+    for period, bucket in buckets.items():
+        op.execute(f"""
+            INSERT INTO sale_rollups (period, bucket_start, pump_id, station_id, fuel_type, sale_count,
+                                      total_litres, total_revenue, price_sum, min_price, max_price)
+            SELECT '{period}', {bucket}, s.pump_id, p.station_id, s.fuel_type, COUNT(s.id),
+                   SUM(s.litres), SUM(s.total_amount), SUM(s.price_per_litre),
+                   MIN(s.price_per_litre), MAX(s.price_per_litre)
+            FROM sales s JOIN pumps p ON p.id = s.pump_id
+            WHERE s.sale_timestamp IS NOT NULL
+            GROUP BY {bucket}, s.pump_id, p.station_id, s.fuel_type
+        """)
+
+
+def downgrade():
+    with op.batch_alter_table('sale_rollups', schema=None) as batch_op:
+        batch_op.drop_index('ix_sale_rollups_period_fuel_type')
+        batch_op.drop_index('ix_sale_rollups_period_station')
+
+    op.drop_table('sale_rollups')
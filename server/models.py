@@ -2,11 +2,16 @@ from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy_serializer import SerializerMixin
 from sqlalchemy.orm import validates
 from datetime import datetime
+from database import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 class UserSale(db.Model):
     __tablename__ = 'user_sales'
+    __table_args__ = (
+        # The primary key leads with user_id; lookups by sale need their own index
+        db.Index('ix_user_sales_sale_id', 'sale_id'),
+    )
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
     sale_id = db.Column(db.Integer, db.ForeignKey('sales.id'), primary_key=True)
     # contribution = db.Column(db.Integer)  # example user-submitted attribute
@@ -82,6 +87,9 @@ class Station(db.Model, SerializerMixin):
 
 class Pump(db.Model, SerializerMixin):
     __tablename__ = "pumps"
+    __table_args__ = (
+        db.Index('ix_pumps_station_id', 'station_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     pump_number = db.Column(db.String(50), nullable=False)
@@ -129,6 +137,15 @@ class Pump(db.Model, SerializerMixin):
 
 class Sale(db.Model):
     __tablename__ = "sales"
+    __table_args__ = (
+        # Client transaction ids are unique per pump; NULLs (no id sent) never clash
+        db.Index('uq_sales_pump_transaction', 'pump_id', 'transaction_id', unique=True),
+        # Newest-first listings, keyset pages and time-range scans
+        db.Index('ix_sales_timestamp_id', 'sale_timestamp', 'id'),
+        # Per-pump history, pump joins and per-station filters via pump ids
+        db.Index('ix_sales_pump_timestamp', 'pump_id', 'sale_timestamp'),
+        db.Index('ix_sales_fuel_type_timestamp', 'fuel_type', 'sale_timestamp'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     fuel_type = db.Column(db.String(50), nullable=False)
     litres = db.Column(db.Float, nullable=False)
@@ -136,6 +153,7 @@ class Sale(db.Model):
     total_amount = db.Column(db.Float, nullable=False)
     sale_timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     pump_id = db.Column(db.Integer, db.ForeignKey("pumps.id"), nullable=False)
+    transaction_id = db.Column(db.String(64))
 
     # Relationships
     pump = db.relationship("Pump", back_populates="sales")
@@ -149,12 +167,16 @@ class Sale(db.Model):
             "price_per_litre": self.price_per_litre,
             "total_amount": self.total_amount,
             "sale_timestamp": self.sale_timestamp.isoformat(),
+            "transaction_id": self.transaction_id,
             "pump": self.pump.to_dict() if self.pump else None
         }
 
 
 class Staff(db.Model, SerializerMixin):
     __tablename__ = "staff"
+    __table_args__ = (
+        db.Index('ix_staff_station_id', 'station_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
@@ -180,3 +202,155 @@ class Staff(db.Model, SerializerMixin):
             'hire_date': self.hire_date.isoformat() if self.hire_date else None,
             'is_active': self.is_active
         }
+
+
+class SaleRollup(db.Model):
+    """Pre-aggregated sales per pump and fuel type for one hour or one day."""
+    __tablename__ = "sale_rollups"
+    __table_args__ = (
+        db.UniqueConstraint('period', 'bucket_start', 'pump_id', 'fuel_type', name='uq_sale_rollups_bucket'),
+        db.Index('ix_sale_rollups_period_station', 'period', 'station_id', 'bucket_start'),
+        db.Index('ix_sale_rollups_period_fuel_type', 'period', 'fuel_type', 'bucket_start'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    period = db.Column(db.String(10), nullable=False)  # 'hour' or 'day'
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    # Plain columns rather than foreign keys: rollups are derived data and
+    # are cleared explicitly whenever the pumps they describe go away
+    pump_id = db.Column(db.Integer, nullable=False)
+    station_id = db.Column(db.Integer)
+    fuel_type = db.Column(db.String(50), nullable=False)
+    sale_count = db.Column(db.Integer, nullable=False, default=0)
+    total_litres = db.Column(db.Float, nullable=False, default=0)
+    total_revenue = db.Column(db.Float, nullable=False, default=0)
+    price_sum = db.Column(db.Float, nullable=False, default=0)  # for average price per litre
+    min_price = db.Column(db.Float)
+    max_price = db.Column(db.Float)
+
+    def to_dict(self):
+        return {
+            "period": self.period,
+            "bucket_start": self.bucket_start.isoformat(),
+            "pump_id": self.pump_id,
+            "station_id": self.station_id,
+            "fuel_type": self.fuel_type,
+            "sale_count": self.sale_count,
+            "total_litres": self.total_litres,
+            "total_revenue": self.total_revenue,
+            "min_price": self.min_price,
+            "max_price": self.max_price
+        }
+
+
+class RevokedToken(db.Model):
+    """A logged-out JWT, kept until the token would have expired anyway."""
+    __tablename__ = "revoked_tokens"
+
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), nullable=False, unique=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "jti": self.jti,
+            "expires_at": self.expires_at.isoformat(),
+            "revoked_at": self.revoked_at.isoformat() if self.revoked_at else None
+        }
+
+
+class SalesArchiveMonth(db.Model):
+    """A calendar month of sales moved out of `sales` into archive storage (see archive.py)."""
+    __tablename__ = "sales_archive_months"
+
+    id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.DateTime, nullable=False, unique=True)
+    table_name = db.Column(db.String(64), nullable=False)
+    sale_count = db.Column(db.Integer, nullable=False, default=0)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "month": self.month.strftime("%Y-%m"),
+            "table_name": self.table_name,
+            "sale_count": self.sale_count,
+            "archived_at": self.archived_at.isoformat() if self.archived_at else None
+        }
+
+
+class Tank(db.Model):
+    """
+    Fuel stock for one fuel type at a station. `level_litres` is a running
+    balance: every sale draws it down and every delivery tops it up in the
+    same transaction (see inventory.py), so reading it never sums history.
+    """
+    __tablename__ = "tanks"
+    __table_args__ = (
+        db.UniqueConstraint('station_id', 'fuel_type', name='uq_tanks_station_fuel_type'),
+        # The dashboard's alert list reads only the tanks flagged low
+        db.Index('ix_tanks_is_low', 'is_low'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    station_id = db.Column(db.Integer, db.ForeignKey("stations.id"), nullable=False)
+    fuel_type = db.Column(db.String(50), nullable=False)
+    capacity_litres = db.Column(db.Float, nullable=False)
+    level_litres = db.Column(db.Float, nullable=False, default=0)
+    low_level_litres = db.Column(db.Float, nullable=False, default=0)
+    is_low = db.Column(db.Boolean, nullable=False, default=False)
+    low_since = db.Column(db.DateTime)
+    # Reconciliation starts from the level the tank was opened with and
+    # counts only sales recorded after it (ids above opening_sale_id)
+    opening_litres = db.Column(db.Float, nullable=False, default=0)
+    opening_sale_id = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    station = db.relationship("Station")
+    deliveries = db.relationship("Delivery", back_populates="tank", cascade="all, delete-orphan")
+
+    @validates('capacity_litres')
+    def validate_capacity(self, key, value):
+        if value is None or value <= 0:
+            raise ValueError("Tank capacity must be greater than zero")
+        return value
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "station_id": self.station_id,
+            "fuel_type": self.fuel_type,
+            "capacity_litres": self.capacity_litres,
+            "level_litres": self.level_litres,
+            "low_level_litres": self.low_level_litres,
+            "percent_full": round(self.level_litres / self.capacity_litres * 100, 1),
+            "is_low": self.is_low,
+            "low_since": self.low_since.isoformat() if self.low_since else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class Delivery(db.Model):
+    """Fuel received into a tank."""
+    __tablename__ = "deliveries"
+    __table_args__ = (
+        db.Index('ix_deliveries_tank_delivered_at', 'tank_id', 'delivered_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    tank_id = db.Column(db.Integer, db.ForeignKey("tanks.id"), nullable=False)
+    litres = db.Column(db.Float, nullable=False)
+    delivered_at = db.Column(db.DateTime, default=datetime.utcnow)
+    reference = db.Column(db.String(64))
+
+    tank = db.relationship("Tank", back_populates="deliveries")
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "tank_id": self.tank_id,
+            "litres": self.litres,
+            "delivered_at": self.delivered_at.isoformat() if self.delivered_at else None,
+            "reference": self.reference
+        }
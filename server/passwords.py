@@ -0,0 +1,107 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import g, request
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HashingBusy(Exception):
+    """Raised when no hashing slot frees up within the queue timeout."""
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _check(password_hash, password):
+    return check_password_hash(password_hash, password)
+
+
+class PasswordHasher:
+    """
+    Runs werkzeug's password hashing on a small process pool so the CPU-heavy
+    KDF neither holds the GIL of the web worker nor runs unbounded. A
+    semaphore caps jobs in flight per worker; callers wait for a slot up to
+    PASSWORD_HASH_QUEUE_TIMEOUT seconds and then get HashingBusy. Time spent
+    waiting and hashing is recorded per endpoint and sent as Server-Timing.
+    """
+
+    def __init__(self, app=None):
+        self.stats = defaultdict(lambda: {"count": 0, "queue_seconds": 0.0, "hash_seconds": 0.0, "max_queue_seconds": 0.0})
+        self._stats_lock = threading.Lock()
+        self._pool = None
+        self._pool_pid = None
+        self._method_prefix = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.method = app.config.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+        self.workers = app.config.get("PASSWORD_HASH_WORKERS", 2)
+        self.queue_timeout = app.config.get("PASSWORD_HASH_QUEUE_TIMEOUT", 10)
+        self._slots = threading.BoundedSemaphore(app.config.get("PASSWORD_HASH_MAX_CONCURRENCY", 2))
+        app.extensions["password_hasher"] = self
+        app.after_request(self._add_server_timing)
+
+    def _executor(self):
+        # One pool per process; a forked gunicorn worker must not reuse its parent's
+        if self._pool is None or self._pool_pid != os.getpid():
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            self._pool_pid = os.getpid()
+        return self._pool
+
+    def _run(self, function, *args):
+        queued = time.perf_counter()
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise HashingBusy("Password hashing is saturated, try again shortly")
+        started = time.perf_counter()
+        try:
+            if self.workers > 0:
+                result = self._executor().submit(function, *args).result()
+            else:
+                result = function(*args)
+        finally:
+            self._slots.release()
+        finished = time.perf_counter()
+        self._record(started - queued, finished - started)
+        return result
+
+    def _record(self, queue_seconds, hash_seconds):
+        endpoint = request.endpoint if request else None
+        with self._stats_lock:
+            stats = self.stats[endpoint]
+            stats["count"] += 1
+            stats["queue_seconds"] += queue_seconds
+            stats["hash_seconds"] += hash_seconds
+            stats["max_queue_seconds"] = max(stats["max_queue_seconds"], queue_seconds)
+        timings = g.setdefault("password_timings", [])
+        timings.append((queue_seconds, hash_seconds))
+
+    def hash(self, password):
+        return self._run(_hash, password, self.method)
+
+    def check(self, password_hash, password):
+        return self._run(_check, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True when `password_hash` was made with other parameters than PASSWORD_HASH_METHOD."""
+        if self._method_prefix is None:
+            # werkzeug expands shorthand like "scrypt" to its full parameter list
+            self._method_prefix = generate_password_hash("", method=self.method).split("$", 1)[0]
+        return password_hash.split("$", 1)[0] != self._method_prefix
+
+    def _add_server_timing(self, response):
+        timings = g.pop("password_timings", None)
+        if timings:
+            queue_ms = sum(queue for queue, _ in timings) * 1000
+            hash_ms = sum(hashing for _, hashing in timings) * 1000
+            response.headers.add(
+                "Server-Timing", f"hash-queue;dur={queue_ms:.1f}, hash;dur={hash_ms:.1f}"
+            )
+        return response
+
+
+password_hasher = PasswordHasher()
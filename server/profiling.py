@@ -0,0 +1,257 @@
+import cProfile
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from models import db
+from serializers import FastJSONProvider, Shape
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger = logging.getLogger("petrol_station.requests")
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{key}="{_label(value)}"' for key, value in labels.items()) + "}"
+
+
+class RequestProfiler:
+    """
+    Opt-in per-request instrumentation (PROFILING_ENABLED). For each request it
+    records wall time, SQL statements and time spent in the database (from
+    cursor events), the slowest statements, and time spent in model to_dict()
+    and JSON encoding. The numbers go out as a Server-Timing header, one JSON
+    log line on the "petrol_station.requests" logger, and Prometheus metrics.
+    Routes named in PROFILING_SAMPLE_ROUTES are additionally run under
+    cProfile for a PROFILING_SAMPLE_RATE share of requests, with the stats
+    dumped to PROFILING_DIR for `python -m pstats` or snakeviz.
+
+    Metrics live in process memory, so each gunicorn worker reports its own.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self._metrics = defaultdict(lambda: {
+            "count": 0, "seconds": 0.0, "buckets": [0] * len(LATENCY_BUCKETS),
+            "statements": 0, "db_seconds": 0.0, "serialize_seconds": 0.0,
+        })
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get("PROFILING_ENABLED", False)
+        self.slow_statements = app.config.get("PROFILING_SLOW_STATEMENTS", 3)
+        self.sample_routes = set(app.config.get("PROFILING_SAMPLE_ROUTES", ()))
+        self.sample_rate = app.config.get("PROFILING_SAMPLE_RATE", 1.0)
+        self.profile_dir = app.config.get("PROFILING_DIR", os.path.join(app.instance_path, "profiles"))
+        app.extensions["request_profiler"] = self
+        if not self.enabled:
+            return
+
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+
+        # Only this app's engines (primary and replicas); call after db.init_app(app)
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+                event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+                event.listen(engine, "handle_error", self._handle_error)
+        for mapper in db.Model.registry.mappers:
+            model = mapper.class_
+            if "to_dict" in vars(model):
+                model.to_dict = self._timed_serializer(model.to_dict)
+        Shape.build = self._timed_serializer(Shape.build)
+        app.json = _TimedJSONProvider(app, self)
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._stop_sampling)
+
+    # Per-request bookkeeping
+
+    def _profile(self):
+        if has_request_context():
+            return g.get("profile")
+        return None
+
+    def _start(self):
+        g.profile = {
+            "started": time.perf_counter(),
+            "statements": 0,
+            "db_seconds": 0.0,
+            "slowest": [],
+            "serialize_seconds": 0.0,
+            "serialize_depth": 0,
+        }
+        sampled = request.endpoint in self.sample_routes or (request.url_rule and request.url_rule.rule in self.sample_routes)
+        if sampled and random.random() < self.sample_rate:
+            g.cprofile = cProfile.Profile()
+            g.cprofile.enable()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["profile_started"].pop()
+        profile = self._profile()
+        if profile is None:
+            return
+        seconds = time.perf_counter() - started
+        profile["statements"] += 1
+        profile["db_seconds"] += seconds
+        slowest = profile["slowest"]
+        if len(slowest) < self.slow_statements or seconds > slowest[-1][0]:
+            slowest.append((seconds, " ".join(statement.split())[:500]))
+            slowest.sort(key=lambda item: item[0], reverse=True)
+            del slowest[self.slow_statements:]
+
+    def _handle_error(self, context):
+        # A failed statement never reaches after_cursor_execute
+        started = context.connection.info.get("profile_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+    def _timed_serializer(self, function):
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            profile = self._profile()
+            if profile is None:
+                return function(*args, **kwargs)
+            # to_dict() nests (a station serializes its pumps); only time the outermost call
+            profile["serialize_depth"] += 1
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profile["serialize_depth"] -= 1
+                if profile["serialize_depth"] == 0:
+                    profile["serialize_seconds"] += time.perf_counter() - started
+        return timed
+
+    def _finish(self, response):
+        profile = g.get("profile")
+        if profile is None:
+            return response
+        seconds = time.perf_counter() - profile["started"]
+        response.headers.add(
+            "Server-Timing",
+            f"app;dur={seconds * 1000:.1f}, "
+            f"db;dur={profile['db_seconds'] * 1000:.1f};desc=\"{profile['statements']} queries\", "
+            f"serialize;dur={profile['serialize_seconds'] * 1000:.1f}"
+        )
+        endpoint = request.endpoint or "unmatched"
+        logger.info(json.dumps({
+            "method": request.method,
+            "path": request.full_path.rstrip("?"),
+            "endpoint": endpoint,
+            "status": response.status_code,
+            "duration_ms": round(seconds * 1000, 2),
+            "sql_statements": profile["statements"],
+            "sql_ms": round(profile["db_seconds"] * 1000, 2),
+            "serialize_ms": round(profile["serialize_seconds"] * 1000, 2),
+            "slowest_sql": [{"ms": round(s * 1000, 2), "sql": sql} for s, sql in profile["slowest"]],
+        }))
+        with self._lock:
+            metrics = self._metrics[(request.method, endpoint, response.status_code)]
+            metrics["count"] += 1
+            metrics["seconds"] += seconds
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    metrics["buckets"][index] += 1
+            metrics["statements"] += profile["statements"]
+            metrics["db_seconds"] += profile["db_seconds"]
+            metrics["serialize_seconds"] += profile["serialize_seconds"]
+        return response
+
+    def _stop_sampling(self, exc):
+        profiler = g.pop("cprofile", None)
+        if profiler is None:
+            return
+        profiler.disable()
+        os.makedirs(self.profile_dir, exist_ok=True)
+        name = f"{request.endpoint}-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{threading.get_ident()}.prof"
+        profiler.dump_stats(os.path.join(self.profile_dir, name))
+
+    # Prometheus exposition
+
+    def metrics_text(self, password_stats=None):
+        """Render the collected metrics in the Prometheus text format."""
+        with self._lock:
+            snapshot = {key: dict(value, buckets=list(value["buckets"])) for key, value in self._metrics.items()}
+
+        lines = [
+            "# HELP http_request_duration_seconds Wall time spent handling requests.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, endpoint, status), metrics in sorted(snapshot.items()):
+            for bound, count in zip(LATENCY_BUCKETS, metrics["buckets"]):
+                labels = _labels(method=method, endpoint=endpoint, status=status, le=bound)
+                lines.append(f"http_request_duration_seconds_bucket{labels} {count}")
+            labels = _labels(method=method, endpoint=endpoint, status=status, le="+Inf")
+            lines.append(f"http_request_duration_seconds_bucket{labels} {metrics['count']}")
+            labels = _labels(method=method, endpoint=endpoint, status=status)
+            lines.append(f"http_request_duration_seconds_sum{labels} {metrics['seconds']:.6f}")
+            lines.append(f"http_request_duration_seconds_count{labels} {metrics['count']}")
+
+        counters = [
+            ("http_request_sql_statements_total", "SQL statements issued while handling requests.", "statements", "{}"),
+            ("http_request_sql_seconds_total", "Time spent executing SQL while handling requests.", "db_seconds", "{:.6f}"),
+            ("http_request_serialize_seconds_total", "Time spent in to_dict() and JSON encoding.", "serialize_seconds", "{:.6f}"),
+        ]
+        for name, help_text, key, number in counters:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for (method, endpoint, status), metrics in sorted(snapshot.items()):
+                lines.append(f"{name}{_labels(method=method, endpoint=endpoint, status=status)} {number.format(metrics[key])}")
+
+        if password_stats:
+            password_counters = [
+                ("password_hash_operations_total", "Password hashes and checks run on the pool.", "count", "{}"),
+                ("password_hash_queue_seconds_total", "Time spent waiting for a hashing slot.", "queue_seconds", "{:.6f}"),
+                ("password_hash_seconds_total", "Time spent hashing passwords.", "hash_seconds", "{:.6f}"),
+            ]
+            for name, help_text, key, number in password_counters:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for endpoint, stats in sorted(password_stats.items(), key=lambda item: str(item[0])):
+                    lines.append(f"{name}{_labels(endpoint=endpoint or 'none')} {number.format(stats[key])}")
+        return "\n".join(lines) + "\n"
+
+
+class _TimedJSONProvider(FastJSONProvider):
+    """The app's JSON provider, with encoding time added to the request's serialize time."""
+
+    def __init__(self, app, profiler):
+        super().__init__(app)
+        self.profiler = profiler
+
+    def dumps(self, obj, **kwargs):
+        profile = self.profiler._profile()
+        if profile is None:
+            return super().dumps(obj, **kwargs)
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            profile["serialize_seconds"] += time.perf_counter() - started
+
+
+request_profiler = RequestProfiler()
@@ -0,0 +1,102 @@
+import threading
+from contextlib import contextmanager
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import event
+
+from models import db, Pump, Sale, Station, Staff
+
+# Maximum SQL statements each read endpoint may issue, independent of row
+# counts. An endpoint that lazy-loads per row blows through these as soon
+# as the database holds more than a handful of records.
+QUERY_BUDGETS = {
+    "/sales": 1,
+    "/sales/{sale_id}": 1,
+    "/pumps": 1,
+    "/pumps/{pump_id}": 1,
+    "/stations": 3,
+    "/stations/{station_id}": 3,
+    "/staff": 1,
+    "/sales/by-station": 1,
+    "/dashboard": 5,
+    "/tanks": 1,
+}
+
+
+@contextmanager
+def count_queries(engine):
+    """Record every statement this thread sends to `engine` while the block runs.
+
+    Background threads (the revocation list sync) share the engine, so their
+    statements are left out.
+    """
+    statements = []
+    thread = threading.get_ident()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == thread:
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def _sample_ids():
+    return {
+        "sale_id": db.session.query(db.func.min(Sale.id)).scalar(),
+        "pump_id": db.session.query(db.func.min(Pump.id)).scalar(),
+        "station_id": db.session.query(db.func.min(Station.id)).scalar(),
+        "staff_id": db.session.query(db.func.min(Staff.id)).scalar(),
+    }
+
+
+def run_query_budgets(app, budgets=QUERY_BUDGETS):
+    """
+    Request every budgeted endpoint through the test client and return a
+    list of (path, status, query_count, budget, statements) tuples.
+    """
+    with app.app_context():
+        ids = _sample_ids()
+        engine = db.engine
+
+    results = []
+    client = app.test_client()
+    for template, budget in budgets.items():
+        try:
+            path = template.format(**ids)
+        except KeyError:
+            continue
+        if "None" in path:
+            # No row to look up for this detail route in the current database
+            continue
+        # A fresh app context per request gives each one its own session,
+        # so nothing is served from an identity map warmed by an earlier call
+        with app.app_context(), count_queries(engine) as statements:
+            response = client.get(path)
+        results.append((path, response.status_code, len(statements), budget, list(statements)))
+    return results
+
+
+@click.command("check-query-budgets")
+@click.option("--verbose", is_flag=True, help="Print the statements of endpoints over budget.")
+@with_appcontext
+def check_query_budgets(verbose):
+    """Fail when a read endpoint issues more SQL statements than its budget.
+
+    Run against a seeded database (python seed.py) so N+1 patterns show up.
+    """
+    failures = 0
+    for path, status, count, budget, statements in run_query_budgets(current_app._get_current_object()):
+        over = count > budget or status >= 500
+        failures += over
+        click.echo(f"{'FAIL' if over else 'ok  '} {path:<28} {status} {count:>3} queries (budget {budget})")
+        if over and verbose:
+            for statement in statements:
+                click.echo(f"        {' '.join(statement.split())[:160]}")
+    if failures:
+        raise SystemExit(f"{failures} endpoint(s) over their query budget")
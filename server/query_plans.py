@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, select, text
+
+from models import db, Pump, Sale, Staff, UserSale
+
+SINCE = datetime(2000, 1, 1)
+
+
+def plan_checks():
+    """
+    (name, statement, expected index) for the queries behind the hot
+    endpoints. Each statement mirrors what the endpoint issues.
+    """
+    return [
+        ("dashboard recent sales",
+         select(Sale.id).order_by(Sale.sale_timestamp.desc(), Sale.id.desc()).limit(10),
+         "ix_sales_timestamp_id"),
+        ("sales keyset page",
+         select(Sale.id).where(Sale.sale_timestamp < SINCE + timedelta(days=1))
+         .order_by(Sale.sale_timestamp.desc(), Sale.id.desc()).limit(101),
+         "ix_sales_timestamp_id"),
+        ("sales for a pump in a time range",
+         select(Sale.id).where(Sale.pump_id == 1, Sale.sale_timestamp >= SINCE),
+         "ix_sales_pump_timestamp"),
+        ("sales by fuel type",
+         select(Sale.id).where(Sale.fuel_type == 'Diesel', Sale.sale_timestamp >= SINCE),
+         "ix_sales_fuel_type_timestamp"),
+        ("sales joined to a station's pumps",
+         select(func.count(Sale.id)).join(Pump, Pump.id == Sale.pump_id).where(Pump.station_id == 1),
+         "ix_sales_pump_timestamp"),
+        ("pumps for a station",
+         select(Pump.id).where(Pump.station_id == 1),
+         "ix_pumps_station_id"),
+        ("staff for a station",
+         select(Staff.id).where(Staff.station_id == 1),
+         "ix_staff_station_id"),
+        ("users on a sale",
+         select(UserSale.user_id).where(UserSale.sale_id == 1),
+         "ix_user_sales_sale_id"),
+    ]
+
+
+def explain(connection, statement):
+    """Return the query plan of `statement` as one string."""
+    dialect = connection.dialect
+    # Render named parameters so the same text works with both drivers
+    compiled = statement.compile(dialect=dialect.__class__(paramstyle='named'))
+    if dialect.name == 'postgresql':
+        rows = connection.execute(text(f"EXPLAIN {compiled}"), compiled.params)
+        return "\n".join(row[0] for row in rows)
+    rows = connection.execute(text(f"EXPLAIN QUERY PLAN {compiled}"), compiled.params)
+    return "\n".join(row[-1] for row in rows)
+
+
+def run_plan_checks():
+    """Return (name, expected_index, used, plan) for every check."""
+    results = []
+    with db.engine.connect() as connection:
+        if connection.dialect.name == 'postgresql':
+            # Tiny development tables would otherwise always plan as seq scans
+            connection.execute(text("SET enable_seqscan = off"))
+        for name, statement, index in plan_checks():
+            plan = explain(connection, statement)
+            results.append((name, index, index in plan, plan))
+        connection.rollback()
+    return results
+
+
+@click.command("check-query-plans")
+@click.option("--verbose", is_flag=True, help="Print the plan of every query.")
+@with_appcontext
+def check_query_plans(verbose):
+    """Fail when a hot query does not use the index it was built for."""
+    failures = 0
+    for name, index, used, plan in run_plan_checks():
+        failures += not used
+        click.echo(f"{'ok  ' if used else 'FAIL'} {name:<36} {index}")
+        if verbose or not used:
+            for line in plan.splitlines():
+                click.echo(f"        {line}")
+    if failures:
+        raise SystemExit(f"{failures} query plan(s) not using their index")
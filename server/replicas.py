@@ -0,0 +1,80 @@
+import hashlib
+import itertools
+import threading
+import time
+from functools import wraps
+
+from flask import g, request
+
+from auth_cache import _TTLMap
+
+STICKY_COOKIE = "read_primary_until"
+
+
+class ReplicaRouter:
+    """
+    Routes the read-only views marked with `replica_reads` to the replica
+    binds in DATABASE_REPLICA_URLS, round robin. For DATABASE_REPLICA_LAG
+    seconds after a client's successful write its reads stay on the primary
+    (read-your-writes): the client is remembered by a cookie, which holds
+    across workers, and by token or address in this worker for clients that
+    ignore cookies. The same window caps how long the response cache keeps
+    a page rendered from a replica.
+    """
+
+    def __init__(self, app=None):
+        self.replicas = []
+        self._cycle = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        binds = app.config.get("SQLALCHEMY_BINDS") or {}
+        self.replicas = sorted(key for key in binds if key.startswith("replica"))
+        self._cycle = itertools.cycle(self.replicas)
+        self.lag = app.config.get("DATABASE_REPLICA_LAG", 5)
+        self._recent_writers = _TTLMap(app.config.get("DATABASE_REPLICA_STICKY_CLIENTS", 10000), self.lag)
+        app.extensions["replica_router"] = self
+        if self.replicas:
+            app.after_request(self._after_request)
+
+    def _client_key(self):
+        credential = request.headers.get("Authorization") or request.remote_addr or ""
+        return hashlib.blake2b(credential.encode(), digest_size=16).hexdigest()
+
+    def _pinned_to_primary(self):
+        try:
+            if float(request.cookies.get(STICKY_COOKIE, 0)) > time.time():
+                return True
+        except ValueError:
+            pass
+        return self._recent_writers.get(self._client_key()) is not None
+
+    def choose(self):
+        """The replica bind for this request, or None to stay on the primary."""
+        if not self.replicas or self._pinned_to_primary():
+            return None
+        with self._lock:
+            return next(self._cycle)
+
+    def replica_reads(self, view):
+        """Serve a read-only view from a replica unless the client just wrote."""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            g.db_replica = self.choose()
+            return view(*args, **kwargs)
+        return wrapper
+
+    def _after_request(self, response):
+        if "db_replica" in g:
+            response.headers["X-DB-Route"] = g.db_replica or "primary"
+        if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+            until = time.time() + self.lag
+            self._recent_writers.put(self._client_key(), until)
+            response.set_cookie(STICKY_COOKIE, f"{until:.3f}", max_age=int(self.lag) + 1,
+                                httponly=True, samesite="Lax")
+        return response
+
+
+replica_router = ReplicaRouter()
@@ -0,0 +1,134 @@
+import hashlib
+import math
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import delete, select
+
+from models import db, RevokedToken
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings; no deletes, rebuilt on purge."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.size = max(64, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        # Kirsch-Mitzenmacher: k positions from two independent hashes
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    """
+    In-process view of the revoked_tokens table. The Bloom filter answers
+    the common "not revoked" case; the dict of jti -> expiry confirms the
+    rare positives. Neither is touched by the request path's database
+    session: a background thread reloads the unexpired rows (the table only
+    holds tokens that have not expired yet, so this stays small) and
+    periodically drops expired entries locally and in the table.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._revoked = {}
+        self._bloom = BloomFilter(1000)
+        self._worker_pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.capacity = app.config.get("REVOCATION_BLOOM_CAPACITY", 100000)
+        self.sync_interval = app.config.get("REVOCATION_SYNC_INTERVAL", 5)
+        self.purge_interval = app.config.get("REVOCATION_PURGE_INTERVAL", 600)
+        self._bloom = BloomFilter(self.capacity)
+        app.extensions["revocation_list"] = self
+
+    def is_revoked(self, jti):
+        self._ensure_worker()
+        if jti not in self._bloom:
+            return False
+        return jti in self._revoked
+
+    def revoke(self, jti, expires_at):
+        """Persist a revocation and apply it to this worker immediately."""
+        db.session.add(RevokedToken(jti=jti, expires_at=expires_at))
+        db.session.commit()
+        self._add(jti, expires_at)
+
+    def _add(self, jti, expires_at):
+        with self._lock:
+            self._revoked[jti] = expires_at
+            self._bloom.add(jti)
+
+    def sync(self):
+        """
+        Load every unexpired revocation written by any worker. Ids are not a
+        usable cursor: a sequence hands them out before commit, so a row can
+        become visible after a higher id was already read.
+        """
+        rows = db.session.execute(
+            select(RevokedToken.jti, RevokedToken.expires_at)
+            .where(RevokedToken.expires_at >= datetime.utcnow())
+        ).all()
+        for jti, expires_at in rows:
+            if jti not in self._revoked:
+                self._add(jti, expires_at)
+        db.session.remove()
+
+    def purge(self):
+        """Forget expired revocations here and delete them from the table."""
+        now = datetime.utcnow()
+        db.session.execute(delete(RevokedToken).where(RevokedToken.expires_at < now))
+        db.session.commit()
+        db.session.remove()
+        with self._lock:
+            live = {jti: expires_at for jti, expires_at in self._revoked.items() if expires_at >= now}
+            bloom = BloomFilter(max(self.capacity, len(live) * 2))
+            for jti in live:
+                bloom.add(jti)
+            self._revoked, self._bloom = live, bloom
+
+    def _ensure_worker(self):
+        # Started lazily, and again after a fork, so each gunicorn worker runs its own
+        if self._worker_pid == os.getpid() or self.app is None:
+            return
+        with self._lock:
+            if self._worker_pid == os.getpid():
+                return
+            self._worker_pid = os.getpid()
+        with self.app.app_context():
+            self.sync()
+        threading.Thread(target=self._run, name="token-revocation-sync", daemon=True).start()
+
+    def _run(self):
+        next_purge = time.monotonic() + self.purge_interval
+        while True:
+            time.sleep(self.sync_interval)
+            try:
+                with self.app.app_context():
+                    self.sync()
+                    if time.monotonic() >= next_purge:
+                        self.purge()
+                        next_purge = time.monotonic() + self.purge_interval
+            except Exception as e:
+                self.app.logger.warning("Token revocation sync failed: %s", e)
+
+
+revocation_list = RevocationList()
@@ -0,0 +1,198 @@
+from datetime import timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import case, delete, func, literal, select, type_coerce, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from archive import sales_source
+from models import db, Pump, SaleRollup
+
+PERIODS = ('hour', 'day')
+
+_PERIOD_LENGTH = {'hour': timedelta(hours=1), 'day': timedelta(days=1)}
+
+
+def bucket_start(timestamp, period):
+    """Truncate a datetime to the start of its hour or day bucket."""
+    if period == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+# Match SQLAlchemy's SQLite DATETIME storage format so truncated values
+# compare equal to the ones bound from Python
+_SQLITE_TRUNCATE_FORMATS = {
+    'minute': '%Y-%m-%d %H:%M:00.000000',
+    'hour': '%Y-%m-%d %H:00:00.000000',
+    'day': '%Y-%m-%d 00:00:00.000000',
+}
+
+
+def bucket_expression(column, period, dialect_name):
+    """SQL truncation of `column` to a minute, hour or day for SQLite and Postgres."""
+    if dialect_name == 'postgresql':
+        return func.date_trunc(period, column)
+    return type_coerce(func.strftime(_SQLITE_TRUNCATE_FORMATS[period], column), db.DateTime)
+
+
+def _insert(dialect_name):
+    if dialect_name == 'postgresql':
+        return postgresql.insert(SaleRollup)
+    return sqlite.insert(SaleRollup)
+
+
+def _upsert_statement(dialect_name):
+    rollup = SaleRollup.__table__
+    stmt = _insert(dialect_name)
+    excluded = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=['period', 'bucket_start', 'pump_id', 'fuel_type'],
+        set_={
+            'station_id': excluded.station_id,
+            'sale_count': rollup.c.sale_count + excluded.sale_count,
+            'total_litres': rollup.c.total_litres + excluded.total_litres,
+            'total_revenue': rollup.c.total_revenue + excluded.total_revenue,
+            'price_sum': rollup.c.price_sum + excluded.price_sum,
+            'min_price': case((rollup.c.min_price.is_(None), excluded.min_price),
+                              (excluded.min_price < rollup.c.min_price, excluded.min_price),
+                              else_=rollup.c.min_price),
+            'max_price': case((rollup.c.max_price.is_(None), excluded.max_price),
+                              (excluded.max_price > rollup.c.max_price, excluded.max_price),
+                              else_=rollup.c.max_price),
+        }
+    )
+
+
+def record_sales(sales):
+    """
+    Add newly inserted sales to their hour and day buckets.
+
+    `sales` is an iterable of objects or dicts exposing pump_id, fuel_type,
+    sale_timestamp, litres, total_amount and price_per_litre. Deltas are
+    folded per bucket in Python first, so a batch of thousands of sales is
+    one executemany upsert over the distinct buckets it touches. Runs in the
+    caller's transaction.
+    """
+    deltas = {}
+    for sale in sales:
+        get = sale.get if isinstance(sale, dict) else lambda key: getattr(sale, key)
+        for period in PERIODS:
+            key = (period, bucket_start(get('sale_timestamp'), period), get('pump_id'), get('fuel_type'))
+            delta = deltas.get(key)
+            price = get('price_per_litre')
+            if delta is None:
+                deltas[key] = delta = {
+                    'period': key[0], 'bucket_start': key[1], 'pump_id': key[2], 'fuel_type': key[3],
+                    'sale_count': 0, 'total_litres': 0.0, 'total_revenue': 0.0, 'price_sum': 0.0,
+                    'min_price': price, 'max_price': price,
+                }
+            delta['sale_count'] += 1
+            delta['total_litres'] += get('litres')
+            delta['total_revenue'] += get('total_amount')
+            delta['price_sum'] += price
+            delta['min_price'] = min(delta['min_price'], price)
+            delta['max_price'] = max(delta['max_price'], price)
+
+    if not deltas:
+        return
+
+    pump_ids = {key[2] for key in deltas}
+    stations = dict(db.session.execute(
+        select(Pump.id, Pump.station_id).where(Pump.id.in_(pump_ids))
+    ).all())
+    for delta in deltas.values():
+        delta['station_id'] = stations.get(delta['pump_id'])
+
+    db.session.execute(_upsert_statement(db.engine.dialect.name), list(deltas.values()))
+
+
+def bucket_keys(pump_id, fuel_type, timestamp):
+    """The (period, bucket_start, pump_id, fuel_type) keys a sale lands in."""
+    return {(period, bucket_start(timestamp, period), pump_id, fuel_type) for period in PERIODS}
+
+
+def refresh_buckets(keys):
+    """
+    Recompute the given buckets from the sales table, plus the archive for
+    buckets in archived months. Used after updates and deletes, where
+    min/max prices cannot be maintained by subtraction. Each bucket covers
+    one pump for at most a day, so this stays cheap.
+    """
+    db.session.flush()
+    rollup = SaleRollup.__table__
+    for period, start, pump_id, fuel_type in keys:
+        db.session.execute(delete(rollup).where(
+            rollup.c.period == period,
+            rollup.c.bucket_start == start,
+            rollup.c.pump_id == pump_id,
+            rollup.c.fuel_type == fuel_type,
+        ))
+        sale = sales_source(start, start + _PERIOD_LENGTH[period])
+        aggregate = select(
+            literal(period), literal(start, db.DateTime), sale.pump_id, Pump.station_id, sale.fuel_type,
+            func.count(sale.id), func.sum(sale.litres), func.sum(sale.total_amount),
+            func.sum(sale.price_per_litre), func.min(sale.price_per_litre), func.max(sale.price_per_litre),
+        ).join(Pump, Pump.id == sale.pump_id).where(
+            sale.pump_id == pump_id,
+            sale.fuel_type == fuel_type,
+            sale.sale_timestamp >= start,
+            sale.sale_timestamp < start + _PERIOD_LENGTH[period],
+        ).group_by(sale.pump_id, Pump.station_id, sale.fuel_type)
+        db.session.execute(rollup.insert().from_select(_ROLLUP_COLUMNS, aggregate))
+
+
+def move_pump(pump_id, station_id):
+    """Keep the denormalised station_id in step when a pump changes station."""
+    db.session.execute(
+        update(SaleRollup.__table__)
+        .where(SaleRollup.pump_id == pump_id)
+        .values(station_id=station_id)
+    )
+
+
+def forget_pumps(pump_ids):
+    """Drop the rollups of pumps whose sales are being deleted wholesale."""
+    pump_ids = list(pump_ids)
+    if pump_ids:
+        db.session.execute(delete(SaleRollup.__table__).where(SaleRollup.pump_id.in_(pump_ids)))
+
+
+_ROLLUP_COLUMNS = [
+    'period', 'bucket_start', 'pump_id', 'station_id', 'fuel_type', 'sale_count',
+    'total_litres', 'total_revenue', 'price_sum', 'min_price', 'max_price',
+]
+
+
+def rebuild_rollups():
+    """Recreate every rollup row with one INSERT ... SELECT per period."""
+    dialect_name = db.engine.dialect.name
+    rollup = SaleRollup.__table__
+    db.session.execute(delete(rollup))
+    # Archived months keep their rollups, so rebuild from them too
+    sale = sales_source(include_archive=True)
+    for period in PERIODS:
+        bucket = bucket_expression(sale.sale_timestamp, period, dialect_name)
+        aggregate = select(
+            literal(period), bucket, sale.pump_id, Pump.station_id, sale.fuel_type,
+            func.count(sale.id), func.sum(sale.litres), func.sum(sale.total_amount),
+            func.sum(sale.price_per_litre), func.min(sale.price_per_litre), func.max(sale.price_per_litre),
+        ).join(Pump, Pump.id == sale.pump_id)\
+            .where(sale.sale_timestamp.isnot(None))\
+            .group_by(bucket, sale.pump_id, Pump.station_id, sale.fuel_type)
+        db.session.execute(rollup.insert().from_select(_ROLLUP_COLUMNS, aggregate))
+    db.session.commit()
+    return db.session.query(func.count(SaleRollup.id)).scalar()
+
+
+@click.command("rebuild-rollups")
+@with_appcontext
+def rebuild_rollups_command():
+    """Rebuild the hourly and daily sales rollups from the sales table and its archive."""
+    count = rebuild_rollups()
+    # Shared (Redis) response caches may still hold figures from the old rollups
+    response_cache = current_app.extensions.get('response_cache')
+    if response_cache is not None:
+        response_cache.invalidate('sales')
+    click.echo(f"Rebuilt {count} rollup rows")
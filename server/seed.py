@@ -1,6 +1,8 @@
 from app import app
-from models import db, Station, Pump, Staff, Sale, User
-from datetime import datetime
+from models import db, Station, Pump, Staff, User
+from rollups import rebuild_rollups
+from generate import iter_sales, pump_profiles, write_sales
+from datetime import datetime, timedelta
 import random
 from werkzeug.security import generate_password_hash
 
@@ -107,32 +109,20 @@ with app.app_context():
     db.session.add_all(staff_members)
     db.session.commit()
 
-    # Create sales
-    sales = []
-    for _ in range(25):
-        pump = random.choice(pumps)
-        litres = round(random.uniform(10.0, 80.0), 1)
-        price_per_litre = round(random.uniform(120.0, 180.0), 2)  # KES prices
-        total_amount = round(litres * price_per_litre, 2)
-        
-        sale = Sale(
-            fuel_type=pump.fuel_type,
-            litres=litres,
-            price_per_litre=price_per_litre,
-            total_amount=total_amount,
-            pump_id=pump.id,
-            sale_timestamp=datetime.utcnow()
-        )
-        sales.append(sale)
-    
-    db.session.add_all(sales)
-    db.session.commit()
+    # Create a week of sales with realistic daily and weekly patterns
+    rng = random.Random(42)
+    end = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    profiles = pump_profiles(rng, [(pump.id, pump.fuel_type, pump.station_id) for pump in pumps])
+    sales_count = write_sales(iter_sales(rng, profiles, end - timedelta(days=7), 7, rate=1.5))
+
+    # Sales were bulk inserted, so derive their rollups once
+    rebuild_rollups()
 
     print("Database seeded successfully!")
     print(f"Created {len(stations)} stations")
     print(f"Created {len(pumps)} pumps")
     print(f"Created {len(staff_members)} staff members")
-    print(f"Created {len(sales)} sales")
+    print(f"Created {sales_count} sales")
     print(f"Created 3 users (admin, manager, user)")
     print("\nDefault login credentials:")
     print("Admin: admin@petroltracker.com / admin123")
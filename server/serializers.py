@@ -0,0 +1,239 @@
+from datetime import datetime
+from functools import lru_cache
+
+from flask.json.provider import DefaultJSONProvider
+
+from models import db, Pump, Sale, Staff, Station
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Scalar fields each resource can render, in to_dict() order
+SCALARS = {
+    "sale": ("id", "fuel_type", "litres", "price_per_litre", "total_amount", "sale_timestamp", "transaction_id",
+             "pump_id"),
+    "pump": ("id", "pump_number", "fuel_type", "station_id"),
+    "station": ("id", "name", "location", "address", "phone", "manager_name", "is_active", "created_at"),
+    "staff": ("id", "name", "role", "station_id", "email", "phone", "hire_date", "is_active"),
+}
+# Scalars left out unless `fields=` names them; a sale shows its pump through `pump`
+EXPLICIT_SCALARS = {"sale": ("pump_id",)}
+# Relationships that `expand=` can inline: name -> resource
+RELATIONS = {
+    "sale": {"pump": "pump"},
+    "pump": {"station": "station"},
+    "station": {"pumps": "pump", "staff": "staff"},
+    "staff": {"station": "station"},
+}
+
+
+class FieldSet:
+    """The scalar fields of one resource to render, and the relationships to inline with theirs."""
+
+    def __init__(self, fields, nested=None):
+        self.fields = tuple(fields)
+        self.nested = nested or {}
+
+
+# Default field sets: the same keys the models' to_dict() methods produce
+STATION_BRIEF_FIELDS = FieldSet(("id", "name", "location"))
+PUMP_FIELDS = FieldSet(SCALARS["pump"], {"station": STATION_BRIEF_FIELDS})
+SALE_FIELDS = FieldSet([field for field in SCALARS["sale"] if field not in EXPLICIT_SCALARS["sale"]],
+                       {"pump": PUMP_FIELDS})
+STAFF_FIELDS = FieldSet(SCALARS["staff"])
+STATION_FIELDS = FieldSet(SCALARS["station"], {"pumps": PUMP_FIELDS, "staff": STAFF_FIELDS})
+
+
+def parse_fieldset(resource, fields, expand, default):
+    """
+    Build a FieldSet from `fields=` and `expand=` query parameters, or
+    return `default` when neither is given. `expand` lists relationships to
+    inline (dotted for deeper ones, e.g. pump.station); `fields` lists
+    scalar fields, dotted to pick those of an expanded relationship (which
+    also expands it). A resource without fields listed renders the scalars
+    of its default output, and `id` is always included. Raises ValueError on
+    unknown names.
+    """
+    if fields is None and expand is None:
+        return default
+
+    tree = {"resource": resource, "fields": [], "nested": {}}
+
+    def walk(path, parameter):
+        node = tree
+        for name in path:
+            relations = RELATIONS[node["resource"]]
+            if name not in relations:
+                raise ValueError(
+                    f"Unknown {parameter} '{name}' for {node['resource']}; expand one of: "
+                    f"{', '.join(relations) or 'none'}"
+                )
+            node = node["nested"].setdefault(name, {"resource": relations[name], "fields": [], "nested": {}})
+        return node
+
+    for path in (expand or "").split(","):
+        if path.strip():
+            walk(path.strip().split("."), "expand")
+    for path in (fields or "").split(","):
+        if not path.strip():
+            continue
+        *relations, name = path.strip().split(".")
+        node = walk(relations, "field")
+        if name not in SCALARS[node["resource"]]:
+            raise ValueError(
+                f"Unknown field '{name}' for {node['resource']}; choose from: {', '.join(SCALARS[node['resource']])}"
+            )
+        if name not in node["fields"]:
+            node["fields"].append(name)
+
+    def build(node):
+        scalars = SCALARS[node["resource"]]
+        chosen = node["fields"] or [
+            field for field in scalars if field not in EXPLICIT_SCALARS.get(node["resource"], ())
+        ]
+        return FieldSet(
+            ["id"] + [field for field in scalars if field in chosen and field != "id"],
+            {name: build(child) for name, child in node["nested"].items()},
+        )
+
+    return build(tree)
+
+
+@lru_cache(maxsize=8192)
+def format_datetime(value):
+    return value.isoformat()
+
+
+class Shape:
+    """
+    The output fields of one model, read positionally from plain Core row
+    tuples instead of hydrated ORM objects. Nested shapes (a sale's pump, a
+    pump's station) come from outer-joined columns further along the same
+    row and render as None when the join found nothing. `hidden` columns
+    are selected after everything else but not rendered.
+    """
+
+    def __init__(self, entity, fields, nested=None, hidden=()):
+        self.entity = entity
+        self.fields = list(fields)
+        self.nested = list((nested or {}).items())
+        self.hidden = [field for field in hidden if field not in self.fields]
+        self._datetimes = [
+            getattr(entity, field).type.python_type is datetime for field in self.fields
+        ]
+
+    def columns(self, prefix=""):
+        # Nested columns are labelled `pump__id` etc. so row keys stay unambiguous
+        columns = [
+            getattr(self.entity, field).label(prefix + field) if prefix else getattr(self.entity, field)
+            for field in self.fields
+        ]
+        for key, shape in self.nested:
+            columns += shape.columns(f"{prefix}{key}__")
+        return columns + [getattr(self.entity, field) for field in self.hidden]
+
+    @property
+    def width(self):
+        return len(self.fields) + sum(shape.width for _, shape in self.nested)
+
+    def build(self, row, offset=0):
+        item = {}
+        for index, (field, is_datetime) in enumerate(zip(self.fields, self._datetimes)):
+            value = row[offset + index]
+            if is_datetime and value is not None:
+                value = format_datetime(value)
+            item[field] = value
+        offset += len(self.fields)
+        for key, shape in self.nested:
+            # The first field of a joined shape is its id; NULL means no related row
+            item[key] = shape.build(row, offset) if row[offset] is not None else None
+            offset += shape.width
+        return item
+
+    def build_all(self, rows):
+        return [self.build(row) for row in rows]
+
+
+def _station_shape(fieldset):
+    return Shape(Station, fieldset.fields)
+
+
+def pump_shape(fieldset=PUMP_FIELDS):
+    nested = {"station": _station_shape(fieldset.nested["station"])} if "station" in fieldset.nested else {}
+    return Shape(Pump, fieldset.fields, nested)
+
+
+def sale_shape(sale=Sale, fieldset=SALE_FIELDS, hidden=()):
+    nested = {"pump": pump_shape(fieldset.nested["pump"])} if "pump" in fieldset.nested else {}
+    return Shape(sale, fieldset.fields, nested, hidden)
+
+
+def staff_shape(fieldset=STAFF_FIELDS):
+    nested = {"station": _station_shape(fieldset.nested["station"])} if "station" in fieldset.nested else {}
+    return Shape(Staff, fieldset.fields, nested)
+
+
+def sales_query(shape):
+    """A Query of row tuples for `shape`, joining pumps and stations only when they are rendered."""
+    query = db.session.query(*shape.columns()).select_from(shape.entity)
+    if shape.nested:
+        query = query.outerjoin(Pump, Pump.id == shape.entity.pump_id)
+        if shape.nested[0][1].nested:
+            query = query.outerjoin(Station, Station.id == Pump.station_id)
+    return query
+
+
+def pumps_query(shape):
+    query = db.session.query(*shape.columns()).select_from(Pump)
+    if shape.nested:
+        query = query.outerjoin(Station, Station.id == Pump.station_id)
+    return query
+
+
+def staff_query(shape):
+    query = db.session.query(*shape.columns()).select_from(Staff)
+    if shape.nested:
+        query = query.outerjoin(Station, Station.id == Staff.station_id)
+    return query
+
+
+def station_rows(stations, fieldset=STATION_FIELDS):
+    """
+    Station dicts for the statement `stations` (a select() over Station),
+    with their pumps and staff, when expanded, fetched by one query each
+    rather than per station, keyed by station id.
+    """
+    shape = _station_shape(fieldset)
+    items = shape.build_all(db.session.execute(stations.with_only_columns(*shape.columns())))
+    station_ids = stations.with_only_columns(Station.id).order_by(None).correlate(None).scalar_subquery()
+
+    for key, model, children_query in (("pumps", Pump, pumps_query), ("staff", Staff, staff_query)):
+        if key not in fieldset.nested:
+            continue
+        children = (pump_shape if model is Pump else staff_shape)(fieldset.nested[key])
+        by_station = {}
+        for row in children_query(children).add_columns(model.station_id.label("parent_id"))\
+                .filter(model.station_id.in_(station_ids)).order_by(model.id):
+            by_station.setdefault(row.parent_id, []).append(children.build(row))
+        for item in items:
+            item[key] = by_station.get(item["id"], [])
+    return items
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask's JSON provider, encoding with orjson when it is installed. Keys
+    stay sorted and values orjson would format differently (datetimes,
+    Decimals) still go through Flask's default; non-ASCII text is sent as
+    UTF-8 rather than escaped. Indented (debug) output uses the stdlib.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs.get("indent") is not None:
+            return super().dumps(obj, **kwargs)
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode()
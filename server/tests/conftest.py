@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+import pytest
+
+# The app reads its configuration at import, so point it at a scratch
+# database before anything imports it
+_tmp = tempfile.mkdtemp(prefix="petrol-tests-")
+DATABASE_PATH = os.path.join(_tmp, "test.db")
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{DATABASE_PATH}",
+    RESPONSE_CACHE_BACKEND="memory",
+    PASSWORD_HASH_WORKERS="0",
+    PASSWORD_HASH_METHOD="pbkdf2:sha256:1000",
+)
+
+from app import app as flask_app  # noqa: E402
+from cache import response_cache  # noqa: E402
+from generate import generate_dataset  # noqa: E402
+from models import db, User  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+DATASET_END = datetime(2025, 1, 1)
+PASSWORD = "test-password"
+
+
+@pytest.fixture(scope="session")
+def seeded_database():
+    """A small generated dataset, built once and copied for every test."""
+    with flask_app.app_context():
+        db.create_all()
+        generate_dataset(3, 2, 40, 1.0, 42, DATASET_END)
+        db.session.add(User(name="Test Admin", email="admin@petroltracker.com",
+                            password_hash=generate_password_hash(PASSWORD, method=os.environ["PASSWORD_HASH_METHOD"]),
+                            role="admin"))
+        db.session.commit()
+        db.engine.dispose()
+    seeded = os.path.join(_tmp, "seeded.db")
+    shutil.copyfile(DATABASE_PATH, seeded)
+    yield seeded
+    shutil.rmtree(_tmp, ignore_errors=True)
+
+
+@pytest.fixture
+def app(seeded_database):
+    # Each test starts from the seeded data with nothing cached
+    with flask_app.app_context():
+        db.engine.dispose()
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(DATABASE_PATH + suffix):
+            os.unlink(DATABASE_PATH + suffix)
+    shutil.copyfile(seeded_database, DATABASE_PATH)
+    response_cache.backend.clear()
+    yield flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def token(client):
+    response = client.post("/auth/login", json={"email": "admin@petroltracker.com", "password": PASSWORD})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()["token"]
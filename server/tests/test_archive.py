@@ -0,0 +1,52 @@
+from datetime import datetime
+
+import pytest
+
+from archive import archive_sales, archived_months
+from models import db, Sale
+from tests.test_sales_pagination import walk
+
+NOVEMBER = "start=2024-11-01&end=2024-12-01"
+
+
+@pytest.fixture
+def archived(app, client, monkeypatch):
+    """November 2024 moved into the archive; returns the ids and the timeseries from before."""
+    monkeypatch.setitem(app.config, "SALES_ARCHIVE_AFTER_DAYS", 30)
+    timeseries = client.get("/sales/timeseries?interval=day&start=2024-11-01&end=2025-01-01").get_json()
+    with app.app_context():
+        november = {sale_id for (sale_id,) in db.session.query(Sale.id).filter(
+            Sale.sale_timestamp >= datetime(2024, 11, 1), Sale.sale_timestamp < datetime(2024, 12, 1)
+        )}
+        summary = archive_sales(now=datetime(2025, 1, 10))
+        assert summary == [{"month": "2024-11", "sales": len(november)}]
+        assert [name for _, name in archived_months()] == ["sales_archive_2024_11"]
+        assert db.session.query(Sale).filter(Sale.id.in_(november)).count() == 0
+    return november, timeseries
+
+
+def test_ranges_before_the_horizon_read_archived_months(client, archived):
+    november, _ = archived
+    pages = walk(client, f"limit=200&fields=id,sale_timestamp&{NOVEMBER}")
+    assert {sale["id"] for page in pages for sale in page} == november
+
+    spanning = walk(client, "limit=500&fields=id&start=2024-11-25&end=2024-12-05")
+    ids = [sale["id"] for page in spanning for sale in page]
+    assert len(ids) == len(set(ids))
+    assert november & set(ids) and set(ids) - november
+
+
+def test_archived_sales_stay_readable_but_not_writable(client, archived):
+    sale_id = min(archived[0])
+    assert client.get(f"/sales/{sale_id}").status_code == 200
+    assert client.patch(f"/sales/{sale_id}", json={"litres": 1}).status_code == 404
+    assert client.delete(f"/sales/{sale_id}").status_code == 404
+
+
+def test_totals_and_exports_still_cover_archived_months(client, archived):
+    november, timeseries = archived
+    assert client.get("/sales/timeseries?interval=day&start=2024-11-01&end=2025-01-01").get_json() == timeseries
+
+    export = client.get(f"/sales/export?format=ndjson&{NOVEMBER}")
+    assert export.status_code == 200
+    assert len(export.get_data(as_text=True).splitlines()) == len(november)
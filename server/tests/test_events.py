@@ -0,0 +1,67 @@
+import json
+import threading
+
+import pytest
+
+from events import SalesHub, sales_hub
+
+
+class DownRedis:
+    def publish(self, channel, message):
+        raise ConnectionError("redis is down")
+
+
+class FlakyRedis:
+    """Drops the first subscription, then relays whatever is queued in `messages`."""
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.subscriptions = 0
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return self
+
+    def subscribe(self, channel):
+        self.subscriptions += 1
+
+    def listen(self):
+        if self.subscriptions == 1:
+            raise ConnectionError("connection reset")
+        yield from self.messages
+        threading.Event().wait()
+
+
+@pytest.fixture
+def hub(app):
+    """A hub of its own, driven by hand instead of through a Redis URL."""
+    hub = SalesHub(app)
+    app.extensions["sales_hub"] = sales_hub
+    return hub
+
+
+def test_a_redis_outage_still_reaches_local_streams(hub):
+    subscriber = hub.subscribe()
+    hub._redis = DownRedis()
+
+    hub.publish("sale.created", {"id": 1}, station_id=1)
+
+    events, _ = subscriber.wait(0)
+    assert [event["data"] for event in events] == [{"id": 1}]
+
+
+def test_the_relay_reconnects_after_a_disconnect(hub):
+    event = {"type": "sale.created", "station_id": 1, "data": {"id": 2}}
+    hub._redis_listener = FlakyRedis([{"data": json.dumps(event)}])
+    subscriber = hub.subscribe()
+
+    threading.Thread(target=hub._listen, daemon=True).start()
+
+    events, _ = subscriber.wait(5)
+    assert hub._redis_listener.subscriptions == 2
+    assert [event["data"] for event in events] == [{"id": 2}]
+
+
+def test_streams_are_refused_on_a_sync_gunicorn_worker(client):
+    sync_worker = {"SERVER_SOFTWARE": "gunicorn/23.0.0", "wsgi.multithread": False}
+    response = client.get("/sales/stream", environ_overrides=sync_worker)
+    assert response.status_code == 503
@@ -0,0 +1,108 @@
+import pytest
+
+from inventory import reconcile_tanks
+from models import db, Pump, Sale, Tank
+
+
+@pytest.fixture
+def tanks(app, client):
+    """A 10,000 L tank half full for every station and fuel type the pumps sell; returns {(station, fuel): id}."""
+    with app.app_context():
+        pairs = sorted(set(db.session.query(Pump.station_id, Pump.fuel_type)))
+    ids = {}
+    for station_id, fuel_type in pairs:
+        response = client.post("/tanks", json={
+            "station_id": station_id, "fuel_type": fuel_type,
+            "capacity_litres": 10000, "level_litres": 5000, "low_level_litres": 1000,
+        })
+        assert response.status_code == 201
+        ids[station_id, fuel_type] = response.get_json()["id"]
+    return ids
+
+
+def level(app, tank_id):
+    with app.app_context():
+        return round(db.session.get(Tank, tank_id).level_litres, 6)
+
+
+def drift(app):
+    with app.app_context():
+        return reconcile_tanks()
+
+
+def test_sales_draw_down_their_tank(app, client, tanks):
+    with app.app_context():
+        pump = db.session.query(Pump).order_by(Pump.id).first()
+    tank_id = tanks[pump.station_id, pump.fuel_type]
+
+    created = client.post("/sales", json={
+        "fuelType": pump.fuel_type, "litres": 40, "pricePerLitre": 170, "pumpId": pump.id
+    }).get_json()
+    assert level(app, tank_id) == 4960
+    assert client.post("/sales/batch", json=[
+        {"fuelType": pump.fuel_type, "litres": 10, "pricePerLitre": 170, "pumpId": pump.id}
+    ] * 3).status_code == 201
+    assert level(app, tank_id) == 4930
+    assert client.patch(f"/sales/{created['id']}", json={"litres": 25}).status_code == 200
+    assert level(app, tank_id) == 4945
+    assert client.delete(f"/sales/{created['id']}").status_code == 204
+    assert level(app, tank_id) == 4970
+    assert drift(app) == []
+
+
+def test_pre_tank_sales_never_move_a_tank(app, client, tanks):
+    with app.app_context():
+        deleted, edited = db.session.query(Sale).order_by(Sale.id).limit(2).all()
+        other = db.session.query(Pump).filter(Pump.station_id != edited.pump.station_id).first()
+    levels = {tank_id: level(app, tank_id) for tank_id in tanks.values()}
+
+    assert client.delete(f"/sales/{deleted.id}").status_code == 204
+    assert client.patch(f"/sales/{edited.id}", json={"litres": 99, "pumpId": other.id}).status_code == 200
+
+    assert {tank_id: level(app, tank_id) for tank_id in tanks.values()} == levels
+    assert drift(app) == []
+
+
+def test_pump_moves_and_deletes_keep_tanks_reconciled(app, client, tanks):
+    with app.app_context():
+        pump = db.session.query(Pump).order_by(Pump.id).first()
+        target = next(station for station, fuel in tanks if station != pump.station_id and fuel == pump.fuel_type)
+    for _ in range(2):
+        client.post("/sales", json={"fuelType": pump.fuel_type, "litres": 30, "pricePerLitre": 170, "pumpId": pump.id})
+
+    assert client.patch(f"/pumps/{pump.id}", json={"station_id": target}).status_code == 200
+    assert level(app, tanks[pump.station_id, pump.fuel_type]) == 5000
+    assert level(app, tanks[target, pump.fuel_type]) == 4940
+    assert drift(app) == []
+
+    assert client.delete(f"/pumps/{pump.id}").status_code == 204
+    assert level(app, tanks[target, pump.fuel_type]) == 5000
+    assert drift(app) == []
+
+
+def test_low_stock_alerts_follow_the_level(app, client, tanks):
+    tank_id = next(iter(tanks.values()))
+    assert client.patch(f"/tanks/{tank_id}", json={"low_level_litres": 6000}).status_code == 200
+
+    alerts = client.get("/dashboard").get_json()["lowStockAlerts"]
+    assert [alert["tankId"] for alert in alerts] == [tank_id]
+    assert alerts[0]["level"] == 50.0 and alerts[0]["threshold"] == 60.0
+
+    delivered = client.post(f"/tanks/{tank_id}/deliveries", json={"litres": 2000, "reference": "DN-1"})
+    assert delivered.status_code == 201
+    assert delivered.get_json()["tank"]["level_litres"] == 7000
+    assert client.get("/dashboard").get_json()["lowStockAlerts"] == []
+    assert client.post(f"/tanks/{tank_id}/deliveries", json={"litres": -5}).status_code == 400
+
+
+def test_reconcile_reports_and_fixes_drift(app, tanks):
+    tank_id = next(iter(tanks.values()))
+    with app.app_context():
+        db.session.get(Tank, tank_id).level_litres += 7
+        db.session.commit()
+
+        reported = reconcile_tanks()
+        assert [(item["tank_id"], round(item["drift_litres"], 6)) for item in reported] == [(tank_id, 7)]
+        reconcile_tanks(fix=True)
+        assert reconcile_tanks() == []
+    assert level(app, tank_id) == 5000
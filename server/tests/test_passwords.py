@@ -0,0 +1,49 @@
+import threading
+
+from werkzeug.security import generate_password_hash
+
+from models import db, User
+from passwords import password_hasher
+from tests.conftest import PASSWORD
+
+ADMIN = {"email": "admin@petroltracker.com", "password": PASSWORD}
+
+
+def stored_hash(app):
+    with app.app_context():
+        return db.session.query(User.password_hash).filter_by(email=ADMIN["email"]).scalar()
+
+
+def test_a_saturated_pool_answers_503(client, monkeypatch):
+    monkeypatch.setattr(password_hasher, "_slots", threading.BoundedSemaphore(1))
+    monkeypatch.setattr(password_hasher, "queue_timeout", 0.05)
+
+    # Another request is hashing and holds the only slot
+    password_hasher._slots.acquire()
+    try:
+        busy = client.post("/auth/login", json=ADMIN)
+    finally:
+        password_hasher._slots.release()
+
+    assert busy.status_code == 503
+    assert busy.headers["Retry-After"] == "1"
+    assert client.post("/auth/login", json=ADMIN).status_code == 200
+
+
+def test_login_upgrades_hashes_made_with_other_parameters(app, client):
+    with app.app_context():
+        user = db.session.query(User).filter_by(email=ADMIN["email"]).one()
+        user.password_hash = generate_password_hash(PASSWORD, method="pbkdf2:sha256:600")
+        db.session.commit()
+    assert password_hasher.needs_rehash(stored_hash(app))
+
+    response = client.post("/auth/login", json=ADMIN)
+    assert response.status_code == 200
+    assert "hash-queue;dur=" in response.headers["Server-Timing"]
+    upgraded = stored_hash(app)
+    assert upgraded.startswith(f"{password_hasher.method}$")
+    assert not password_hasher.needs_rehash(upgraded)
+
+    # Current hashes are left alone
+    assert client.post("/auth/login", json=ADMIN).status_code == 200
+    assert stored_hash(app) == upgraded
@@ -0,0 +1,18 @@
+from query_budget import QUERY_BUDGETS, run_query_budgets
+
+
+def test_read_endpoints_stay_within_query_budgets(app):
+    results = run_query_budgets(app)
+
+    assert {path for path, *_ in results}, "no endpoint was checked"
+    over = [
+        (path, status, count, budget)
+        for path, status, count, budget, _ in results
+        if count > budget or status >= 500
+    ]
+    assert not over
+
+
+def test_every_budgeted_endpoint_is_checked(app):
+    # The seeded data has a row for every detail route, so none are skipped
+    assert len(run_query_budgets(app)) == len(QUERY_BUDGETS)
@@ -0,0 +1,20 @@
+from models import db
+from query_plans import plan_checks, run_plan_checks
+
+
+def test_hot_queries_use_their_indexes(app):
+    with app.app_context():
+        results = run_plan_checks()
+
+    assert len(results) == len(plan_checks())
+    unused = {name: (index, plan) for name, index, used, plan in results if not used}
+    assert not unused
+
+
+def test_a_missing_index_fails_the_check(app):
+    with app.app_context():
+        db.session.execute(db.text("DROP INDEX ix_pumps_station_id"))
+        db.session.commit()
+        results = {name: used for name, _, used, _ in run_plan_checks()}
+
+    assert results["pumps for a station"] is False
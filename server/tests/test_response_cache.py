@@ -0,0 +1,52 @@
+from models import db, Pump
+
+
+def test_repeat_reads_are_served_from_cache_with_validators(client):
+    first = client.get("/stations")
+    second = client.get("/stations")
+
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.get_data() == first.get_data()
+    assert first.headers["ETag"] and first.headers["ETag"] == second.headers["ETag"]
+    assert first.headers["Last-Modified"]
+
+
+def test_conditional_requests_answer_304(client):
+    first = client.get("/dashboard")
+
+    by_etag = client.get("/dashboard", headers={"If-None-Match": first.headers["ETag"]})
+    by_date = client.get("/dashboard", headers={"If-Modified-Since": first.headers["Last-Modified"]})
+
+    assert by_etag.status_code == 304 and by_etag.get_data() == b""
+    assert by_date.status_code == 304
+    assert client.get("/dashboard", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_writes_invalidate_dependent_responses(app, client):
+    stations = client.get("/stations")
+    with app.app_context():
+        pump_id = db.session.query(db.func.min(Pump.id)).scalar()
+
+    assert client.post("/stations", json={"name": "Cache Test Station", "location": "Nakuru"}).status_code == 201
+    refreshed = client.get("/stations")
+    assert refreshed.headers["X-Cache"] == "MISS"
+    assert refreshed.headers["ETag"] != stations.headers["ETag"]
+    assert any(station["name"] == "Cache Test Station" for station in refreshed.get_json())
+    by_station = client.get("/sales/by-station")
+    # Staff are not part of the sales aggregates
+    assert client.post("/staff", json={"name": "Cache Tester", "role": "Attendant", "station_id": 1}).status_code == 201
+    assert client.get("/sales/by-station").headers["X-Cache"] == "HIT"
+
+    assert client.post("/sales", json={
+        "fuelType": "Diesel", "litres": 10, "pricePerLitre": 170, "pumpId": pump_id
+    }).status_code == 201
+    after_sale = client.get("/sales/by-station")
+    assert after_sale.headers["X-Cache"] == "MISS"
+    assert after_sale.headers["ETag"] != by_station.headers["ETag"]
+
+
+def test_failed_writes_do_not_invalidate(client):
+    client.get("/stations")
+    assert client.patch("/stations/999999", json={"name": "Nowhere"}).status_code == 404
+    assert client.get("/stations").headers["X-Cache"] == "HIT"
@@ -0,0 +1,81 @@
+import os
+from datetime import datetime
+
+import jwt
+import pytest
+
+from models import db, RevokedToken
+from revocation import RevocationList, revocation_list
+from tests.conftest import PASSWORD
+
+
+@pytest.fixture
+def worker(app):
+    """A second list standing in for another gunicorn worker's copy."""
+    worker = RevocationList()
+    worker.init_app(app)
+    app.extensions["revocation_list"] = revocation_list
+    worker._worker_pid = os.getpid()  # synced by hand, no background thread
+    return worker
+
+
+def login(client):
+    response = client.post("/auth/login", json={"email": "admin@petroltracker.com", "password": PASSWORD})
+    return response.get_json()["token"]
+
+
+def me(client, token):
+    return client.get("/auth/me", headers={"Authorization": f"Bearer {token}"})
+
+
+def test_logout_revokes_only_that_token(client, token):
+    other = login(client)
+    assert me(client, token).status_code == 200
+
+    assert client.post("/auth/logout", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+
+    revoked = me(client, token)
+    assert revoked.status_code == 401
+    assert revoked.get_json()["message"] == "Token has been revoked"
+    assert me(client, other).status_code == 200
+
+
+def test_other_workers_pick_up_revocations_on_sync(app, client, token, worker):
+    assert client.post("/auth/logout", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+    jti = jwt.decode(token, options={"verify_signature": False})["jti"]
+
+
+    assert not worker.is_revoked(jti)
+    with app.app_context():
+        worker.sync()
+    assert worker.is_revoked(jti)
+
+
+def test_sync_picks_up_revocations_committed_out_of_id_order(app, worker):
+    # On Postgres a lower id can commit after a higher one was already read
+    expires_at = datetime(2100, 1, 1)
+
+    with app.app_context():
+        db.session.add(RevokedToken(id=20, jti="later-id-first", expires_at=expires_at))
+        db.session.commit()
+        worker.sync()
+        db.session.add(RevokedToken(id=10, jti="earlier-id-second", expires_at=expires_at))
+        db.session.commit()
+        worker.sync()
+
+    assert worker.is_revoked("later-id-first")
+    assert worker.is_revoked("earlier-id-second")
+
+
+def test_expired_revocations_are_purged(app, client, token):
+    assert client.post("/auth/logout", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+    jti = jwt.decode(token, options={"verify_signature": False})["jti"]
+
+    expired = datetime(2000, 1, 1)
+    with app.app_context():
+        db.session.query(RevokedToken).filter_by(jti=jti).update({"expires_at": expired})
+        db.session.commit()
+        revocation_list._revoked[jti] = expired
+        revocation_list.purge()
+        assert db.session.query(RevokedToken).filter_by(jti=jti).count() == 0
+    assert not revocation_list.is_revoked(jti)
@@ -0,0 +1,54 @@
+from models import db, Pump, Sale, SaleRollup
+from rollups import rebuild_rollups
+
+
+def rollup_snapshot():
+    rows = db.session.query(
+        SaleRollup.period, SaleRollup.bucket_start, SaleRollup.pump_id, SaleRollup.station_id,
+        SaleRollup.fuel_type, SaleRollup.sale_count, SaleRollup.total_litres, SaleRollup.total_revenue,
+        SaleRollup.price_sum, SaleRollup.min_price, SaleRollup.max_price,
+    ).filter(SaleRollup.sale_count > 0).all()
+    return sorted(
+        tuple(round(value, 6) if isinstance(value, float) else value for value in row)
+        for row in rows
+    )
+
+
+def test_sale_writes_keep_rollups_equal_to_a_rebuild(app, client):
+    with app.app_context():
+        pumps = db.session.query(Pump).order_by(Pump.id).all()
+        moved_to = next(pump for pump in pumps if pump.station_id != pumps[0].station_id)
+        edited, deleted = db.session.query(Sale.id).order_by(Sale.id).limit(2).all()
+
+    created = client.post("/sales", json={
+        "fuelType": "Diesel", "litres": 25, "pricePerLitre": 180, "pumpId": pumps[0].id
+    })
+    assert created.status_code == 201
+    assert client.post("/sales/batch", json=[
+        {"fuelType": "Petrol", "litres": 12, "pricePerLitre": 190, "pumpId": pumps[1].id,
+         "saleTimestamp": "2024-12-05T10:15:00"},
+        {"fuelType": "Petrol", "litres": 8, "pricePerLitre": 150, "pumpId": pumps[1].id,
+         "saleTimestamp": "2024-12-05T10:45:00"},
+    ]).status_code == 201
+    assert client.patch(f"/sales/{edited.id}", json={"litres": 40, "pumpId": moved_to.id}).status_code == 200
+    assert client.patch(f"/sales/{created.get_json()['id']}", json={"pricePerLitre": 200}).status_code == 200
+    assert client.delete(f"/sales/{deleted.id}").status_code == 204
+
+    with app.app_context():
+        maintained = rollup_snapshot()
+        rebuild_rollups()
+        db.session.commit()
+        assert maintained == rollup_snapshot()
+
+
+def test_moving_a_pump_moves_its_rollups(app, client):
+    with app.app_context():
+        pump = db.session.query(Pump).order_by(Pump.id).first()
+        target = next(station_id for (station_id,) in db.session.query(Pump.station_id).distinct()
+                      if station_id != pump.station_id)
+
+    assert client.patch(f"/pumps/{pump.id}", json={"station_id": target}).status_code == 200
+
+    with app.app_context():
+        assert {station_id for (station_id,) in db.session.query(SaleRollup.station_id)
+                .filter(SaleRollup.pump_id == pump.id).distinct()} == {target}
@@ -0,0 +1,68 @@
+import json
+
+from models import db, Pump, Sale
+
+
+def sale(pump_id, **overrides):
+    return {"fuelType": "Diesel", "litres": 20, "pricePerLitre": 175, "pumpId": pump_id,
+            "saleTimestamp": "2024-12-20T08:30:00", **overrides}
+
+
+def pump_id(app):
+    with app.app_context():
+        return db.session.query(db.func.min(Pump.id)).scalar()
+
+
+def sale_count(app):
+    with app.app_context():
+        return db.session.query(Sale).count()
+
+
+def test_partial_failure_answers_207_and_keeps_the_valid_rows(app, client):
+    pump = pump_id(app)
+    before = sale_count(app)
+
+    response = client.post("/sales/batch", json=[
+        sale(pump),
+        sale(pump, litres=-5),
+        sale(pump, litres=30),
+        sale(999999),
+    ])
+
+    assert response.status_code == 207
+    body = response.get_json()
+    assert body["inserted"] == 2
+    assert body["failed"] == 2
+    assert [error["index"] for error in body["errors"]] == [1, 3]
+    assert sale_count(app) == before + 2
+
+
+def test_all_valid_answers_201(app, client):
+    response = client.post("/sales/batch", json=[sale(pump_id(app)) for _ in range(3)])
+    assert response.status_code == 201
+    assert response.get_json() == {"inserted": 3, "duplicates": [], "failed": 0, "errors": []}
+
+
+def test_all_invalid_answers_400_and_inserts_nothing(app, client):
+    before = sale_count(app)
+    response = client.post("/sales/batch", json=[sale(pump_id(app), fuelType=None), {"litres": "lots"}])
+    assert response.status_code == 400
+    assert response.get_json()["failed"] == 2
+    assert sale_count(app) == before
+
+
+def test_ndjson_reports_malformed_lines_by_index(app, client):
+    pump = pump_id(app)
+    body = "\n".join([json.dumps(sale(pump)), "{not json", json.dumps(sale(pump, litres=5))])
+
+    response = client.post("/sales/batch", data=body, content_type="application/x-ndjson")
+
+    assert response.status_code == 207
+    assert response.get_json()["inserted"] == 2
+    assert [error["index"] for error in response.get_json()["errors"]] == [1]
+
+
+def test_oversized_and_malformed_bodies_are_rejected(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, "SALES_BATCH_MAX_ROWS", 2)
+    assert client.post("/sales/batch", json=[sale(pump_id(app))] * 3).status_code == 413
+    assert client.post("/sales/batch", json={"not": "a list"}).status_code == 400
@@ -0,0 +1,59 @@
+from models import db, Pump, Sale
+
+
+def walk(client, query):
+    """Every page of /sales for `query`, following X-Next-Cursor."""
+    pages, cursor = [], None
+    while True:
+        response = client.get(f"/sales?{query}" + (f"&cursor={cursor}" if cursor else ""))
+        assert response.status_code == 200, response.get_json()
+        pages.append(response.get_json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return pages
+
+
+def test_cursor_pages_cover_every_sale_once_newest_first(app, client):
+    pages = walk(client, "limit=500&fields=id,sale_timestamp")
+    sales = [sale for page in pages for sale in page]
+
+    with app.app_context():
+        total = db.session.query(Sale).count()
+    assert len(pages) > 2
+    assert all(len(page) == 500 for page in pages[:-1])
+    assert len(sales) == total
+    assert len({sale["id"] for sale in sales}) == total
+    keys = [(sale["sale_timestamp"], sale["id"]) for sale in sales]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_pages_respect_filters(app, client):
+    with app.app_context():
+        pump = db.session.query(Pump).order_by(Pump.id).first()
+        expected = db.session.query(Sale).filter(
+            Sale.pump_id == pump.id, Sale.sale_timestamp >= "2024-12-01", Sale.sale_timestamp < "2024-12-15"
+        ).count()
+
+    pages = walk(client, f"limit=100&pump_id={pump.id}&start=2024-12-01&end=2024-12-15"
+                         "&fields=id,pump_id,sale_timestamp")
+    sales = [sale for page in pages for sale in page]
+    assert len(sales) == expected > 0
+    assert {sale["pump_id"] for sale in sales} == {pump.id}
+    assert all("2024-12-01" <= sale["sale_timestamp"] < "2024-12-15" for sale in sales)
+
+
+def test_a_page_does_not_shift_when_newer_sales_arrive(app, client):
+    cursor = client.get("/sales?limit=50&fields=id").headers["X-Next-Cursor"]
+    before = client.get(f"/sales?limit=50&fields=id&cursor={cursor}").get_json()
+    with app.app_context():
+        pump_id = db.session.query(db.func.min(Pump.id)).scalar()
+    assert client.post("/sales", json={
+        "fuelType": "Diesel", "litres": 10, "pricePerLitre": 170, "pumpId": pump_id
+    }).status_code == 201
+
+    assert client.get(f"/sales?limit=50&fields=id&cursor={cursor}").get_json() == before
+
+
+def test_malformed_cursor_and_limit_are_rejected(client):
+    assert client.get("/sales?cursor=not-a-cursor").status_code == 400
+    assert client.get("/sales?limit=0").status_code == 400
@@ -0,0 +1,64 @@
+from datetime import datetime
+
+from models import db, Sale, Station
+
+
+def totals(series):
+    points = [point for line in series for point in line["points"]]
+    return sum(point["sale_count"] for point in points), round(sum(point["litres"] for point in points), 4)
+
+
+def test_daily_buckets_are_zero_filled_and_add_up(app, client):
+    response = client.get("/sales/timeseries?interval=day&start=2024-11-15&end=2025-01-03")
+    assert response.status_code == 200
+    body = response.get_json()
+    points = body["series"][0]["points"]
+
+    # One bucket per day, including the days before and after the data
+    assert len(points) == 49
+    assert points[0]["bucket"] == "2024-11-15T00:00:00+00:00"
+    assert points[-1]["bucket"] == "2025-01-02T00:00:00+00:00"
+    assert points[0]["sale_count"] == 0 and points[-1]["sale_count"] == 0
+
+    with app.app_context():
+        count, litres = db.session.query(db.func.count(Sale.id), db.func.sum(Sale.litres)).one()
+    assert totals(body["series"]) == (count, round(litres, 4))
+
+
+def test_hourly_buckets_match_the_sales_in_each_hour(app, client):
+    body = client.get("/sales/timeseries?interval=hour&start=2024-12-10T00:00&end=2024-12-11T00:00").get_json()
+    points = body["series"][0]["points"]
+    assert len(points) == 24
+
+    with app.app_context():
+        for point in points[8:12]:
+            start = datetime.fromisoformat(point["bucket"]).replace(tzinfo=None)
+            expected = db.session.query(Sale).filter(
+                Sale.sale_timestamp >= start, Sale.sale_timestamp < start.replace(hour=start.hour + 1)
+            ).count()
+            assert point["sale_count"] == expected
+
+
+def test_buckets_follow_the_requested_timezone(client):
+    body = client.get(
+        "/sales/timeseries?interval=day&start=2024-12-01&end=2024-12-03&tz=Africa/Nairobi"
+    ).get_json()
+    assert [point["bucket"] for point in body["series"][0]["points"]] == [
+        "2024-12-01T00:00:00+03:00", "2024-12-02T00:00:00+03:00",
+    ]
+
+
+def test_group_by_station_splits_the_totals(app, client):
+    query = "interval=week&start=2024-11-18&end=2025-01-06"
+    overall = client.get(f"/sales/timeseries?{query}").get_json()
+    grouped = client.get(f"/sales/timeseries?{query}&group_by=station").get_json()
+
+    with app.app_context():
+        assert {line["key"] for line in grouped["series"]} == {station.id for station in Station.query}
+    assert totals(grouped["series"]) == totals(overall["series"])
+
+
+def test_invalid_parameters_are_rejected(client):
+    assert client.get("/sales/timeseries?interval=fortnight").status_code == 400
+    assert client.get("/sales/timeseries?group_by=colour").status_code == 400
+    assert client.get("/sales/timeseries?start=2024-12-02&end=2024-12-01").status_code == 400
@@ -0,0 +1,77 @@
+from models import db, Pump, Sale
+
+
+def pumps(app):
+    with app.app_context():
+        return [pump_id for (pump_id,) in db.session.query(Pump.id).order_by(Pump.id).limit(2)]
+
+
+def stored(app, transaction_id):
+    with app.app_context():
+        return db.session.query(Sale).filter_by(transaction_id=transaction_id).count()
+
+
+def test_replayed_sale_returns_the_original(app, client):
+    pump, _ = pumps(app)
+    payload = {"fuelType": "Diesel", "litres": 20, "pricePerLitre": 175, "pumpId": pump, "transactionId": "tx-1"}
+
+    first = client.post("/sales", json=payload)
+    replay = client.post("/sales", json=payload)
+
+    assert first.status_code == 201
+    assert replay.status_code == 200
+    assert replay.get_json()["id"] == first.get_json()["id"]
+    assert stored(app, "tx-1") == 1
+
+
+def test_transaction_ids_are_unique_per_pump(app, client):
+    pump, other = pumps(app)
+    for pump_id in (pump, other):
+        response = client.post("/sales", json={
+            "fuelType": "Diesel", "litres": 20, "pricePerLitre": 175, "pumpId": pump_id, "transactionId": 42
+        })
+        assert response.status_code == 201
+    assert stored(app, "42") == 2
+
+
+def test_batch_reports_replays_as_duplicates(app, client):
+    pump, _ = pumps(app)
+    original = client.post("/sales", json={
+        "fuelType": "Diesel", "litres": 20, "pricePerLitre": 175, "pumpId": pump, "transactionId": "tx-2"
+    }).get_json()
+
+    response = client.post("/sales/batch", json=[
+        {"fuelType": "Diesel", "litres": 20, "pricePerLitre": 175, "pumpId": pump, "transactionId": "tx-2"},
+        {"fuelType": "Diesel", "litres": 15, "pricePerLitre": 175, "pumpId": pump, "transactionId": "tx-3"},
+        {"fuelType": "Diesel", "litres": 15, "pricePerLitre": 175, "pumpId": pump, "transactionId": "tx-3"},
+    ])
+
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body["inserted"] == 1
+    assert body["duplicates"][0] == {"index": 0, "id": original["id"]}
+    assert [duplicate["index"] for duplicate in body["duplicates"]] == [0, 2]
+    assert stored(app, "tx-2") == 1 and stored(app, "tx-3") == 1
+
+
+def test_single_and_batch_routes_normalise_transaction_ids_alike(app, client):
+    pump, _ = pumps(app)
+    sale = {"fuelType": "Diesel", "litres": 20, "pricePerLitre": 175, "pumpId": pump}
+
+    first = client.post("/sales", json={**sale, "transactionId": " tx-4 "})
+    assert first.status_code == 201
+    assert first.get_json()["transaction_id"] == "tx-4"
+    batch = client.post("/sales/batch", json=[{**sale, "transactionId": "tx-4"}]).get_json()
+    assert batch["duplicates"] == [{"index": 0, "id": first.get_json()["id"]}]
+    assert client.post("/sales", json={**sale, "transactionId": "tx-4\n"}).status_code == 200
+    assert stored(app, "tx-4") == 1
+
+
+def test_invalid_transaction_ids_are_rejected(app, client):
+    pump, _ = pumps(app)
+    sale = {"fuelType": "Diesel", "litres": 20, "pricePerLitre": 175, "pumpId": pump}
+
+    for transaction_id in (True, "", "   ", "x" * 65, {"id": 1}, [1]):
+        response = client.post("/sales", json={**sale, "transactionId": transaction_id})
+        assert response.status_code == 400, transaction_id
+    assert client.post("/sales", json={**sale, "pumpId": 999999}).status_code == 400
@@ -0,0 +1,91 @@
+import json
+import os
+import time
+
+import pytest
+
+import app as app_module
+from ingest import validate_batch
+from models import db, Pump, Sale
+from writebehind import WriteBehindQueue
+
+
+@pytest.fixture
+def queue(app, tmp_path, monkeypatch):
+    """A write-behind queue of its own, logging to a scratch directory, behind POST /sales."""
+    monkeypatch.setitem(app.config, "SALES_WRITE_BEHIND", True)
+    monkeypatch.setitem(app.config, "SALES_WRITE_BEHIND_DIR", str(tmp_path))
+    monkeypatch.setitem(app.config, "SALES_WRITE_BEHIND_MAX_BATCH", 3)
+    monkeypatch.setitem(app.config, "SALES_WRITE_BEHIND_MAX_DELAY_MS", 60000)
+    monkeypatch.setitem(app.config, "SALES_WRITE_BEHIND_FSYNC", False)
+    # The app has served requests already, so the per-request hook cannot be added;
+    # append() starts the worker by itself
+    monkeypatch.setattr(app, "before_request", lambda f: f)
+    queue = WriteBehindQueue(app)
+    app.extensions["write_behind"] = app_module.write_behind
+    monkeypatch.setattr(app_module, "write_behind", queue)
+    return queue
+
+
+def sale(app, transaction_id):
+    with app.app_context():
+        pump_id = db.session.query(db.func.min(Pump.id)).scalar()
+    return {"fuelType": "Diesel", "litres": 20, "pricePerLitre": 175, "pumpId": pump_id, "transactionId": transaction_id}
+
+
+def stored(app, *transaction_ids):
+    with app.app_context():
+        return db.session.query(Sale).filter(Sale.transaction_id.in_(transaction_ids)).count()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def segments(directory):
+    return sorted(name for name in os.listdir(directory) if name.startswith("sales-"))
+
+
+def test_queued_sales_are_committed_as_one_group(app, client, queue, tmp_path):
+    first = client.post("/sales", json=sale(app, "wb-1"))
+    assert first.status_code == 202
+    assert first.get_json()["transaction_id"] == "wb-1"
+    assert client.post("/sales", json=sale(app, "wb-2")).status_code == 202
+    segment = segments(tmp_path)
+    assert stored(app, "wb-1", "wb-2") == 0
+    assert len(open(tmp_path / segment[0]).readlines()) == 2
+
+    # The third sale fills the group, which lands in one commit
+    assert client.post("/sales", json=sale(app, "wb-3")).status_code == 202
+    wait_for(lambda: stored(app, "wb-1", "wb-2", "wb-3") == 3)
+    wait_for(lambda: segment[0] not in segments(tmp_path))
+    assert len(segments(tmp_path)) == 1
+
+
+def leave_segment(app, directory, *transaction_ids):
+    """The log of a worker that stopped before committing, ending in a torn write."""
+    sales = [sale(app, transaction_id) for transaction_id in transaction_ids]
+    with app.app_context():
+        valid, _ = validate_batch(list(enumerate(sales)))
+    with open(directory / "sales-1-1.log", "w") as segment:
+        for _, row in valid:
+            segment.write(json.dumps(dict(row, sale_timestamp=row["sale_timestamp"].isoformat())) + "\n")
+        segment.write('{"torn": ')
+
+
+def test_leftover_segments_are_replayed_on_start(app, client, queue, tmp_path):
+    leave_segment(app, tmp_path, "wb-4", "wb-5")
+
+    assert client.post("/sales", json=sale(app, "wb-6")).status_code == 202
+    assert stored(app, "wb-4", "wb-5") == 2
+    assert "sales-1-1.log" not in segments(tmp_path)
+
+    # A segment whose group had committed before the crash inserts nothing twice
+    leave_segment(app, tmp_path, "wb-4", "wb-5")
+    with app.app_context():
+        assert queue.replay() == 0
+    assert stored(app, "wb-4", "wb-5") == 2
+    assert "sales-1-1.log" not in segments(tmp_path)
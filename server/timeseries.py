@@ -0,0 +1,245 @@
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import func, select
+
+from archive import sales_source
+from models import db, Pump, SaleRollup, Station
+from rollups import bucket_expression
+
+INTERVALS = ('minute', 'hour', 'day', 'week', 'month')
+GROUPINGS = ('station', 'pump', 'fuel_type')
+
+# Range used when the caller gives no `start`
+DEFAULT_SPANS = {
+    'minute': timedelta(hours=1),
+    'hour': timedelta(days=1),
+    'day': timedelta(days=30),
+    'week': timedelta(weeks=12),
+    'month': timedelta(days=365),
+}
+
+MAX_BUCKETS = 5000
+
+
+def parse_timezone(name):
+    if not name:
+        return timezone.utc
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone '{name}'")
+
+
+def parse_local_datetime(value, tz, name):
+    """ISO-8601 parameter; naive values are read as wall-clock time in `tz`."""
+    if value in (None, ""):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO-8601 datetime")
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=tz)
+
+
+def _floor_local(moment, interval):
+    if interval == 'minute':
+        return moment.replace(second=0, microsecond=0)
+    if interval == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    if interval == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _next_local(moment, interval):
+    if interval == 'week':
+        return moment + timedelta(weeks=1)
+    if interval == 'month':
+        return moment.replace(year=moment.year + moment.month // 12, month=moment.month % 12 + 1)
+    return moment + timedelta(days=1)
+
+
+def bucket_edges(start, end, interval, tz):
+    """
+    Bucket boundaries covering [start, end) as naive UTC datetimes, the way
+    sale timestamps are stored. Minute and hour buckets step in absolute time;
+    day, week and month buckets follow the wall clock in `tz`, so they stay
+    aligned to local midnight across DST changes.
+    """
+    edges = []
+    local = _floor_local(start.astimezone(tz), interval)
+    end_utc = end.astimezone(timezone.utc)
+    if interval in ('minute', 'hour'):
+        step = timedelta(minutes=1) if interval == 'minute' else timedelta(hours=1)
+        moment = local.astimezone(timezone.utc)
+        while True:
+            edges.append(moment.replace(tzinfo=None))
+            if moment >= end_utc:
+                break
+            moment += step
+            if len(edges) > MAX_BUCKETS:
+                break
+    else:
+        wall = local.replace(tzinfo=None)
+        while True:
+            moment = wall.replace(tzinfo=tz).astimezone(timezone.utc)
+            edges.append(moment.replace(tzinfo=None))
+            if moment >= end_utc:
+                break
+            wall = _next_local(wall, interval)
+            if len(edges) > MAX_BUCKETS:
+                break
+    if len(edges) > MAX_BUCKETS:
+        raise ValueError(f"Range and interval would produce more than {MAX_BUCKETS} buckets")
+    return edges
+
+
+def _source_grain(edges, interval):
+    """The coarsest stored grain whose buckets nest inside the requested ones."""
+    if interval == 'minute':
+        return 'minute'
+    if all(edge.hour == 0 and edge.minute == 0 and edge.second == 0 for edge in edges):
+        return 'day'
+    if all(edge.minute == 0 and edge.second == 0 for edge in edges):
+        return 'hour'
+    return 'minute'
+
+
+def _rollup_query(grain, group_by, filters, start, end):
+    group_column = {
+        'station': SaleRollup.station_id,
+        'pump': SaleRollup.pump_id,
+        'fuel_type': SaleRollup.fuel_type,
+    }.get(group_by)
+    columns = [SaleRollup.bucket_start.label('bucket')]
+    if group_column is not None:
+        columns.append(group_column.label('group_key'))
+
+    query = select(
+        *columns,
+        func.sum(SaleRollup.sale_count).label('sale_count'),
+        func.sum(SaleRollup.total_litres).label('litres'),
+        func.sum(SaleRollup.total_revenue).label('revenue'),
+    ).where(
+        SaleRollup.period == grain,
+        SaleRollup.bucket_start >= start,
+        SaleRollup.bucket_start < end,
+    )
+    if filters.get('station_id') is not None:
+        query = query.where(SaleRollup.station_id == filters['station_id'])
+    if filters.get('pump_id') is not None:
+        query = query.where(SaleRollup.pump_id == filters['pump_id'])
+    if filters.get('fuel_type'):
+        query = query.where(SaleRollup.fuel_type == filters['fuel_type'])
+    return query.group_by(*columns)
+
+
+def _sales_query(group_by, filters, start, end):
+    # Old minute-level ranges may reach into archived months
+    sale = sales_source(start, end)
+    bucket = bucket_expression(sale.sale_timestamp, 'minute', db.engine.dialect.name)
+    group_column = {
+        'station': Pump.station_id,
+        'pump': sale.pump_id,
+        'fuel_type': sale.fuel_type,
+    }.get(group_by)
+    columns = [bucket.label('bucket')]
+    if group_column is not None:
+        columns.append(group_column.label('group_key'))
+
+    query = select(
+        *columns,
+        func.count(sale.id).label('sale_count'),
+        func.sum(sale.litres).label('litres'),
+        func.sum(sale.total_amount).label('revenue'),
+    ).where(sale.sale_timestamp >= start, sale.sale_timestamp < end)
+    if group_by == 'station' or filters.get('station_id') is not None:
+        query = query.join(Pump, Pump.id == sale.pump_id)
+    if filters.get('station_id') is not None:
+        query = query.where(Pump.station_id == filters['station_id'])
+    if filters.get('pump_id') is not None:
+        query = query.where(sale.pump_id == filters['pump_id'])
+    if filters.get('fuel_type'):
+        query = query.where(sale.fuel_type == filters['fuel_type'])
+    return query.group_by(*columns)
+
+
+def _group_labels(group_by, keys):
+    if group_by == 'station':
+        return dict(db.session.execute(select(Station.id, Station.name).where(Station.id.in_(keys))).all())
+    if group_by == 'pump':
+        return dict(db.session.execute(select(Pump.id, Pump.pump_number).where(Pump.id.in_(keys))).all())
+    return {key: key for key in keys}
+
+
+def _series_order(item):
+    # Unassigned groups (e.g. pumps without a station) sort last
+    key = item[0]
+    return (key is None, key if key is not None else '')
+
+
+def sales_timeseries(interval, start, end, tz, group_by=None, filters=None):
+    """
+    Sale count, litres and revenue per time bucket, optionally split by
+    station, pump or fuel type.
+
+    SQL groups at the coarsest grain that nests inside the requested buckets:
+    daily or hourly rollups when the local bucket edges fall on UTC day or
+    hour boundaries, otherwise per-minute groups over the sales table. Those
+    pre-grouped rows are folded into the local buckets here and every series
+    is filled densely with zeros.
+    """
+    filters = filters or {}
+    edges = bucket_edges(start, end, interval, tz)
+    grain = _source_grain(edges, interval)
+    if grain == 'minute':
+        query = _sales_query(group_by, filters, edges[0], edges[-1])
+    else:
+        query = _rollup_query(grain, group_by, filters, edges[0], edges[-1])
+
+    bucket_count = len(edges) - 1
+    series = {}
+    for row in db.session.execute(query):
+        index = bisect_right(edges, row.bucket) - 1
+        if not 0 <= index < bucket_count:
+            continue
+        key = row.group_key if group_by else None
+        points = series.get(key)
+        if points is None:
+            points = series[key] = [[0, 0.0, 0.0] for _ in range(bucket_count)]
+        point = points[index]
+        point[0] += int(row.sale_count or 0)
+        point[1] += float(row.litres or 0)
+        point[2] += float(row.revenue or 0)
+
+    labels = _group_labels(group_by, list(series)) if group_by else {}
+    bucket_labels = [
+        edge.replace(tzinfo=timezone.utc).astimezone(tz).isoformat() for edge in edges[:-1]
+    ]
+    if not series and not group_by:
+        series[None] = [[0, 0.0, 0.0] for _ in range(bucket_count)]
+
+    return {
+        'interval': interval,
+        'timezone': getattr(tz, 'key', 'UTC'),
+        'group_by': group_by,
+        'start': bucket_labels[0] if bucket_labels else None,
+        'end': edges[-1].replace(tzinfo=timezone.utc).astimezone(tz).isoformat(),
+        'source': 'sales' if grain == 'minute' else f'{grain}_rollups',
+        'series': [
+            {
+                'key': key,
+                'label': labels.get(key, key),
+                'points': [
+                    {'bucket': label, 'sale_count': count, 'litres': litres, 'revenue': revenue}
+                    for label, (count, litres, revenue) in zip(bucket_labels, points)
+                ],
+            }
+            for key, points in sorted(series.items(), key=_series_order)
+        ],
+    }
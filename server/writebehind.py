@@ -0,0 +1,205 @@
+import atexit
+import fcntl
+import glob
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from flask import current_app
+
+from cache import response_cache
+from events import sales_hub
+from ingest import split_replays, insert_sales
+from models import db
+
+
+class WriteBehindQueue:
+    """
+    Optional durable ingestion for POST /sales (SALES_WRITE_BEHIND). A sale
+    is appended to a log file in SALES_WRITE_BEHIND_DIR and fsynced, then
+    acknowledged with 202 before it reaches the database. A committer thread
+    per worker inserts the queued sales in one transaction per group, cut
+    when SALES_WRITE_BEHIND_MAX_BATCH sales are waiting or the oldest has
+    waited SALES_WRITE_BEHIND_MAX_DELAY_MS, and deletes the log segment once
+    its group is committed. A segment stays locked until then, and segments
+    left behind by a crash (or by a group that kept failing to commit) are
+    replayed when a worker starts. Every queued sale carries a transaction
+    id (one is generated if the client sent none), so a segment replayed
+    after its group had already committed inserts nothing twice.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._commit_lock = threading.Lock()
+        self._pending = []
+        self._pending_since = None
+        self._segment = None
+        self._segment_path = None
+        self._sequence = itertools.count(1)
+        self._worker_pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get("SALES_WRITE_BEHIND", False)
+        self.directory = app.config.get("SALES_WRITE_BEHIND_DIR")
+        self.max_batch = app.config.get("SALES_WRITE_BEHIND_MAX_BATCH", 500)
+        self.max_delay = app.config.get("SALES_WRITE_BEHIND_MAX_DELAY_MS", 50) / 1000
+        self.fsync = app.config.get("SALES_WRITE_BEHIND_FSYNC", True)
+        self.retries = app.config.get("SALES_WRITE_BEHIND_RETRIES", 5)
+        app.extensions["write_behind"] = self
+        if self.enabled:
+            os.makedirs(self.directory, exist_ok=True)
+            app.before_request(self._ensure_worker)
+
+    def append(self, row):
+        """Durably queue a validated sale row; returns it with its transaction id."""
+        self._ensure_worker()
+        row = dict(row, transaction_id=row["transaction_id"] or uuid.uuid4().hex)
+        line = json.dumps(dict(row, sale_timestamp=row["sale_timestamp"].isoformat())) + "\n"
+        with self._ready:
+            self._segment.write(line)
+            self._segment.flush()
+            if self.fsync:
+                os.fsync(self._segment.fileno())
+            if not self._pending:
+                self._pending_since = time.monotonic()
+            self._pending.append(row)
+            self._ready.notify()
+        return row
+
+    def _open_segment(self):
+        # A live worker holds a lock on the segment it appends to, so replays skip it
+        self._segment_path = os.path.join(self.directory, f"sales-{os.getpid()}-{next(self._sequence)}.log")
+        self._segment = open(self._segment_path, "a")
+        fcntl.flock(self._segment, fcntl.LOCK_EX)
+
+    def _take(self):
+        """
+        Swap out the pending rows and start a new segment; returns (rows,
+        segment, path). The old segment is left open, and so locked, until
+        its rows are committed.
+        """
+        rows, self._pending = self._pending, []
+        segment, path = self._segment, self._segment_path
+        self._open_segment()
+        return rows, segment, path
+
+    def _commit(self, rows):
+        landed = []
+        valid, _ = split_replays(list(enumerate(rows)))
+        inserted, errors, _ = insert_sales(valid, self.max_batch, on_commit=landed.extend)
+        for error in errors:
+            current_app.logger.error(
+                "Queued sale %s was rejected: %s", rows[error["index"]]["transaction_id"], error["error"]
+            )
+        response_cache.invalidate("sales")
+        sales_hub.publish_batch(landed)
+        db.session.remove()
+        return inserted
+
+    def _commit_segment(self, rows, segment, path):
+        with self._commit_lock:
+            with self.app.app_context():
+                self._commit(rows)
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass  # already replayed and removed by another worker
+        segment.close()
+
+    def flush(self):
+        """Commit everything queued in this worker now (used at exit)."""
+        if self._worker_pid != os.getpid():
+            return
+        with self._ready:
+            if not self._pending:
+                return
+            rows, segment, path = self._take()
+        self._commit_segment(rows, segment, path)
+
+    def replay(self):
+        """Commit the segments of workers that stopped before committing them."""
+        replayed = 0
+        for path in sorted(glob.glob(os.path.join(self.directory, "sales-*.log"))):
+            try:
+                segment = open(path)
+            except FileNotFoundError:
+                continue  # another worker replayed it first
+            with segment:
+                try:
+                    fcntl.flock(segment, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                if os.fstat(segment.fileno()).st_nlink == 0:
+                    continue  # committed and removed while we waited for the lock
+                rows = []
+                for line in segment:
+                    try:
+                        row = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn final write; it was never acknowledged
+                    row["sale_timestamp"] = datetime.fromisoformat(row["sale_timestamp"])
+                    rows.append(row)
+                if rows:
+                    with self._commit_lock:
+                        replayed += self._commit(rows)
+                if os.path.exists(path):
+                    os.unlink(path)
+        if replayed:
+            current_app.logger.info("Replayed %s queued sales", replayed)
+        return replayed
+
+    def _ensure_worker(self):
+        # Started lazily, and again after a fork, so each gunicorn worker runs its own
+        if self._worker_pid == os.getpid() or self.app is None:
+            return
+        with self._lock:
+            if self._worker_pid == os.getpid():
+                return
+            self._worker_pid = os.getpid()
+            self._pending = []
+            self._open_segment()
+        with self.app.app_context():
+            self.replay()
+        threading.Thread(target=self._run, name="sales-write-behind", daemon=True).start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            with self._ready:
+                while not self._pending:
+                    self._ready.wait()
+                deadline = self._pending_since + self.max_delay
+                while len(self._pending) < self.max_batch and time.monotonic() < deadline:
+                    self._ready.wait(deadline - time.monotonic())
+                rows, segment, path = self._take()
+            for attempt in range(self.retries + 1):
+                try:
+                    self._commit_segment(rows, segment, path)
+                    break
+                except Exception as e:
+                    if attempt == self.retries:
+                        # Unlocking the segment leaves it on disk for the next worker start to replay
+                        segment.close()
+                        self.app.logger.error(
+                            "Giving up on %s queued sales in %s after %s attempts: %s",
+                            len(rows), path, attempt + 1, e, exc_info=True
+                        )
+                        break
+                    delay = min(2 ** attempt, 30)
+                    self.app.logger.warning(
+                        "Committing %s queued sales failed, retrying in %ss: %s", len(rows), delay, e
+                    )
+                    time.sleep(delay)
+
+
+write_behind = WriteBehindQueue()
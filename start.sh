@@ -14,5 +14,5 @@ with app.app_context():
 # Seed the database
 python seed.py
 
-# Start the application
-gunicorn app:app
+# Start the application (gthread workers, see server/gunicorn.conf.py)
+gunicorn app:app --config gunicorn.conf.py